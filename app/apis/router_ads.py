@@ -1,35 +1,59 @@
-from fastapi import APIRouter, Request, Depends, BackgroundTasks, HTTPException, status
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, Request, Depends, HTTPException, Query, status
+from fastapi.responses import RedirectResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func
 from sqlalchemy.future import select
-from typing import List, Optional
-from datetime import date
+from typing import List, Literal, Optional
+from datetime import date, datetime, timedelta
+import csv
+import io
+import zlib
+
+import orjson
 
 from app.db.session import get_db
-from app.schemas.ad_click import AdClickData, AdClickRead
-from app.services import fraud_detection_service
-from app.models.advertiser import Advertiser
+from app.schemas.ad_click import AdClickData, AdClickRead, AdClickStatsRead
+from app.services import advertiser_cache
+from app.services.click_dedup import click_deduplicator
+from app.services.click_worker_pool import ClickJob, click_worker_pool
 from app.models.ad_click import AdClick
+from app.models.ad_click_rollup import AdClickHourlyRollup, AdClickDailyRollup
 from app.models.user import User
-from app.core.security import get_current_user
+from app.core.config import settings
+from app.core.security import get_current_user, get_read_db, read_sessionmaker_for
+from app.core.pagination import NEXT_CURSOR_HEADER, apply_keyset_pagination, encode_cursor
+from app.core.serialization import projection, rows_response
 
 router = APIRouter(
     prefix="/ads",
     tags=["Advertisement Tracking"]
 )
 
+# 내보내기(export) 시 출력하는 컬럼 순서
+EXPORT_COLUMNS = (
+    "id", "advertiser_id", "client_ip", "destination_url", "keyword", "match_type", "network_type",
+    "device_type", "ad_group_id", "ad_id", "keyword_id", "creative_id", "query", "created_at",
+)
+EXPORT_CHUNK_SIZE = 2000
+
+def apply_click_date_filters(query, start_date: Optional[date], end_date: Optional[date]):
+    """클릭 조회 API 들이 공통으로 사용하는 start_date / end_date 필터"""
+    if start_date:
+        query = query.where(AdClick.created_at >= start_date)
+    if end_date:
+        query = query.where(AdClick.created_at <= end_date)
+    return query
+
 @router.get("/landing/{advertiser_id}", include_in_schema=False)
 async def track_ad_click(
     advertiser_id: int,
     request: Request,
-    background_tasks: BackgroundTasks,
     ad_click_data: AdClickData = Depends(),
     db: AsyncSession = Depends(get_db)
 ):
     # 이 API는 외부(네이버)에서 호출되므로 JWT 인증을 적용하지 않습니다.
-    query = select(Advertiser).where(Advertiser.id == advertiser_id)
-    result = await db.execute(query)
-    advertiser = result.scalar_one_or_none()
+    # 광고주 정보는 거의 바뀌지 않으므로 캐시를 먼저 확인합니다.
+    advertiser = await advertiser_cache.get_advertiser(db, advertiser_id)
 
     if not advertiser or not advertiser.is_active:
         raise HTTPException(status_code=404, detail="Advertiser not found or not active")
@@ -38,15 +62,15 @@ async def track_ad_click(
         raise HTTPException(status_code=400, detail="Invalid customer ID for this tracking link")
 
     client_ip = request.client.host
-    
-    background_tasks.add_task(
-        fraud_detection_service.process_ad_click,
-        db,
-        client_ip,
-        advertiser,
-        ad_click_data
-    )
-    
+    clicked_at = datetime.now()
+
+    # 짧은 간격 안의 반복 클릭은 카운터에만 반영하고 저장은 생략합니다. 리다이렉트는 그대로 합니다.
+    if settings.CLICK_DEDUP_ENABLED and await click_deduplicator.suppress(advertiser, client_ip, ad_click_data, clicked_at):
+        return RedirectResponse(url=str(ad_click_data.destination_url))
+
+    # 요청 세션은 응답과 함께 닫히므로 넘기지 않고, 워커 풀이 자체 세션으로 처리합니다.
+    await click_worker_pool.submit(ClickJob(client_ip, advertiser, ad_click_data, clicked_at))
+
     return RedirectResponse(url=str(ad_click_data.destination_url))
 
 @router.get("/clicks", response_model=List[AdClickRead])
@@ -55,11 +79,15 @@ async def get_ad_clicks_for_advertiser(
     end_date: Optional[date] = None,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     로그인된 사용자의 광고주 계정에 대한 광고 클릭 로그 목록을 조회합니다.
+    - 다음 페이지가 있으면 응답 헤더 X-Next-Cursor 로 커서를 돌려줍니다.
+    - cursor 를 넘기면 skip 대신 커서 기준으로 조회하여 깊은 페이지도 첫 페이지와 같은 비용으로 조회합니다.
+    - 응답에 필요한 컬럼만 조회하여 ORM 객체 / Pydantic 검증 없이 바로 JSON 으로 직렬화합니다.
     """
     if not current_user.advertiser_id:
         raise HTTPException(
@@ -68,15 +96,131 @@ async def get_ad_clicks_for_advertiser(
         )
 
     advertiser_id = current_user.advertiser_id
-    query = select(AdClick).where(AdClick.advertiser_id == advertiser_id)
+    query = select(*projection(AdClickRead, AdClick)).where(AdClick.advertiser_id == advertiser_id)
+    query = apply_click_date_filters(query, start_date, end_date)
+
+    query = query.order_by(AdClick.created_at.desc(), AdClick.id.desc())
+    if cursor:
+        query = apply_keyset_pagination(query, AdClick.created_at, AdClick.id, cursor)
+    else:
+        query = query.offset(skip)
+    query = query.limit(limit)
+    
+    result = await db.execute(query)
+    clicks = result.all()
+    headers = {}
+    if clicks and len(clicks) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(clicks[-1].created_at, clicks[-1].id)
+    return rows_response(AdClickRead, clicks, headers)
+
+@router.get("/stats", response_model=List[AdClickStatsRead])
+async def get_ad_click_stats_for_advertiser(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    granularity: Literal["hour", "day"] = "day",
+    group_by: List[Literal["keyword", "device_type", "network_type", "match_type"]] = Query(default=[]),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    로그인된 사용자의 광고주 계정에 대한 클릭 집계를 조회합니다.
+    - 원본 클릭이 아닌 시간/일 단위 집계 테이블을 읽으므로 비용이 클릭 수가 아닌 버킷 수에 비례합니다.
+    - end_date 는 해당 날짜 전체를 포함합니다.
+    - group_by 로 keyword, device_type, network_type, match_type 별로 나누어 볼 수 있습니다.
+    """
+    if not current_user.advertiser_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User is not linked to an advertiser."
+        )
 
+    rollup = AdClickHourlyRollup if granularity == "hour" else AdClickDailyRollup
+    dimensions = [getattr(rollup, dimension) for dimension in dict.fromkeys(group_by)]
+    query = (
+        select(rollup.bucket_start, *dimensions, func.sum(rollup.click_count).label("click_count"))
+        .where(rollup.advertiser_id == current_user.advertiser_id)
+        .group_by(rollup.bucket_start, *dimensions)
+        .order_by(rollup.bucket_start, *dimensions)
+    )
     if start_date:
-        query = query.where(AdClick.created_at >= start_date)
+        query = query.where(rollup.bucket_start >= start_date)
     if end_date:
-        query = query.where(AdClick.created_at <= end_date)
-        
-    query = query.order_by(AdClick.created_at.desc()).offset(skip).limit(limit)
-    
+        query = query.where(rollup.bucket_start < end_date + timedelta(days=1))
+
     result = await db.execute(query)
-    clicks = result.scalars().all()
-    return clicks
\ No newline at end of file
+    return [dict(row._mapping) for row in result.all()]
+
+def _encode_ndjson(rows) -> bytes:
+    return b"".join(orjson.dumps(dict(zip(EXPORT_COLUMNS, row))) + b"\n" for row in rows)
+
+def _encode_csv(rows, header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+async def _stream_click_export(query, export_format: str, use_gzip: bool, session_factory):
+    """
+    서버 측 커서로 클릭을 일정 크기씩 읽어 바로 인코딩하여 내보냅니다.
+    요청 의존성의 세션은 응답 전송 전에 닫히므로 스트리밍 전용 세션을 따로 엽니다.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if use_gzip else None
+    header_pending = export_format == "csv"
+
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        async for rows in result.partitions():
+            if export_format == "csv":
+                chunk = _encode_csv(rows, header_pending)
+                header_pending = False
+            else:
+                chunk = _encode_ndjson(rows)
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    if header_pending:
+        chunk = _encode_csv([], header=True)
+        yield compressor.compress(chunk) + compressor.flush() if compressor else chunk
+    elif compressor:
+        yield compressor.flush()
+
+@router.get("/clicks/export")
+async def export_ad_clicks_for_advertiser(
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    로그인된 사용자의 광고주 계정에 대한 클릭 로그 전체를 NDJSON 또는 CSV 로 스트리밍합니다.
+    - 기간 필터는 /ads/clicks 와 동일한 start_date / end_date 규칙을 따릅니다.
+    - gzip=true 이면 gzip 으로 압축하여 내려줍니다.
+    """
+    if not current_user.advertiser_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User is not linked to an advertiser."
+        )
+
+    columns = [getattr(AdClick, column) for column in EXPORT_COLUMNS]
+    query = select(*columns).where(AdClick.advertiser_id == current_user.advertiser_id)
+    query = apply_click_date_filters(query, start_date, end_date)
+    query = query.order_by(AdClick.created_at, AdClick.id)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"ad_clicks_{current_user.advertiser_id}.{format}"
+    if gzip:
+        media_type = "application/gzip"
+        filename += ".gz"
+
+    return StreamingResponse(
+        _stream_click_export(query, format, gzip, read_sessionmaker_for(current_user.id, request)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
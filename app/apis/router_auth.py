@@ -29,6 +29,8 @@ async def login_with_social_provider(
         provider=provider,
         user_profile=user_profile
     )
+    # 로그인 시 닉네임 / 프로필 이미지가 갱신될 수 있으므로 캐시된 사용자 정보를 버립니다.
+    security.invalidate_cached_user(user.id)
     access_token = security.create_access_token(data={"sub": str(user.id)})
     refresh_token = security.create_refresh_token(data={"sub": str(user.id)})
     return {
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import List, Optional
 
-from app.db.session import get_db
 from app.models.blocked_ip_log import BlockedIpLog
 from app.models.user import User
 from app.schemas.blocked_ip_log import BlockedIpLogRead
-from app.core.security import get_current_user
+from app.core.security import get_current_user, get_read_db
+from app.core.pagination import NEXT_CURSOR_HEADER, apply_keyset_pagination, encode_cursor
+from app.core.serialization import projection, rows_response
 
 router = APIRouter(
     prefix="/blocked-ips",
@@ -18,11 +19,15 @@ router = APIRouter(
 async def get_blocked_ips_for_advertiser(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     로그인된 사용자의 광고주 계정에서 차단된 IP 로그 목록을 조회합니다.
+    - 다음 페이지가 있으면 응답 헤더 X-Next-Cursor 로 커서를 돌려줍니다.
+    - cursor 를 넘기면 skip 대신 커서 기준으로 조회합니다.
+    - 응답에 필요한 컬럼만 조회하여 바로 JSON 으로 직렬화합니다.
     """
     if not current_user.advertiser_id:
         raise HTTPException(
@@ -32,13 +37,19 @@ async def get_blocked_ips_for_advertiser(
 
     advertiser_id = current_user.advertiser_id
     query = (
-        select(BlockedIpLog)
+        select(*projection(BlockedIpLogRead, BlockedIpLog))
         .where(BlockedIpLog.advertiser_id == advertiser_id)
-        .order_by(BlockedIpLog.blocked_at.desc())
-        .offset(skip)
-        .limit(limit)
+        .order_by(BlockedIpLog.blocked_at.desc(), BlockedIpLog.id.desc())
     )
+    if cursor:
+        query = apply_keyset_pagination(query, BlockedIpLog.blocked_at, BlockedIpLog.id, cursor)
+    else:
+        query = query.offset(skip)
+    query = query.limit(limit)
     
     result = await db.execute(query)
-    blocked_ips = result.scalars().all()
-    return blocked_ips
\ No newline at end of file
+    blocked_ips = result.all()
+    headers = {}
+    if blocked_ips and len(blocked_ips) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(blocked_ips[-1].blocked_at, blocked_ips[-1].id)
+    return rows_response(BlockedIpLogRead, blocked_ips, headers)
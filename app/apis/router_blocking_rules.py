@@ -2,12 +2,20 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List
+from datetime import datetime, timedelta
+import asyncio
+import time
 
-from app.db.session import get_db
+from app.db.session import AsyncReadSessionLocal, get_db
 from app.models.blocking_rule import BlockingRule
 from app.models.user import User
-from app.schemas.blocking_rule import BlockingRuleCreate, BlockingRuleRead, BlockingRuleUpdate
-from app.core.security import get_current_user
+from app.schemas.blocking_rule import (
+    BlockingRuleBacktestRead, BlockingRuleBacktestRequest, BlockingRuleCreate, BlockingRuleRead, BlockingRuleUpdate,
+)
+from app.core.security import get_current_user, get_read_db
+from app.services import rule_backtest_service
+from app.services.rule_registry import blocking_rule_registry
+from app.core.serialization import projection, rows_response
 
 router = APIRouter(
     prefix="/blocking-rules",
@@ -23,6 +31,14 @@ def check_user_advertiser_link(current_user: User):
         )
     return current_user.advertiser_id
 
+async def refresh_rule_registry(db: AsyncSession, advertiser_id: int):
+    """
+    규칙 변경 후 이 워커의 클릭 처리용 규칙 레지스트리를 즉시 갱신하는 헬퍼 함수
+    (다른 워커는 커밋 전에 올린 규칙 버전으로 변경을 감지합니다.)
+    """
+    blocking_rule_registry.invalidate(advertiser_id)
+    await blocking_rule_registry.refresh(db, advertiser_id)
+
 @router.post("/", response_model=BlockingRuleRead, status_code=status.HTTP_201_CREATED)
 async def create_blocking_rule_for_advertiser(
     rule_in: BlockingRuleCreate,
@@ -39,24 +55,56 @@ async def create_blocking_rule_for_advertiser(
         advertiser_id=advertiser_id
     )
     db.add(new_rule)
+    await blocking_rule_registry.bump_version(db, advertiser_id)
     await db.commit()
     await db.refresh(new_rule)
+    await refresh_rule_registry(db, advertiser_id)
     return new_rule
 
 @router.get("/", response_model=List[BlockingRuleRead])
 async def get_blocking_rules_for_advertiser(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     로그인된 사용자의 광고주 계정에 속한 모든 차단 규칙 목록을 조회합니다.
+    응답에 필요한 컬럼만 조회하여 바로 JSON 으로 직렬화합니다.
     """
     advertiser_id = check_user_advertiser_link(current_user)
 
-    query = select(BlockingRule).where(BlockingRule.advertiser_id == advertiser_id)
+    query = select(*projection(BlockingRuleRead, BlockingRule)).where(BlockingRule.advertiser_id == advertiser_id)
     result = await db.execute(query)
-    rules = result.scalars().all()
-    return rules
+    return rows_response(BlockingRuleRead, result.all())
+
+@router.post("/backtest", response_model=BlockingRuleBacktestRead)
+async def backtest_blocking_rules(
+    backtest_in: BlockingRuleBacktestRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    후보 차단 규칙들을 최근 days 일간의 클릭 기록에 적용해 보고, 차단됐을 IP(대역)와 첫 차단 시각, 오탐 추정치를 돌려줍니다.
+    실제 규칙이나 차단 목록은 변경하지 않습니다.
+    """
+    advertiser_id = check_user_advertiser_link(current_user)
+    end = datetime.now()
+    start = end - timedelta(days=backtest_in.days)
+    started = time.perf_counter()
+
+    # 과거 기록만 읽으므로 POST 요청이지만 복제 지연과 무관하게 읽기 복제본을 사용합니다.
+    async with AsyncReadSessionLocal() as db:
+        history = await rule_backtest_service.load_click_history(db, advertiser_id, start, end)
+    results = await asyncio.to_thread(
+        rule_backtest_service.backtest, history, backtest_in.candidates, backtest_in.sample_limit
+    )
+
+    return {
+        "start": start,
+        "end": end,
+        "clicks_scanned": history.clicks,
+        "ips_scanned": len(history.ips),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "results": results,
+    }
 
 @router.put("/{rule_id}", response_model=BlockingRuleRead)
 async def update_blocking_rule(
@@ -81,8 +129,10 @@ async def update_blocking_rule(
     for key, value in update_data.items():
         setattr(rule_to_update, key, value)
     
+    await blocking_rule_registry.bump_version(db, advertiser_id)
     await db.commit()
     await db.refresh(rule_to_update)
+    await refresh_rule_registry(db, advertiser_id)
     return rule_to_update
 
 @router.delete("/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -104,5 +154,7 @@ async def delete_blocking_rule(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blocking rule not found")
         
     await db.delete(rule_to_delete)
+    await blocking_rule_registry.bump_version(db, advertiser_id)
     await db.commit()
+    await refresh_rule_registry(db, advertiser_id)
     return None
\ No newline at end of file
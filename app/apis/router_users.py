@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 
 from app.db.session import get_db
-from app.core.security import get_current_user
+from app.core.security import get_current_user, invalidate_cached_user
 from app.models.user import User
 from app.models.advertiser import Advertiser
 from app.schemas.user import UserRead
 from app.schemas.advertiser import AdvertiserCreate
+from app.services import advertiser_cache
 
 router = APIRouter()
 
@@ -51,10 +53,13 @@ async def link_user_to_advertiser(
     db.add(new_advertiser)
     await db.commit()
     await db.refresh(new_advertiser)
+    # 해당 ID가 '없음'으로 캐시되어 있을 수 있으므로 무효화합니다.
+    advertiser_cache.invalidate_advertiser(new_advertiser.id)
 
     # 현재 사용자와 새 광고주 연결
     current_user.advertiser_id = new_advertiser.id
     await db.commit()
+    invalidate_cached_user(current_user.id)
     await db.refresh(current_user)
     
     return current_user
\ No newline at end of file
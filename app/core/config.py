@@ -8,11 +8,35 @@ class Settings(BaseSettings):
     DB_HOST: str
     DB_PORT: str
     DB_NAME: str
+    # 지정하면 위 DB_* 값 대신 이 URL 로 접속합니다. (벤치마크용 로컬 SQLite 등)
+    DATABASE_URL_OVERRIDE: str | None = None
+    # DB 커넥션 풀 settings (기본 엔진)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    # 조회 API 용 읽기 복제본. 비워 두면 기본 엔진으로 조회합니다.
+    READ_REPLICA_DATABASE_URL: str | None = None
+    READ_DB_POOL_SIZE: int = 5
+    READ_DB_MAX_OVERFLOW: int = 10
+    # 사용자가 데이터를 변경한 뒤 이 시간 동안은 그 사용자의 조회를 기본 엔진으로 보냅니다. (복제 지연 대비)
+    READ_YOUR_WRITES_SECONDS: float = 5
 
     # Naver Ad API settings
     NAVER_AD_API_KEY: str
     NAVER_AD_SECRET_KEY: str
     NAVER_AD_CUSTOMER_ID: str | None = None
+    # IP 차단 API 호출 한도 (고객 ID별 토큰 버킷) 및 재시도 설정
+    NAVER_API_RATE_PER_SECOND: float = 5
+    NAVER_API_BURST: int = 10
+    NAVER_API_MAX_RETRIES: int = 4
+    NAVER_API_BACKOFF_BASE_SECONDS: float = 0.5
+    NAVER_API_BACKOFF_MAX_SECONDS: float = 30
+    # IP 차단 아웃박스 워커 설정
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 2
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETRY_DELAY_SECONDS: float = 30
+    OUTBOX_CLAIM_TIMEOUT_SECONDS: float = 300
 
     # Naver Social Login settings
     NAVER_CLIENT_ID: str
@@ -26,11 +50,129 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     ALGORITHM: str = "HS256"
+    # 인증 캐시 settings (검증된 토큰 / 사용자 정보)
+    TOKEN_CACHE_MAXSIZE: int = 10000
+    USER_CACHE_MAXSIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 60
+    # 소셜 액세스 토큰 -> 프로필 캐시 (재시도된 로그인용)
+    SOCIAL_PROFILE_CACHE_MAXSIZE: int = 10000
+    SOCIAL_PROFILE_CACHE_TTL_SECONDS: float = 60
+
+    # 외부 API(네이버/카카오) HTTP 커넥션 풀 settings
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 3
+    HTTP_TIMEOUT_SECONDS: float = 10
+    # h2 패키지가 설치되어 있어야 적용됩니다.
+    HTTP_ENABLE_HTTP2: bool = False
+
+    # 부정클릭 탐지 클릭 카운터 settings
+    # 메모리에 보관하는 최대 시간 범위(분). 이보다 긴 규칙은 DB 집계로 처리합니다.
+    CLICK_COUNTER_MAX_WINDOW_MINUTES: int = 1440
+    # (광고주, IP) 하나당 보관하는 최대 클릭 타임스탬프 수
+    CLICK_COUNTER_MAX_EVENTS_PER_KEY: int = 10000
+    # 클릭 카운터 / 차단 IP 인덱스 저장소: "memory"(프로세스별) 또는 "shared"(같은 호스트의 워커들이 mmap 파일 공유)
+    CLICK_STATE_BACKEND: str = "memory"
+    # 비워 두면 /dev/shm (없으면 임시 디렉터리)을 사용합니다.
+    SHARED_STATE_DIR: str | None = None
+    SHARED_STATE_NAME: str = "board_api"
+    SHARED_STATE_LOCK_STRIPES: int = 256
+    # shared 카운터는 버킷 단위로 세며, 이보다 긴 규칙은 DB 집계로 처리합니다.
+    SHARED_CLICK_COUNTER_MAX_WINDOW_MINUTES: int = 60
+    SHARED_CLICK_COUNTER_BUCKET_SECONDS: int = 10
+    SHARED_CLICK_COUNTER_SLOTS: int = 16384
+    SHARED_BLOCKED_IP_SLOTS: int = 262144
+
+    # 차단 대역 자동 통합 settings
+    # 같은 대역에서 차단된 IP가 임계치 이상이면 개별 IP 대신 대역 전체를 차단합니다.
+    BLOCK_AGGREGATION_ENABLED: bool = True
+    # 네이버 제외 IP 로 등록할 수 있는 옥텟 단위 IPv4 대역(8, 16, 24)만 통합합니다.
+    # IPv6 대역은 네이버에 등록할 수 없으므로 기본값은 통합하지 않음(None)입니다.
+    BLOCK_AGGREGATION_IPV4_PREFIX_LENGTH: int = 24
+    BLOCK_AGGREGATION_IPV6_PREFIX_LENGTH: int | None = None
+    BLOCK_AGGREGATION_THRESHOLD: int = 4
+
+    # 클릭 로그 일괄 저장(배치 INSERT) settings
+    CLICK_INGEST_BATCH_SIZE: int = 500
+    CLICK_INGEST_FLUSH_INTERVAL_SECONDS: float = 1.0
+    CLICK_INGEST_QUEUE_MAXSIZE: int = 100000
+    # 일괄 저장 실패 시 재시도 횟수 / 백오프, 끝내 저장하지 못한 행을 보관하는 파일
+    CLICK_INGEST_MAX_RETRIES: int = 3
+    CLICK_INGEST_RETRY_BACKOFF_SECONDS: float = 0.5
+    CLICK_INGEST_DEAD_LETTER_PATH: str = "./spill/click_rows.jsonl"
+
+    # 클릭 처리(부정클릭 판정) 워커 풀 settings
+    # 워커 수는 DB 커넥션 풀 크기(DB_POOL_SIZE + DB_MAX_OVERFLOW)보다 작게 두어 API 요청용 커넥션을 남겨 둡니다.
+    CLICK_WORKER_CONCURRENCY: int = 8
+    CLICK_WORKER_QUEUE_MAXSIZE: int = 10000
+    # 큐가 가득 찼을 때의 처리 방식: "drop"(버림), "spill"(디스크에 기록 후 나중에 처리),
+    # "degrade"(클릭 로그와 카운터만 기록하고 규칙 평가는 생략)
+    CLICK_WORKER_OVERFLOW_POLICY: str = "degrade"
+    # 워커 프로세스마다 이 경로 뒤에 .{pid} 를 붙인 파일에 기록하며, 최대 크기도 프로세스별입니다.
+    CLICK_WORKER_SPILL_PATH: str = "./spill/click_jobs.jsonl"
+    CLICK_WORKER_SPILL_MAX_BYTES: int = 100 * 1024 * 1024
+
+    # 랜딩 중복 클릭 제거 settings
+    # 같은 IP / 광고 / 키워드 / 소재의 반복 클릭을 이 간격(초) 동안 ad_clicks 에 저장하지 않고
+    # 카운터와 ad_click_duplicates(초 단위 반복 횟수)에만 기록합니다.
+    CLICK_DEDUP_ENABLED: bool = False
+    CLICK_DEDUP_INTERVAL_SECONDS: float = 1.0
+    CLICK_DEDUP_CACHE_MAXSIZE: int = 100000
+
+    # ad_clicks 파티션 / 보존 기간 settings
+    # MySQL 에서 ad_clicks 를 created_at 기준 RANGE 파티션으로 관리할지 여부 (최초 변환 시 테이블 재작성)
+    AD_CLICKS_PARTITIONING_ENABLED: bool = False
+    # 파티션 단위: "day" 또는 "month"
+    AD_CLICKS_PARTITION_GRANULARITY: str = "month"
+    AD_CLICKS_PARTITIONS_AHEAD: int = 3
+    # 보존 기간(일). 0 이하이면 정리 작업을 하지 않습니다.
+    AD_CLICKS_RETENTION_DAYS: int = 0
+    AD_CLICKS_RETENTION_INTERVAL_SECONDS: float = 3600
+    AD_CLICKS_ARCHIVE_DIR: str = "./archive/ad_clicks"
+    AD_CLICKS_ARCHIVE_CHUNK_SIZE: int = 50000
+    # 파티션이 없는 테이블에서 만료 행을 지울 때 한 트랜잭션에서 지우는 최대 행 수
+    AD_CLICKS_DELETE_CHUNK_SIZE: int = 10000
+
+    # 차단 규칙 백테스트 settings
+    # 한 번에 메모리로 읽어 들이는 최대 클릭 수와 스트리밍 청크 크기
+    BACKTEST_MAX_CLICKS: int = 5_000_000
+    BACKTEST_CHUNK_SIZE: int = 50000
+    # 임계치를 이 비율 이하로만 넘은 대상을 오탐 후보로 봅니다. (예: 0.25 -> max_clicks 의 125% 이하)
+    BACKTEST_BORDERLINE_RATIO: float = 0.25
+
+    # 배치 이상 탐지(클릭 패턴 점수) 작업 settings
+    ANOMALY_SCORING_ENABLED: bool = False
+    ANOMALY_SCORING_INTERVAL_SECONDS: float = 300
+    # 점수 계산에 사용하는 최근 클릭 구간(분)과 IP당 최소 클릭 수
+    ANOMALY_LOOKBACK_MINUTES: int = 60
+    ANOMALY_MIN_CLICKS: int = 5
+    ANOMALY_CHUNK_SIZE: int = 50000
+    # 광고주 한 곳에서 한 번에 메모리로 읽는 최대 클릭 수. 넘는 광고주는 이번 주기에 건너뜁니다.
+    ANOMALY_MAX_CLICKS_PER_ADVERTISER: int = 2_000_000
+    # 버스트 판정 구간(초): 이 구간 안에 몰린 클릭 비율을 버스트 지표로 씁니다.
+    ANOMALY_BURST_SECONDS: int = 60
+    # 지정하면 이 점수 이상인 IP를 자동으로 차단합니다. (0 ~ 1, 비워 두면 점수만 기록)
+    ANOMALY_BLOCK_SCORE: float | None = None
+
+    # 랜딩 리다이렉트용 광고주 캐시 settings
+    ADVERTISER_CACHE_MAXSIZE: int = 10000
+    ADVERTISER_CACHE_TTL_SECONDS: float = 300
+    # 존재하지 않는 광고주 ID 에 대한 캐시 유지 시간
+    ADVERTISER_CACHE_NEGATIVE_TTL_SECONDS: float = 30
+
+    # 차단 규칙 레지스트리 settings
+    # 광고주의 규칙 버전을 확인하는 주기. 다른 워커에서 변경된 규칙이 반영되기까지의 최대 지연 시간입니다.
+    RULE_REGISTRY_VERSION_CHECK_SECONDS: float = 2
+    # 버전과 관계없이 규칙 전체를 다시 읽는 주기
+    RULE_REGISTRY_TTL_SECONDS: float = 30
     
     # 위 필드들을 조합하여 DATABASE_URL을 계산
     @computed_field
     @property
     def DATABASE_URL(self) -> str:
+        if self.DATABASE_URL_OVERRIDE:
+            return self.DATABASE_URL_OVERRIDE
         return f"mysql+aiomysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
     
     class Config:
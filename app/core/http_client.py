@@ -0,0 +1,123 @@
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+# 외부 API 별 장기 유지 클라이언트의 기본 주소
+UPSTREAMS = {
+    "naver_ad": "https://api.searchad.naver.com",
+    "naver_openapi": "https://openapi.naver.com",
+    "kakao": "https://kapi.kakao.com",
+}
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """실제 트랜스포트를 감싸 요청 수, 진행 중인 요청 수, 오류 수를 집계합니다."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+        self.in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.requests_total += 1
+        try:
+            return await self._inner.handle_async_request(request)
+        except Exception:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+    def stats(self) -> dict:
+        stats = {
+            "in_flight": self.in_flight,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+        }
+        # httpx 기본 트랜스포트인 경우 커넥션 풀 상태도 함께 제공합니다.
+        pool = getattr(self._inner, "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        if pool is not None:
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for conn in connections if conn.is_idle())
+        return stats
+
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_transports: Dict[str, InstrumentedTransport] = {}
+_transport_overrides: Dict[str, httpx.AsyncBaseTransport] = {}
+
+
+def _http2_enabled() -> bool:
+    if not settings.HTTP_ENABLE_HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        print("경고: HTTP_ENABLE_HTTP2 가 설정되었지만 h2 패키지가 없어 HTTP/1.1 로 동작합니다.")
+        return False
+    return True
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    inner = _transport_overrides.get(name) or _transport_overrides.get("*")
+    if inner is None:
+        inner = httpx.AsyncHTTPTransport(
+            http2=_http2_enabled(),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+    transport = InstrumentedTransport(inner)
+    _transports[name] = transport
+    return httpx.AsyncClient(
+        base_url=UPSTREAMS[name],
+        transport=transport,
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS),
+    )
+
+
+def set_transport_override(transport: Optional[httpx.AsyncBaseTransport], name: str = "*") -> None:
+    """
+    지정한 외부 API(기본값: 전체)에 사용할 트랜스포트를 교체합니다.
+    테스트나 벤치마크에서 httpx.MockTransport 를 주입할 때 사용하며, 이후 새로 만드는 클라이언트부터 적용됩니다.
+    """
+    if transport is None:
+        _transport_overrides.pop(name, None)
+    else:
+        _transport_overrides[name] = transport
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """외부 API 별 공유 클라이언트를 반환합니다. 아직 없으면 생성합니다."""
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _build_client(name)
+        _clients[name] = client
+    return client
+
+
+async def startup() -> None:
+    """앱 시작 시 모든 외부 API 클라이언트를 미리 생성합니다."""
+    for name in UPSTREAMS:
+        get_client(name)
+
+
+async def shutdown() -> None:
+    """앱 종료 시 모든 클라이언트와 커넥션 풀을 닫습니다."""
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
+    _transports.clear()
+
+
+def pool_stats() -> dict:
+    return {name: transport.stats() for name, transport in _transports.items()}
@@ -0,0 +1,39 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+# 다음 페이지 커서를 전달하는 응답 헤더
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """(정렬 기준 시각, id) 를 클라이언트에 전달할 불투명한 커서 문자열로 만듭니다."""
+    raw = json.dumps({"t": timestamp.isoformat(), "i": row_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(data["t"]), int(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+
+
+def apply_keyset_pagination(query, timestamp_column, id_column, cursor: str):
+    """
+    (timestamp, id) 내림차순 정렬 기준으로 커서 이후의 행만 조회하도록 조건을 추가합니다.
+    인덱스를 탈 수 있도록 행 생성자 비교 대신 OR 조건으로 풀어 씁니다.
+    """
+    timestamp, row_id = decode_cursor(cursor)
+    return query.where(
+        or_(
+            timestamp_column < timestamp,
+            and_(timestamp_column == timestamp, id_column < row_id),
+        )
+    )
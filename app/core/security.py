@@ -1,13 +1,17 @@
+import math
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
+from app.core.cache import MISSING, TTLCache
 from app.core.config import settings
-from app.db.session import get_db
+from app.db.session import AsyncReadSessionLocal, AsyncSessionLocal, get_db, has_read_replica
 from app.models.user import User
 
 security_scheme = HTTPBearer()
@@ -33,16 +37,40 @@ def create_refresh_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(
-    db: AsyncSession = Depends(get_db), 
-    credentials: HTTPAuthorizationCredentials = Depends(security_scheme)
-) -> User:
-    
-    # 디버깅을 위해 토큰 검증 시 사용하는 SECRET_KEY 앞 5자리를 출력합니다.
-    print(f"\n--- [토큰 검증 시점] 사용된 SECRET_KEY (앞 5자리): {settings.SECRET_KEY[:5]}... ---")
-    
-    token = credentials.credentials
-    
+# 검증이 끝난 토큰 -> (user_id, 만료 시각) 캐시. 항목별 TTL 은 토큰의 exp 까지로 제한됩니다.
+_token_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_MAXSIZE,
+    ttl_seconds=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
+)
+# user_id -> 사용자 컬럼 값 스냅샷 캐시
+_user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAXSIZE,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+)
+
+# 최근에 데이터를 변경한 사용자 ID. 이 기간 동안은 복제본 대신 기본 엔진에서 조회합니다.
+# 이 표시는 워커 프로세스별이므로, 다른 워커 / 호스트로 간 다음 요청을 위해 같은 시각을 쿠키와 응답 헤더로도 내려줍니다.
+# 클라이언트가 쿠키를 유지하거나 헤더 값을 다음 요청에 그대로 보내면 어느 워커에서든 기본 엔진으로 조회합니다.
+READ_YOUR_WRITES_COOKIE = "rw_until"
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes-Until"
+_recent_writers = TTLCache(
+    maxsize=settings.USER_CACHE_MAXSIZE,
+    ttl_seconds=settings.READ_YOUR_WRITES_SECONDS,
+)
+# 데이터를 변경하지 않는 HTTP 메서드
+_READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def _verify_token(token: str) -> int:
+    """토큰을 검증하고 user_id 를 반환합니다. 이미 검증한 토큰은 서명 검증을 생략합니다."""
+    now = time.time()
+    cached = _token_cache.get(token)
+    if cached is not MISSING:
+        user_id, expires_at = cached
+        if expires_at > now:
+            return user_id
+        _token_cache.invalidate(token)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token signature is invalid or has expired")
+
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -51,14 +79,89 @@ async def get_current_user(
         if user_id_from_payload is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token is missing user identifier")
 
-    except JWTError as e:
-        print(f"--- !!!오류!!!: JWT 디코딩 실패. 원인: {e} ---") # 실제 오류 원인 출력
+    except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token signature is invalid or has expired")
-    
+
     user_id = int(user_id_from_payload)
+    expires_at = payload.get("exp")
+    if expires_at is not None:
+        _token_cache.set(token, (user_id, float(expires_at)), ttl_seconds=float(expires_at) - now)
+    return user_id
+
+def _snapshot_user(user: User) -> dict:
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+def invalidate_cached_user(user_id: int):
+    """사용자 정보가 바뀌었을 때 캐시된 사용자 스냅샷을 제거합니다."""
+    _user_cache.invalidate(user_id)
+
+def mark_user_write(user_id: int, response: Optional[Response] = None):
+    """
+    사용자가 데이터를 변경했음을 기록하여 잠시 동안 그 사용자의 조회가 변경 내용을 보도록 합니다.
+    response 를 넘기면 만료 시각을 쿠키 / 헤더로 내려 다른 워커에서도 알 수 있게 합니다.
+    """
+    _recent_writers.set(user_id, True)
+    if response is None:
+        return
+    until = f"{time.time() + settings.READ_YOUR_WRITES_SECONDS:.3f}"
+    response.set_cookie(
+        READ_YOUR_WRITES_COOKIE, until,
+        max_age=math.ceil(settings.READ_YOUR_WRITES_SECONDS), httponly=True, samesite="lax",
+    )
+    response.headers[READ_YOUR_WRITES_HEADER] = until
+
+def _client_wrote_recently(request: Request) -> bool:
+    value = request.headers.get(READ_YOUR_WRITES_HEADER) or request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    try:
+        return value is not None and float(value) > time.time()
+    except ValueError:
+        return False
+
+def read_sessionmaker_for(user_id: int, request: Optional[Request] = None):
+    """
+    사용자의 조회에 쓸 세션메이커. 복제본이 있고 최근 변경이 없으면 복제본을 사용합니다.
+    최근 변경은 이 워커의 기록과 요청의 쿠키 / 헤더 중 하나라도 있으면 인정합니다.
+    """
+    if not has_read_replica():
+        return AsyncSessionLocal
+    if _recent_writers.get(user_id) is not MISSING or (request is not None and _client_wrote_recently(request)):
+        return AsyncSessionLocal
+    return AsyncReadSessionLocal
+
+async def get_read_db(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security_scheme)
+) -> AsyncIterator[AsyncSession]:
+    """
+    조회 전용 API 의 DB 세션 의존성입니다. 읽기 복제본이 설정되어 있으면 복제본 세션을 열고,
+    요청한 사용자가 방금 데이터를 변경했다면(read-your-writes) 기본 엔진 세션을 엽니다.
+    """
+    session_factory = read_sessionmaker_for(_verify_token(credentials.credentials), request)
+    async with session_factory() as session:
+        yield session
+
+async def get_current_user(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db), 
+    credentials: HTTPAuthorizationCredentials = Depends(security_scheme)
+) -> User:
+    user_id = _verify_token(credentials.credentials)
+    if request.method not in _READ_ONLY_METHODS:
+        # 변경 요청을 보낸 사용자의 이후 조회는 복제 지연과 관계없이 변경 내용을 보도록 합니다.
+        mark_user_write(user_id, response)
+
+    snapshot = _user_cache.get(user_id)
+    if snapshot is not MISSING:
+        # 캐시된 값으로 분리(detached) 상태의 객체를 만든 뒤 DB 조회 없이 현재 세션에 연결합니다.
+        cached_user = User(**snapshot)
+        make_transient_to_detached(cached_user)
+        return await db.merge(cached_user, load=False)
+
     user = await db.get(User, user_id)
     
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"User with id {user_id} not found")
     
-    return user
\ No newline at end of file
+    _user_cache.set(user_id, _snapshot_user(user))
+    return user
@@ -0,0 +1,20 @@
+from typing import Dict, List, Optional, Sequence, Type
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+def projection(schema: Type[BaseModel], model) -> List:
+    """응답 스키마의 필드와 같은 이름의 모델 컬럼 목록. ORM 객체 대신 필요한 컬럼만 조회할 때 사용합니다."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def rows_response(schema: Type[BaseModel], rows: Sequence, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    projection 으로 조회한 행 튜플을 Pydantic 검증 없이 orjson 으로 바로 직렬화한 JSON 응답을 만듭니다.
+    라우트의 response_model 은 문서화 용도로만 남고, 이 응답에는 적용되지 않습니다.
+    """
+    fields = tuple(schema.model_fields)
+    body = orjson.dumps([dict(zip(fields, row)) for row in rows])
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,29 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import text
+
+from app.db.session import async_engine
+
+
+@asynccontextmanager
+async def named_lock(name: str, timeout_seconds: float = 0) -> AsyncIterator[bool]:
+    """
+    여러 워커 / 호스트 중 하나만 작업하도록 MySQL 네임드 락(GET_LOCK)을 잡고, 잡았는지 여부를 돌려줍니다.
+    락은 이 컨텍스트가 쥔 커넥션 세션에 묶이므로 작업 자체는 다른 커넥션으로 해도 됩니다.
+    MySQL 이 아니면 항상 잡은 것으로 봅니다. (단일 프로세스 개발 / 벤치마크 환경)
+    """
+    if async_engine.dialect.name != "mysql":
+        yield True
+        return
+    async with async_engine.connect() as lock_conn:
+        acquired = (await lock_conn.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"), {"name": name, "timeout": timeout_seconds}
+        )).scalar()
+        if not acquired:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            await lock_conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
@@ -0,0 +1,52 @@
+from typing import Tuple
+
+from sqlalchemy import Column, Index, Table, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+from app.models.ad_click import AdClick
+from app.models.advertiser import Advertiser
+from app.models.blocked_ip_log import BlockedIpLog
+from app.models.blocking_rule import BlockingRule
+
+# 시작 시 스키마 보충 작업을 한 워커만 하도록 하는 MySQL 네임드 락과 대기 시간(초)
+SCHEMA_LOCK_NAME = "schema_upgrade"
+SCHEMA_LOCK_WAIT_SECONDS = 600
+
+
+def _index(table: Table, name: str) -> Index:
+    return next(index for index in table.indexes if index.name == name)
+
+
+# create_all 은 이미 있는 테이블에 컬럼 / 인덱스를 추가하지 않으므로,
+# 테이블이 만들어진 뒤 모델에 추가된 컬럼과 인덱스를 여기에 적어 두고 시작 시 보충합니다.
+ADDED_COLUMNS: Tuple[Column, ...] = (
+    Advertiser.__table__.c.blocking_rules_version,
+    BlockingRule.__table__.c.ipv4_prefix_length,
+    BlockingRule.__table__.c.ipv6_prefix_length,
+)
+ADDED_INDEXES: Tuple[Index, ...] = (
+    _index(AdClick.__table__, "ix_ad_clicks_advertiser_created_id"),
+    _index(BlockedIpLog.__table__, "ix_blocked_ip_logs_advertiser_blocked_id"),
+)
+
+
+def upgrade_schema(conn: Connection) -> None:
+    """
+    create_all 뒤에 run_sync 로 호출합니다. 기존 테이블에 없는 컬럼은 ALTER TABLE ... ADD COLUMN 으로,
+    없는 인덱스는 CREATE INDEX 로 추가합니다. 이미 있는 것은 건너뛰므로 매번 실행해도 됩니다.
+    """
+    inspector = inspect(conn)
+    for column in ADDED_COLUMNS:
+        table_name = column.table.name
+        if column.name in {c["name"] for c in inspector.get_columns(table_name)}:
+            continue
+        column_ddl = CreateColumn(column).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_ddl}"))
+        print(f"스키마 보충: {table_name}.{column.name} 컬럼 추가")
+    for index in ADDED_INDEXES:
+        table_name = index.table.name
+        if index.name in {i["name"] for i in inspector.get_indexes(table_name)}:
+            continue
+        index.create(conn)
+        print(f"스키마 보충: {table_name}.{index.name} 인덱스 추가")
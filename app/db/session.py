@@ -1,15 +1,59 @@
+import time
+
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from app.core import metrics
 from app.core.config import settings
 
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """커넥션을 풀에서 꺼내기까지 기다린 시간을 지표로 기록하는 커넥션 풀"""
+
+    engine_label = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.DB_POOL_CHECKOUT_DURATION.observe(time.perf_counter() - started, self.engine_label)
+
+class InstrumentedReplicaPool(InstrumentedAsyncAdaptedQueuePool):
+    engine_label = "replica"
+
+def _engine_options(pool_size: int, max_overflow: int, pool_timeout: float) -> dict:
+    return {
+        "pool_pre_ping": True,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+    }
+
 # 비동기 DB 엔진 생성
 # pool_pre_ping=True 옵션은 커넥션 풀에서 연결을 가져올 때,
 # 연결이 유효한지(예: DB서버가 재시작되지 않았는지) 미리 테스트하는 기능입니다.
 async_engine = create_async_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,
+    poolclass=InstrumentedAsyncAdaptedQueuePool,
+    **_engine_options(settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, settings.DB_POOL_TIMEOUT_SECONDS),
 )
 
+# 조회(리포팅) API 용 읽기 전용 복제본 엔진. 설정하지 않으면 기본 엔진을 함께 씁니다.
+# 별도 커넥션 풀을 쓰므로 무거운 조회가 클릭 저장 경로의 커넥션을 빼앗지 않습니다.
+if settings.READ_REPLICA_DATABASE_URL:
+    read_engine = create_async_engine(
+        settings.READ_REPLICA_DATABASE_URL,
+        poolclass=InstrumentedReplicaPool,
+        **_engine_options(
+            settings.READ_DB_POOL_SIZE, settings.READ_DB_MAX_OVERFLOW, settings.DB_POOL_TIMEOUT_SECONDS
+        ),
+    )
+else:
+    read_engine = async_engine
+
+def has_read_replica() -> bool:
+    return read_engine is not async_engine
+
 # 비동기 세션 생성을 위한 세션메이커
 # autocommit=False, autoflush=False 는 SQLAlchemy 2.0의 표준 권장사항입니다.
 AsyncSessionLocal = async_sessionmaker(
@@ -19,6 +63,13 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False,
 )
 
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    autocommit=False,
+    autoflush=False,
+)
+
 # API 요청마다 DB 세션을 생성하고, 요청이 끝나면 닫는 의존성 함수
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
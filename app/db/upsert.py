@@ -0,0 +1,91 @@
+from typing import Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def increment_upsert(dialect_name: str, model, rows: Sequence[dict], key_columns: Sequence[str], increment_columns: Sequence[str]):
+    """
+    키가 이미 있으면 지정한 컬럼에 값을 더하고, 없으면 새로 넣는 다중 행 upsert 문을 만듭니다.
+    MySQL 은 INSERT ... ON DUPLICATE KEY UPDATE, SQLite / PostgreSQL 은 ON CONFLICT DO UPDATE 를 사용합니다.
+    """
+    table = model.__table__
+    if dialect_name == "mysql":
+        stmt = mysql.insert(table).values(list(rows))
+        return stmt.on_duplicate_key_update(
+            {column: table.c[column] + stmt.inserted[column] for column in increment_columns}
+        )
+    if dialect_name in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect_name == "sqlite" else postgresql.insert
+        stmt = insert(table).values(list(rows))
+        return stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: table.c[column] + stmt.excluded[column] for column in increment_columns},
+        )
+    raise NotImplementedError(f"Upsert is not supported for dialect '{dialect_name}'")
+
+
+def replace_upsert(dialect_name: str, model, rows: Sequence[dict], key_columns: Sequence[str], update_columns: Sequence[str]):
+    """
+    키가 이미 있으면 지정한 컬럼을 새 값으로 덮어쓰고, 없으면 새로 넣는 다중 행 upsert 문을 만듭니다.
+    increment_upsert 와 같은 구문을 쓰되 값을 더하지 않고 바꿉니다.
+    """
+    table = model.__table__
+    if dialect_name == "mysql":
+        stmt = mysql.insert(table).values(list(rows))
+        return stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in update_columns})
+    if dialect_name in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect_name == "sqlite" else postgresql.insert
+        stmt = insert(table).values(list(rows))
+        return stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: stmt.excluded[column] for column in update_columns},
+        )
+    raise NotImplementedError(f"Upsert is not supported for dialect '{dialect_name}'")
+
+
+async def upsert_one(db: AsyncSession, model, values: dict, key_columns: Sequence[str], update_columns: Sequence[str]):
+    """
+    유니크 키 기준으로 한 행을 넣거나(없을 때) update_columns 를 갱신하고(있을 때) 그 행의 ORM 객체를 반환합니다.
+    - SQLite / PostgreSQL: INSERT ... ON CONFLICT DO UPDATE ... RETURNING 한 문장으로 처리합니다.
+    - MySQL: INSERT ... ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id) 로 기존 행의 id 도 lastrowid 로 받은 뒤
+      기본 키로 한 번 조회합니다. (MySQL 은 RETURNING 을 지원하지 않음)
+    - 그 밖의 DB: 조회 후 없으면 SAVEPOINT 안에서 INSERT 하고, 동시 INSERT 와 충돌하면 다시 조회합니다.
+    커밋은 호출한 쪽에서 합니다.
+    """
+    table = model.__table__
+    dialect_name = db.bind.dialect.name
+    updates = {column: values[column] for column in update_columns if column in values}
+    if "updated_at" in table.c:
+        # upsert 의 UPDATE 절에는 컬럼의 onupdate 가 적용되지 않으므로 직접 넣습니다.
+        updates["updated_at"] = func.now()
+
+    if dialect_name in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect_name == "sqlite" else postgresql.insert
+        stmt = insert(model).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=list(key_columns), set_=updates).returning(model)
+        result = await db.scalars(stmt, execution_options={"populate_existing": True})
+        return result.one()
+
+    if dialect_name == "mysql":
+        stmt = mysql.insert(table).values(**values)
+        stmt = stmt.on_duplicate_key_update(id=func.LAST_INSERT_ID(table.c.id), **updates)
+        result = await db.execute(stmt)
+        return await db.get(model, result.lastrowid, populate_existing=True)
+
+    lookup = select(model).where(*[getattr(model, column) == values[column] for column in key_columns])
+    existing = (await db.execute(lookup)).scalar_one_or_none()
+    if existing is None:
+        try:
+            async with db.begin_nested():
+                existing = model(**values)
+                db.add(existing)
+            return existing
+        except IntegrityError:
+            existing = (await db.execute(lookup)).scalar_one()
+    for column, value in updates.items():
+        setattr(existing, column, value)
+    await db.flush()
+    return existing
@@ -1,8 +1,23 @@
+import time
+
 from fastapi import FastAPI
+from fastapi.responses import Response
 from contextlib import asynccontextmanager
 
-from app.db.session import async_engine
+from app.core import http_client, metrics
+from app.core.config import settings
+from app.db.session import async_engine, read_engine, has_read_replica, AsyncSessionLocal
 from app.db.base_class import Base
+from app.db.locks import named_lock
+from app.db.schema import SCHEMA_LOCK_NAME, SCHEMA_LOCK_WAIT_SECONDS, upgrade_schema
+from app.services.click_counter import get_click_counter
+from app.services.blocked_ip_index import get_blocked_ip_index
+from app.services.click_ingest_service import click_ingest_writer
+from app.services.click_worker_pool import click_worker_pool
+from app.services.naver_block_dispatcher import naver_block_dispatcher
+from app.services.ip_block_outbox_worker import ip_block_outbox_worker
+from app.services import click_retention_service
+from app.services.anomaly_scoring_service import anomaly_scoring_job
 # 우리가 만든 모든 라우터들을 import 합니다.
 from app.apis import router_auth, router_ads, router_blocking_rules, router_blocked_ips, router_users
 
@@ -11,16 +26,46 @@ from app.apis import router_auth, router_ads, router_blocking_rules, router_bloc
 async def lifespan(app: FastAPI):
     # DB 테이블 생성을 위한 함수를 lifespan 내부로 이동
     async def create_tables():
-        async with async_engine.begin() as conn:
-            # Base.metadata.drop_all(conn) # 개발 중 테이블 구조 변경 시, 기존 테이블 삭제 후 재생성할 때 주석 해제
-            await conn.run_sync(Base.metadata.create_all)
+        # 여러 워커가 동시에 ALTER TABLE 을 실행하지 않도록 한 워커씩 차례로 처리합니다. (두 번째부터는 건너뛸 것만 남음)
+        async with named_lock(SCHEMA_LOCK_NAME, SCHEMA_LOCK_WAIT_SECONDS):
+            async with async_engine.begin() as conn:
+                # Base.metadata.drop_all(conn) # 개발 중 테이블 구조 변경 시, 기존 테이블 삭제 후 재생성할 때 주석 해제
+                await conn.run_sync(Base.metadata.create_all)
+                # 기존 테이블에 이후 추가된 컬럼 / 인덱스를 보충합니다.
+                await conn.run_sync(upgrade_schema)
 
     # 앱 시작 시
     print("애플리케이션 시작")
     await create_tables()
     print("DB 테이블 생성 또는 확인 완료")
+    await click_retention_service.maintain_partitions()
+    if settings.CLICK_STATE_BACKEND == "shared":
+        # fcntl 을 쓰므로 shared 백엔드를 선택했을 때만 import 합니다.
+        from app.services.shared_click_state import install_shared_click_state
+        await install_shared_click_state()
+    async with AsyncSessionLocal() as db:
+        restored = await get_click_counter().rebuild(db)
+        blocked = await get_blocked_ip_index().load(db)
+    print(f"클릭 카운터 복원 완료: 최근 클릭 {restored}건")
+    print(f"차단 IP 인덱스 적재 완료: {blocked}건")
+    await http_client.startup()
+    await click_ingest_writer.start()
+    await click_worker_pool.start()
+    await ip_block_outbox_worker.start()
+    await click_retention_service.click_retention_job.start()
+    await anomaly_scoring_job.start()
     yield
     # 앱 종료 시
+    await anomaly_scoring_job.stop()
+    await click_retention_service.click_retention_job.stop()
+    # 워커 풀이 남은 클릭을 처리하며 수집기와 아웃박스에 항목을 넣으므로 둘보다 먼저 종료합니다.
+    await click_worker_pool.stop()
+    print(f"클릭 처리 워커 풀 종료: {click_worker_pool.stats()}")
+    await ip_block_outbox_worker.stop()
+    await click_ingest_writer.stop()
+    print(f"클릭 로그 수집기 종료: {click_ingest_writer.stats()}")
+    await naver_block_dispatcher.drain()
+    await http_client.shutdown()
     print("애플리케이션 종료")
 
 
@@ -32,6 +77,91 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# --- 요청 지연 시간 측정 미들웨어 ---
+class RequestMetricsMiddleware:
+    """
+    요청 지연 시간과 상태 코드를 기록하는 순수 ASGI 미들웨어입니다.
+    BaseHTTPMiddleware 와 달리 요청 / 응답 본문을 감싸는 태스크나 스트림을 만들지 않으므로
+    랜딩 리다이렉트 같은 빈번한 경로에 추가 비용이 거의 없습니다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # 경로 파라미터 값이 아닌 라우트 템플릿으로 집계하여 라벨 수가 늘어나지 않게 합니다.
+            # (라우터가 매칭한 라우트를 같은 scope 에 기록합니다.)
+            route_path = getattr(scope.get("route"), "path", "unmatched")
+            metrics.HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, scope["method"], route_path)
+            metrics.HTTP_REQUESTS.inc(scope["method"], route_path, str(status_code))
+
+app.add_middleware(RequestMetricsMiddleware)
+
+# --- 백그라운드 작업 적체량 등 수집 시점에 계산하는 지표 ---
+metrics.gauge(
+    "click_worker_queue_depth", "Click processing jobs waiting for a worker",
+    callback=lambda: click_worker_pool.queue_depth
+)
+metrics.gauge(
+    "click_worker_active", "Click processing jobs currently running",
+    callback=lambda: click_worker_pool.active
+)
+metrics.gauge(
+    "click_ingest_queue_depth", "AdClick rows waiting in the ingest queue",
+    callback=lambda: click_ingest_writer.queue_depth
+)
+metrics.gauge(
+    "click_ingest_last_flush_seconds", "Latency of the last ingest flush",
+    callback=lambda: click_ingest_writer.last_flush_latency_ms / 1000
+)
+metrics.gauge(
+    "click_ingest_failed_rows", "AdClick rows that failed to be written",
+    callback=lambda: click_ingest_writer.failed_rows
+)
+metrics.gauge(
+    "naver_block_dispatch_in_flight", "Naver IP exclusion requests in flight",
+    callback=lambda: naver_block_dispatcher.in_flight
+)
+metrics.gauge(
+    "ip_block_outbox_pending_rows", "Outbox entries pending or being sent as of the last poll",
+    callback=lambda: ip_block_outbox_worker.pending_rows
+)
+metrics.gauge(
+    "anomaly_scoring_last_scored_ips", "IPs scored by the last anomaly scoring run",
+    callback=lambda: anomaly_scoring_job.last_scored
+)
+metrics.gauge(
+    "anomaly_scoring_last_run_seconds", "Duration of the last anomaly scoring run",
+    callback=lambda: anomaly_scoring_job.last_duration_ms / 1000
+)
+metrics.gauge(
+    "db_pool_checked_out_connections", "DB connections currently checked out", ("engine",),
+    callback=lambda: {
+        (engine.pool.engine_label,): engine.pool.checkedout()
+        for engine in ((async_engine, read_engine) if has_read_replica() else (async_engine,))
+    }
+)
+metrics.gauge(
+    "http_client_in_flight_requests", "Outbound HTTP requests in flight per upstream", ("upstream",),
+    callback=lambda: {(name,): stats["in_flight"] for name, stats in http_client.pool_stats().items()}
+)
+
 # --- 라우터들을 메인 앱에 모두 포함 ---
 app.include_router(router_auth.router)
 app.include_router(router_users.router)
@@ -43,4 +173,10 @@ app.include_router(router_blocking_rules.router)
 # 루트 경로 API (서버 상태 확인용)
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to Fraud Detection Solution API"}
\ No newline at end of file
+    return {"message": "Welcome to Fraud Detection Solution API"}
+
+# Prometheus 텍스트 포맷 지표
+# 지표 값은 이벤트 루프에서 갱신되므로 스레드풀이 아닌 이벤트 루프에서 읽도록 async 로 둡니다.
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -2,5 +2,9 @@ from .ad_click import AdClick
 from .blocking_rule import BlockingRule
 from .advertiser import Advertiser
 from .blocked_ip_log import BlockedIpLog
+from .ip_block_outbox import IpBlockOutbox
+from .ad_click_rollup import AdClickHourlyRollup, AdClickDailyRollup
+from .ip_anomaly_score import IpAnomalyScore
+from .ad_click_duplicate import AdClickDuplicate
 
-__all__ = ["AdClick", "BlockingRule", "Advertiser", "BlockedIpLog"]
\ No newline at end of file
+__all__ = ["AdClick", "BlockingRule", "Advertiser", "BlockedIpLog", "IpBlockOutbox", "AdClickHourlyRollup", "AdClickDailyRollup", "IpAnomalyScore", "AdClickDuplicate"]
\ No newline at end of file
@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, BigInteger
+from sqlalchemy import Column, Integer, String, ForeignKey, BigInteger, Index
 from sqlalchemy.sql import func
 from sqlalchemy.sql.sqltypes import DateTime
 
 from app.db.base_class import Base
 
+# AD_CLICKS_PARTITIONING_ENABLED 로 파티션 테이블로 바뀐 MySQL 에서는 실제 스키마가 아래 선언과 다릅니다.
+# (click_retention_service.convert_to_partitioned 참고)
+# - advertiser_id 외래 키가 없습니다. 광고주 삭제 시 클릭이 남으므로 정리는 보존 기간 작업이 맡습니다.
+# - 기본 키가 (id, created_at) 입니다. id 는 계속 AUTO_INCREMENT 로 유일하므로 ORM 은 id 만으로 행을 식별합니다.
+# 파티션이 없는 DB(SQLite 등)에서 create_all 이 만드는 스키마는 선언 그대로입니다.
 class AdClick(Base):
     __tablename__ = "ad_clicks"
 
@@ -20,4 +25,9 @@ class AdClick(Base):
     keyword_id = Column(BigInteger)
     creative_id = Column(BigInteger)
     query = Column(String(255))
-    created_at = Column(DateTime, server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        # 광고주별 최신순 조회 및 커서 페이지네이션용 복합 인덱스
+        Index("ix_ad_clicks_advertiser_created_id", "advertiser_id", "created_at", "id"),
+    )
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
+
+from app.db.base_class import Base
+
+# 랜딩 중복 클릭 제거(click_dedup)로 ad_clicks 에 저장하지 않은 반복 클릭 수.
+# (광고주, IP, 초 단위 시각)마다 한 행에 누적하며, DB 기반 클릭 수 집계와 카운터 복원이 함께 더합니다.
+class AdClickDuplicate(Base):
+    __tablename__ = "ad_click_duplicates"
+
+    id = Column(Integer, primary_key=True)
+    advertiser_id = Column(Integer, nullable=False)
+    client_ip = Column(String(255), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    duplicate_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # 유니크 키가 (광고주, IP, 시각) 순이라 IP별 / 대역(LIKE) 시간 범위 집계에도 그대로 쓰입니다.
+        UniqueConstraint("advertiser_id", "client_ip", "created_at", name="uq_ad_click_duplicates_key"),
+    )
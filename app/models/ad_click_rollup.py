@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
+
+from app.db.base_class import Base
+
+# 집계 키로 사용하는 차원 컬럼 (NULL 은 유니크 키에서 서로 다른 값으로 취급되므로 빈 문자열로 저장)
+ROLLUP_DIMENSIONS = ("keyword", "device_type", "network_type", "match_type")
+
+class AdClickRollupMixin:
+    id = Column(Integer, primary_key=True)
+    advertiser_id = Column(Integer, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    keyword = Column(String(255), nullable=False, default="")
+    device_type = Column(String(50), nullable=False, default="")
+    network_type = Column(String(50), nullable=False, default="")
+    match_type = Column(String(50), nullable=False, default="")
+    click_count = Column(Integer, nullable=False, default=0)
+
+class AdClickHourlyRollup(AdClickRollupMixin, Base):
+    __tablename__ = "ad_click_rollups_hourly"
+
+    __table_args__ = (
+        UniqueConstraint(
+            "advertiser_id", "bucket_start", *ROLLUP_DIMENSIONS,
+            name="uq_ad_click_rollups_hourly_key"
+        ),
+    )
+
+class AdClickDailyRollup(AdClickRollupMixin, Base):
+    __tablename__ = "ad_click_rollups_daily"
+
+    __table_args__ = (
+        UniqueConstraint(
+            "advertiser_id", "bucket_start", *ROLLUP_DIMENSIONS,
+            name="uq_ad_click_rollups_daily_key"
+        ),
+    )
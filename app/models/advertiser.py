@@ -11,5 +11,7 @@ class Advertiser(Base):
     company_name = Column(String(255), nullable=False)
     naver_customer_id = Column(BigInteger, unique=True, index=True, nullable=False)
     is_active = Column(Boolean, default=True)
+    # 차단 규칙이 바뀔 때마다 올라가는 버전. 워커들의 규칙 레지스트리가 이 값으로 변경을 감지합니다.
+    blocking_rules_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql import func
 
 from app.db.base_class import Base
@@ -10,4 +10,12 @@ class BlockedIpLog(Base):
     advertiser_id = Column(Integer, ForeignKey("advertisers.id"), nullable=False, index=True)
     ip_address = Column(String(255), nullable=False, index=True)
     memo = Column(String(255))
-    blocked_at = Column(DateTime, server_default=func.now())
\ No newline at end of file
+    blocked_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        # 여러 워커가 같은 대상을 동시에 차단해도 로그 / 아웃박스 / 네이버 호출이 한 번만 생기도록 합니다.
+        # (기존 테이블에는 중복 행을 정리한 뒤 직접 추가해야 합니다. create_all 은 기존 테이블을 바꾸지 않습니다.)
+        UniqueConstraint("advertiser_id", "ip_address", name="uq_blocked_ip_logs_advertiser_ip"),
+        # 광고주별 최신순 조회 및 커서 페이지네이션용 복합 인덱스
+        Index("ix_blocked_ip_logs_advertiser_blocked_id", "advertiser_id", "blocked_at", "id"),
+    )
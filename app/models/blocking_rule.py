@@ -12,6 +12,10 @@ class BlockingRule(Base):
     name = Column(String(255), nullable=False)
     time_window_minutes = Column(Integer, nullable=False, default=60)
     max_clicks = Column(Integer, nullable=False, default=5)
+    # 지정하면 IP 하나가 아닌 해당 길이의 대역(예: IPv4 /24, IPv6 /64) 단위로 클릭을 세고 대역을 차단합니다.
+    # 네이버에 등록할 수 없는 대역(옥텟 단위가 아닌 IPv4, IPv6)은 대역으로 세되 임계치를 넘긴 IP만 차단합니다.
+    ipv4_prefix_length = Column(Integer, nullable=True)
+    ipv6_prefix_length = Column(Integer, nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
\ No newline at end of file
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+class IpAnomalyScore(Base):
+    __tablename__ = "ip_anomaly_scores"
+
+    id = Column(Integer, primary_key=True)
+    advertiser_id = Column(Integer, ForeignKey("advertisers.id"), nullable=False)
+    client_ip = Column(String(255), nullable=False)
+    # 점수를 계산한 클릭 구간
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False)
+    click_count = Column(Integer, nullable=False)
+    # 클릭 간격의 변동계수(표준편차 / 평균). 0 에 가까울수록 일정한 간격으로 클릭한 것입니다.
+    interval_cv = Column(Float, nullable=False)
+    # 키워드 분포의 엔트로피(bit)
+    keyword_entropy = Column(Float, nullable=False)
+    # 서로 다른 (기기, 네트워크) 조합 수
+    device_diversity = Column(Integer, nullable=False)
+    # 가장 붐빈 버스트 구간에 몰린 클릭 비율
+    burstiness = Column(Float, nullable=False)
+    # 0 ~ 1, 높을수록 의심스러움
+    score = Column(Float, nullable=False)
+    scored_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("advertiser_id", "client_ip", name="uq_ip_anomaly_scores_key"),
+        # 광고주별 고위험 IP 조회용
+        Index("ix_ip_anomaly_scores_advertiser_score", "advertiser_id", "score"),
+    )
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger, Index
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+# 아웃박스 처리 상태
+OUTBOX_STATUS_PENDING = "pending"
+OUTBOX_STATUS_SENDING = "sending"
+OUTBOX_STATUS_DONE = "done"
+OUTBOX_STATUS_FAILED = "failed"
+
+class IpBlockOutbox(Base):
+    __tablename__ = "ip_block_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    advertiser_id = Column(Integer, ForeignKey("advertisers.id"), nullable=False)
+    customer_id = Column(BigInteger, nullable=False)
+    ip_address = Column(String(255), nullable=False)
+    status = Column(String(20), nullable=False, default=OUTBOX_STATUS_PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(1024))
+    # 여러 워커가 같은 항목을 동시에 처리하지 않도록 선점한 워커의 토큰을 기록합니다.
+    claim_token = Column(String(36))
+    claimed_at = Column(DateTime)
+    next_attempt_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, server_default=func.now())
+    processed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_ip_block_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
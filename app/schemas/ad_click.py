@@ -34,4 +34,12 @@ class AdClickRead(BaseModel):
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class AdClickStatsRead(BaseModel):
+    bucket_start: datetime
+    keyword: Optional[str] = None
+    device_type: Optional[str] = None
+    network_type: Optional[str] = None
+    match_type: Optional[str] = None
+    click_count: int
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
 class BlockingRuleBase(BaseModel):
@@ -7,6 +7,11 @@ class BlockingRuleBase(BaseModel):
     time_window_minutes: Optional[int] = 60
     max_clicks: Optional[int] = 5
     is_active: Optional[bool] = True
+    # 대역 단위 규칙: 비워 두면 IP 하나 단위로 판단합니다.
+    # 네이버 제외 IP 는 옥텟 단위 와일드카드(예: 203.0.113.*)만 받으므로 IPv4 는 8 의 배수만 허용합니다.
+    # IPv6 는 대역으로 세되 대역을 표현할 수 없어 임계치를 넘긴 IP를 하나씩 차단합니다.
+    ipv4_prefix_length: Optional[int] = Field(None, ge=8, le=32, multiple_of=8)
+    ipv6_prefix_length: Optional[int] = Field(None, ge=16, le=128)
 
 class BlockingRuleCreate(BlockingRuleBase):
     name: str
@@ -23,4 +28,41 @@ class BlockingRuleRead(BlockingRuleBase):
     updated_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- 규칙 백테스트(시뮬레이션) 스키마 ---
+class BacktestCandidate(BaseModel):
+    time_window_minutes: int = Field(..., ge=1, le=1440 * 30)
+    max_clicks: int = Field(..., ge=1)
+    ipv4_prefix_length: Optional[int] = Field(None, ge=8, le=32, multiple_of=8)
+    ipv6_prefix_length: Optional[int] = Field(None, ge=16, le=128)
+
+class BlockingRuleBacktestRequest(BaseModel):
+    candidates: List[BacktestCandidate] = Field(..., min_length=1, max_length=50)
+    days: int = Field(30, ge=1, le=90)
+    # 후보별로 돌려줄 차단 예상 대상(IP 또는 대역) 수
+    sample_limit: int = Field(20, ge=0, le=1000)
+
+class BacktestBlock(BaseModel):
+    subject: str
+    first_trigger_at: datetime
+    peak_clicks: int
+    clicks_after_trigger: int
+
+class BacktestResult(BacktestCandidate):
+    blocked_subjects: int
+    # 차단 이후 발생하여 걸러졌을 클릭 수
+    blocked_clicks: int
+    first_trigger_at: Optional[datetime] = None
+    # 임계치를 근소하게 넘은 대상 수와 그 비율 (오탐 추정치)
+    borderline_subjects: int
+    false_positive_estimate: float
+    blocks: List[BacktestBlock]
+
+class BlockingRuleBacktestRead(BaseModel):
+    start: datetime
+    end: datetime
+    clicks_scanned: int
+    ips_scanned: int
+    elapsed_ms: float
+    results: List[BacktestResult]
@@ -0,0 +1,58 @@
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.models.advertiser import Advertiser
+
+
+class CachedAdvertiser(NamedTuple):
+    """랜딩 리다이렉트와 클릭 처리에 필요한 광고주 필드만 담은 스냅샷"""
+    id: int
+    is_active: bool
+    naver_customer_id: int
+
+
+_cache = TTLCache(
+    maxsize=settings.ADVERTISER_CACHE_MAXSIZE,
+    ttl_seconds=settings.ADVERTISER_CACHE_TTL_SECONDS,
+)
+
+
+async def get_advertiser(db: AsyncSession, advertiser_id: int) -> Optional[CachedAdvertiser]:
+    """
+    광고주 ID로 광고주 스냅샷을 조회합니다. 캐시에 없을 때만 DB를 조회합니다.
+    존재하지 않는 광고주도 짧은 TTL로 캐시하여 잘못된 ID가 DB를 반복 조회하지 않게 합니다.
+    """
+    cached = _cache.get(advertiser_id)
+    if cached is not MISSING:
+        return cached
+
+    query = select(Advertiser.id, Advertiser.is_active, Advertiser.naver_customer_id).where(
+        Advertiser.id == advertiser_id
+    )
+    result = await db.execute(query)
+    row = result.one_or_none()
+
+    if row is None:
+        _cache.set(advertiser_id, None, ttl_seconds=settings.ADVERTISER_CACHE_NEGATIVE_TTL_SECONDS)
+        return None
+
+    advertiser = CachedAdvertiser(id=row.id, is_active=bool(row.is_active), naver_customer_id=row.naver_customer_id)
+    _cache.set(advertiser_id, advertiser)
+    return advertiser
+
+
+def invalidate_advertiser(advertiser_id: int) -> None:
+    """광고주가 생성되거나 변경되었을 때 해당 항목을 캐시에서 제거합니다."""
+    _cache.invalidate(advertiser_id)
+
+
+def clear_advertiser_cache() -> None:
+    _cache.clear()
+
+
+def advertiser_cache_stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,297 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.db.locks import named_lock
+from app.db.session import AsyncReadSessionLocal, AsyncSessionLocal
+from app.db.upsert import replace_upsert
+from app.models.ad_click import AdClick
+from app.models.ip_anomaly_score import IpAnomalyScore
+from app.services import advertiser_cache
+from app.services.blocked_ip_index import get_blocked_ip_index
+from app.services.fraud_detection_service import block_ip
+
+SCORE_KEY_COLUMNS = ("advertiser_id", "client_ip")
+SCORE_UPDATE_COLUMNS = (
+    "window_start", "window_end", "click_count", "interval_cv", "keyword_entropy",
+    "device_diversity", "burstiness", "score", "scored_at",
+)
+SCORE_WRITE_BATCH_SIZE = 1000
+# 여러 워커 중 하나만 점수를 계산하도록 하는 MySQL 네임드 락
+SCORING_LOCK_NAME = "ip_anomaly_scoring"
+
+# 지표별 가중치 (합계 1)
+WEIGHT_REGULARITY = 0.35
+WEIGHT_KEYWORD_CONCENTRATION = 0.25
+WEIGHT_DEVICE_DIVERSITY = 0.2
+WEIGHT_BURSTINESS = 0.2
+
+
+class ClickColumns(NamedTuple):
+    """점수 계산에 쓰는 클릭 컬럼들을 컬럼별 배열로 담은 것"""
+    advertiser_ids: np.ndarray
+    ips: np.ndarray
+    times: np.ndarray       # epoch 초
+    keywords: np.ndarray
+    devices: np.ndarray     # "기기|네트워크"
+
+
+def _factorize(values: np.ndarray):
+    uniques, codes = np.unique(values, return_inverse=True)
+    return uniques, codes.ravel().astype(np.int64)
+
+
+def _columns_from_rows(rows) -> ClickColumns:
+    return ClickColumns(
+        advertiser_ids=np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+        ips=np.array([row[1] for row in rows], dtype=object),
+        times=np.array([row[2] for row in rows], dtype="datetime64[s]").astype(np.int64),
+        # NULL 은 문자열과 정렬 비교가 되지 않으므로 빈 문자열로 바꿉니다.
+        keywords=np.array([row[3] or "" for row in rows], dtype=object),
+        devices=np.array([f"{row[4] or ''}|{row[5] or ''}" for row in rows], dtype=object),
+    )
+
+
+async def load_active_advertiser_ids(since: datetime) -> List[int]:
+    """since 이후 클릭이 있는 광고주 ID 목록"""
+    query = select(AdClick.advertiser_id).where(AdClick.created_at >= since).distinct()
+    async with AsyncReadSessionLocal() as db:
+        return list((await db.execute(query)).scalars().all())
+
+
+async def load_recent_clicks(advertiser_id: int, since: datetime) -> Optional[ClickColumns]:
+    """
+    광고주의 since 이후 클릭에서 필요한 컬럼만 서버 측 커서로 청크 단위로 읽어 컬럼 배열로 모읍니다.
+    ANOMALY_MAX_CLICKS_PER_ADVERTISER 를 넘으면 읽기를 멈추고 None 을 반환합니다.
+    (일부 클릭만으로 매긴 점수는 간격 / 버스트 지표가 왜곡되므로 쓰지 않습니다.)
+    """
+    query = (
+        select(
+            AdClick.advertiser_id, AdClick.client_ip, AdClick.created_at,
+            AdClick.keyword, AdClick.device_type, AdClick.network_type,
+        )
+        .where(
+            AdClick.advertiser_id == advertiser_id,
+            AdClick.created_at >= since,
+            AdClick.client_ip.isnot(None),
+        )
+        .execution_options(yield_per=settings.ANOMALY_CHUNK_SIZE)
+    )
+    chunks: List[ClickColumns] = []
+    loaded = 0
+    # 최근 클릭만 읽는 배치 작업이므로 복제 지연은 문제되지 않습니다.
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            loaded += len(rows)
+            if loaded > settings.ANOMALY_MAX_CLICKS_PER_ADVERTISER:
+                await result.close()
+                print(
+                    f"경고: 광고주 {advertiser_id} 의 최근 클릭이 "
+                    f"{settings.ANOMALY_MAX_CLICKS_PER_ADVERTISER}건을 넘어 이상 점수 계산을 건너뜁니다."
+                )
+                return None
+            chunks.append(_columns_from_rows(rows))
+    if not chunks:
+        return None
+    return ClickColumns(*(np.concatenate(parts) for parts in zip(*chunks)))
+
+
+def _group_entropy(groups: np.ndarray, codes: np.ndarray, clicks: np.ndarray) -> np.ndarray:
+    """그룹별 codes 분포의 섀넌 엔트로피(bit)"""
+    width = int(codes.max()) + 1
+    pairs, counts = np.unique(groups * width + codes, return_counts=True)
+    pair_groups = pairs // width
+    p = counts / clicks[pair_groups]
+    return np.bincount(pair_groups, weights=-p * np.log2(p), minlength=len(clicks))
+
+
+def _group_distinct(groups: np.ndarray, codes: np.ndarray, group_count: int) -> np.ndarray:
+    width = int(codes.max()) + 1
+    return np.bincount(np.unique(groups * width + codes) // width, minlength=group_count)
+
+
+def score_clicks(columns: ClickColumns, min_clicks: int, burst_seconds: int) -> List[dict]:
+    """
+    (광고주, IP)별 클릭 패턴 지표와 0 ~ 1 점수를 계산합니다. 모든 그룹을 정렬 한 번과 배열 연산으로 한꺼번에 처리합니다.
+    - interval_cv: 클릭 간격의 변동계수. 사람은 1 안팎(무작위), 일정 간격으로 도는 봇은 0 에 가깝습니다.
+    - keyword_entropy: 키워드 분포 엔트로피. 클릭 수에 비해 낮으면 한 키워드만 반복 클릭한 것입니다.
+    - device_diversity: 한 IP에서 나온 (기기, 네트워크) 조합 수. 많으면 User-Agent 를 바꿔 가며 클릭한 것입니다.
+    - burstiness: burst_seconds 안에 몰린 클릭의 최대 비율.
+    CPU 작업이므로 호출하는 쪽에서 스레드로 실행합니다.
+    """
+    ip_values, ip_codes = _factorize(columns.ips)
+    # (광고주, IP) 쌍을 하나의 그룹 코드로 묶고, 그룹 / 시각 순으로 정렬합니다.
+    pairs, groups = _factorize(columns.advertiser_ids * len(ip_values) + ip_codes)
+    order = np.lexsort((columns.times, groups))
+    groups = groups[order]
+    times = columns.times[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    ends = np.r_[starts[1:], len(groups)]
+    clicks = ends - starts
+    group_count = len(starts)
+
+    # 클릭 간격 평균 / 표준편차 (같은 그룹 안의 간격만)
+    same_group = groups[1:] == groups[:-1]
+    gap_groups = groups[1:][same_group]
+    gaps = np.diff(times)[same_group].astype(np.float64)
+    gap_counts = clicks - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap_mean = np.bincount(gap_groups, weights=gaps, minlength=group_count) / gap_counts
+        gap_var = np.bincount(gap_groups, weights=gaps * gaps, minlength=group_count) / gap_counts - gap_mean ** 2
+        interval_cv = np.where(gap_mean > 0, np.sqrt(np.maximum(gap_var, 0)) / gap_mean, 0.0)
+
+    keyword_entropy = _group_entropy(groups, _factorize(columns.keywords[order])[1], clicks)
+    device_diversity = _group_distinct(groups, _factorize(columns.devices[order])[1], group_count)
+
+    # 그룹끼리 겹치지 않도록 그룹 코드만큼 띄운 키로 버스트 구간 클릭 수를 구합니다.
+    stride = int(times.max() - times.min()) + burst_seconds + 1
+    keys = groups * stride + (times - times.min())
+    in_burst = np.arange(len(keys)) - np.searchsorted(keys, keys - burst_seconds, side="left") + 1
+    burstiness = np.maximum.reduceat(in_burst, starts) / clicks
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        keyword_concentration = np.where(clicks > 1, 1 - keyword_entropy / np.log2(clicks), 0.0)
+    score = (
+        WEIGHT_REGULARITY * np.clip(1 - interval_cv, 0, 1)
+        + WEIGHT_KEYWORD_CONCENTRATION * np.clip(keyword_concentration, 0, 1)
+        + WEIGHT_DEVICE_DIVERSITY * (1 - 1 / device_diversity)
+        + WEIGHT_BURSTINESS * burstiness
+    )
+
+    keep = np.flatnonzero(clicks >= max(min_clicks, 2))
+    advertiser_ids = (pairs[keep] // len(ip_values)).tolist()
+    ips = ip_values[pairs[keep] % len(ip_values)].tolist()
+    window_starts = times[starts[keep]].astype("datetime64[s]").tolist()
+    window_ends = times[ends[keep] - 1].astype("datetime64[s]").tolist()
+    scored_at = datetime.now()
+    return [
+        {
+            "advertiser_id": advertiser_ids[i],
+            "client_ip": ips[i],
+            "window_start": window_starts[i],
+            "window_end": window_ends[i],
+            "click_count": int(clicks[g]),
+            "interval_cv": round(float(interval_cv[g]), 4),
+            "keyword_entropy": round(float(keyword_entropy[g]), 4),
+            "device_diversity": int(device_diversity[g]),
+            "burstiness": round(float(burstiness[g]), 4),
+            "score": round(float(score[g]), 4),
+            "scored_at": scored_at,
+        }
+        for i, g in enumerate(keep.tolist())
+    ]
+
+
+async def save_scores(rows: List[dict]) -> None:
+    """점수를 (광고주, IP)별로 덮어씁니다."""
+    async with AsyncSessionLocal() as db:
+        dialect_name = db.bind.dialect.name
+        for i in range(0, len(rows), SCORE_WRITE_BATCH_SIZE):
+            await db.execute(replace_upsert(
+                dialect_name, IpAnomalyScore, rows[i:i + SCORE_WRITE_BATCH_SIZE], SCORE_KEY_COLUMNS, SCORE_UPDATE_COLUMNS
+            ))
+        await db.commit()
+
+
+async def delete_stale_scores(since: datetime) -> None:
+    """이번 구간에 클릭이 없어 갱신되지 않은 오래된 점수를 지웁니다."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(IpAnomalyScore).where(IpAnomalyScore.window_end < since))
+        await db.commit()
+
+
+async def block_anomalous_ips(rows: List[dict]) -> int:
+    """ANOMALY_BLOCK_SCORE 이상인 IP를 기존 차단 경로(block_ip)로 차단합니다."""
+    threshold = settings.ANOMALY_BLOCK_SCORE
+    if threshold is None:
+        return 0
+    blocked_ip_index = get_blocked_ip_index()
+    blocked = 0
+    async with AsyncSessionLocal() as db:
+        for row in sorted(rows, key=lambda r: r["score"], reverse=True):
+            if row["score"] < threshold:
+                break
+            if blocked_ip_index.contains(row["advertiser_id"], row["client_ip"]):
+                continue
+            advertiser = await advertiser_cache.get_advertiser(db, row["advertiser_id"])
+            if not advertiser or not advertiser.is_active:
+                continue
+            memo = (
+                f"자동화 솔루션에 의해 차단됨 (이상 점수 {row['score']:.2f}, "
+                f"{row['click_count']}회, 간격 변동계수 {row['interval_cv']:.2f})"
+            )
+            if await block_ip(db, advertiser, row["client_ip"], memo):
+                blocked += 1
+    return blocked
+
+
+async def run_anomaly_scoring() -> int:
+    """
+    최근 클릭으로 IP별 이상 점수를 계산해 저장하고, 설정되어 있으면 고위험 IP를 차단합니다. 점수를 매긴 IP 수를 반환합니다.
+    메모리 사용량이 가장 큰 광고주 하나의 클릭 수로 제한되도록 광고주별로 나눠 읽고 계산합니다.
+    """
+    since = datetime.now() - timedelta(minutes=settings.ANOMALY_LOOKBACK_MINUTES)
+    scored = blocked = 0
+    for advertiser_id in await load_active_advertiser_ids(since):
+        columns = await load_recent_clicks(advertiser_id, since)
+        if columns is None:
+            continue
+        rows = await asyncio.to_thread(
+            score_clicks, columns, settings.ANOMALY_MIN_CLICKS, settings.ANOMALY_BURST_SECONDS
+        )
+        await save_scores(rows)
+        blocked += await block_anomalous_ips(rows)
+        scored += len(rows)
+    await delete_stale_scores(since)
+    if blocked:
+        print(f"이상 점수로 IP {blocked}개 차단")
+    return scored
+
+
+class AnomalyScoringJob:
+    """앱 lifespan 동안 주기적으로 run_anomaly_scoring 을 실행하는 백그라운드 작업"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.last_scored = 0
+        self.last_duration_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if not settings.ANOMALY_SCORING_ENABLED or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run_once(self) -> None:
+        started = time.perf_counter()
+        self.last_scored = await run_anomaly_scoring()
+        self.last_duration_ms = (time.perf_counter() - started) * 1000
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with named_lock(SCORING_LOCK_NAME) as acquired:
+                    if acquired:
+                        await self._run_once()
+            except Exception as e:
+                print(f"실패: 클릭 이상 점수 계산 중 오류 발생: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+
+anomaly_scoring_job = AnomalyScoringJob(interval_seconds=settings.ANOMALY_SCORING_INTERVAL_SECONDS)
@@ -1,74 +1,97 @@
+import hashlib
+
 import httpx
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
+from app.core import http_client
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.db.upsert import upsert_one
 from app.models.user import User
 
 NAVER_PROFILE_URL = "https://openapi.naver.com/v1/nid/me"
 KAKAO_PROFILE_URL = "https://kapi.kakao.com/v2/user/me"
 
+# (제공자, 소셜 액세스 토큰 해시) -> 프로필. 재시도된 로그인이 소셜 API 를 다시 호출하지 않게 합니다.
+# 토큰 원문 대신 해시를 키로 보관합니다.
+_profile_cache = TTLCache(
+    maxsize=settings.SOCIAL_PROFILE_CACHE_MAXSIZE,
+    ttl_seconds=settings.SOCIAL_PROFILE_CACHE_TTL_SECONDS,
+)
+
+def _profile_cache_key(provider: str, token: str):
+    return provider, hashlib.sha256(token.encode()).hexdigest()
+
 async def get_user_profile_from_social(provider: str, token: str):
     """
     소셜 플랫폼으로부터 사용자 프로필 정보를 가져옵니다.
+    같은 토큰으로 최근에 가져온 프로필이 있으면 소셜 API 를 호출하지 않습니다.
     """
+    cache_key = _profile_cache_key(provider, token)
+    cached = _profile_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+    profile = await _fetch_user_profile(provider, token)
+    _profile_cache.set(cache_key, profile)
+    return profile
+
+async def _fetch_user_profile(provider: str, token: str):
     headers = {"Authorization": f"Bearer {token}"}
     url = ""
     if provider == "naver":
         url = NAVER_PROFILE_URL
+        client = http_client.get_client("naver_openapi")
     elif provider == "kakao":
         url = KAKAO_PROFILE_URL
+        client = http_client.get_client("kakao")
     else:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Unsupported social provider"
         )
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            
-            if provider == "naver":
-                return response.json()["response"]
-            elif provider == "kakao":
-                profile_data = response.json()
-                # Kakao API는 프로필 정보를 'properties'와 'kakao_account'에 나누어 제공
-                return {
-                    "id": profile_data["id"],
-                    "nickname": profile_data["properties"].get("nickname"),
-                    "profile_image_url": profile_data["properties"].get("profile_image"),
-                }
+    try:
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        
+        if provider == "naver":
+            return response.json()["response"]
+        elif provider == "kakao":
+            profile_data = response.json()
+            # Kakao API는 프로필 정보를 'properties'와 'kakao_account'에 나누어 제공
+            return {
+                "id": profile_data["id"],
+                "nickname": profile_data["properties"].get("nickname"),
+                "profile_image_url": profile_data["properties"].get("profile_image"),
+            }
 
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Failed to fetch user profile from {provider}: {e.response.text}"
-            )
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Failed to fetch user profile from {provider}: {e.response.text}"
+        )
 
 async def get_or_create_user(db: AsyncSession, provider: str, user_profile: dict):
     """
     소셜 프로필 정보로 사용자를 찾거나 새로 생성합니다.
+    (social_provider, social_id) 유니크 키 기준 upsert 한 번으로 처리하므로
+    같은 사용자의 첫 로그인이 동시에 들어와도 충돌하지 않고, 기존 사용자는 최신 닉네임 / 프로필 이미지로 갱신됩니다.
     """
-    social_id = str(user_profile["id"])
-
-    # 1. 기존 사용자인지 확인
-    query = select(User).where(User.social_provider == provider, User.social_id == social_id)
-    result = await db.execute(query)
-    user = result.scalar_one_or_none()
-
-    if user:
-        return user
-
-    # 2. 신규 사용자인 경우 새로 생성
-    new_user = User(
-        social_provider=provider,
-        social_id=social_id,
-        nickname=user_profile.get("nickname") or user_profile.get("name"), # Naver는 'name'으로 옴
-        profile_image_url=user_profile.get("profile_image_url") or user_profile.get("profile_image") # Naver는 'profile_image'
+    values = {
+        "social_provider": provider,
+        "social_id": str(user_profile["id"]),
+        "nickname": user_profile.get("nickname") or user_profile.get("name"), # Naver는 'name'으로 옴
+        "profile_image_url": user_profile.get("profile_image_url") or user_profile.get("profile_image"), # Naver는 'profile_image'
+    }
+    user = await upsert_one(
+        db,
+        User,
+        values,
+        key_columns=("social_provider", "social_id"),
+        update_columns=("nickname", "profile_image_url"),
     )
-    db.add(new_user)
+    # 커밋 시 세션의 객체는 만료(expire)되므로, 다시 조회하지 않도록 세션에서 떼어 낸 뒤 커밋합니다.
+    db.expunge(user)
     await db.commit()
-    await db.refresh(new_user)
-    
-    return new_user
\ No newline at end of file
+    return user
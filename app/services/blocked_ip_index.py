@@ -0,0 +1,108 @@
+import ipaddress
+from abc import ABC, abstractmethod
+from typing import Dict, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.blocked_ip_log import BlockedIpLog
+from app.services.ip_prefix import PrefixTrie, is_prefix
+
+
+class BlockedIpIndex(ABC):
+    """
+    광고주별로 이미 차단된 IP 집합을 조회하는 인덱스의 기본 인터페이스입니다.
+    add / discard 에는 단일 IP 또는 CIDR 대역을 넘길 수 있고, contains 는 IP가 차단된 대역에 속해도 True 입니다.
+    load 는 공통으로 blocked_ip_logs 테이블 전체를 읽어 인덱스를 채웁니다.
+    """
+
+    @abstractmethod
+    def contains(self, advertiser_id: int, ip_address: str) -> bool:
+        ...
+
+    @abstractmethod
+    def add(self, advertiser_id: int, ip_address: str) -> None:
+        ...
+
+    @abstractmethod
+    def discard(self, advertiser_id: int, ip_address: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    async def load(self, db: AsyncSession) -> int:
+        """DB의 차단 로그로 인덱스를 다시 채우고 적재한 건수를 반환합니다."""
+        self.clear()
+        return await self._load_from(db)
+
+    async def _load_from(self, db: AsyncSession) -> int:
+        """비우지 않고 DB의 차단 로그를 현재 인덱스에 더합니다."""
+        query = select(BlockedIpLog.advertiser_id, BlockedIpLog.ip_address).execution_options(yield_per=5000)
+        loaded = 0
+        result = await db.stream(query)
+        async for advertiser_id, ip_address in result:
+            self.add(advertiser_id, ip_address)
+            loaded += 1
+        return loaded
+
+
+class InMemoryBlockedIpIndex(BlockedIpIndex):
+    """
+    광고주 ID별 정확한 IP 집합(set)과 차단 대역 라디스 트리로 구성된 인덱스입니다.
+    대역이 없는 광고주는 집합 조회만으로 끝납니다.
+    """
+
+    def __init__(self):
+        self._ips: Dict[int, Set[str]] = {}
+        self._prefixes: Dict[int, PrefixTrie] = {}
+
+    def contains(self, advertiser_id: int, ip_address: str) -> bool:
+        ips = self._ips.get(advertiser_id)
+        if ips is not None and ip_address in ips:
+            return True
+        prefixes = self._prefixes.get(advertiser_id)
+        if not prefixes:
+            return False
+        try:
+            return ip_address in prefixes
+        except ValueError:
+            return False
+
+    def add(self, advertiser_id: int, ip_address: str) -> None:
+        if is_prefix(ip_address):
+            self._prefixes.setdefault(advertiser_id, PrefixTrie()).add(ipaddress.ip_network(ip_address, strict=False))
+        else:
+            self._ips.setdefault(advertiser_id, set()).add(ip_address)
+
+    def discard(self, advertiser_id: int, ip_address: str) -> None:
+        if is_prefix(ip_address):
+            prefixes = self._prefixes.get(advertiser_id)
+            if prefixes is not None:
+                prefixes.discard(ipaddress.ip_network(ip_address, strict=False))
+            return
+        ips = self._ips.get(advertiser_id)
+        if ips is not None:
+            ips.discard(ip_address)
+
+    def clear(self) -> None:
+        self._ips.clear()
+        self._prefixes.clear()
+
+    def __len__(self) -> int:
+        return sum(len(ips) for ips in self._ips.values()) + sum(len(trie) for trie in self._prefixes.values())
+
+
+_blocked_ip_index: BlockedIpIndex = InMemoryBlockedIpIndex()
+
+
+def get_blocked_ip_index() -> BlockedIpIndex:
+    """현재 사용 중인 차단 IP 인덱스를 반환합니다."""
+    return _blocked_ip_index
+
+
+def set_blocked_ip_index(index: BlockedIpIndex) -> None:
+    """차단 IP 인덱스를 교체합니다. (다른 백엔드 사용 또는 테스트용)"""
+    global _blocked_ip_index
+    _blocked_ip_index = index
@@ -0,0 +1,205 @@
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import literal, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.ad_click import AdClick
+from app.models.ad_click_duplicate import AdClickDuplicate
+from app.models.blocking_rule import BlockingRule
+from app.services.ip_prefix import covering_prefix
+
+# 만료된 키를 정리하는 주기(초)
+SWEEP_INTERVAL_SECONDS = 60
+
+
+class ClickCounter(ABC):
+    """
+    (광고주 ID, 클라이언트 IP) 단위로 최근 클릭 수를 세는 카운터 엔진의 기본 인터페이스입니다.
+    구현체는 record / count 를 제공해야 하며, rebuild 는 공통으로 DB의 최근 클릭으로 상태를 복원합니다.
+    """
+
+    def __init__(self, max_window_seconds: int):
+        self.max_window_seconds = max_window_seconds
+
+    def covers(self, window_seconds: int) -> bool:
+        """주어진 시간 범위를 이 카운터만으로 판단할 수 있는지 여부"""
+        return window_seconds <= self.max_window_seconds
+
+    @abstractmethod
+    def record(self, advertiser_id: int, client_ip: str, ts: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def count(self, advertiser_id: int, client_ip: str, window_seconds: int, now: Optional[float] = None) -> int:
+        ...
+
+    def count_many(
+        self, advertiser_id: int, client_ip: str, windows_seconds: Sequence[int], now: Optional[float] = None
+    ) -> List[int]:
+        """여러 시간 범위의 클릭 수를 한 번에 계산합니다. 구현체는 한 번의 순회로 처리하도록 재정의합니다."""
+        now = now if now is not None else time.time()
+        return [self.count(advertiser_id, client_ip, window, now) for window in windows_seconds]
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @staticmethod
+    async def _load_prefix_lengths(db: AsyncSession) -> Dict[int, Set[Tuple[Optional[int], Optional[int]]]]:
+        """광고주별 활성 대역 규칙의 (IPv4, IPv6) 접두사 길이 조합"""
+        query = select(
+            BlockingRule.advertiser_id, BlockingRule.ipv4_prefix_length, BlockingRule.ipv6_prefix_length
+        ).where(
+            BlockingRule.is_active,
+            or_(BlockingRule.ipv4_prefix_length.isnot(None), BlockingRule.ipv6_prefix_length.isnot(None)),
+        ).distinct()
+        prefix_lengths: Dict[int, Set[Tuple[Optional[int], Optional[int]]]] = {}
+        for advertiser_id, ipv4_prefix_length, ipv6_prefix_length in (await db.execute(query)).all():
+            prefix_lengths.setdefault(advertiser_id, set()).add((ipv4_prefix_length, ipv6_prefix_length))
+        return prefix_lengths
+
+    async def rebuild(self, db: AsyncSession) -> int:
+        """
+        최근 max_window 범위의 ad_clicks 와 중복 클릭 제거로 남긴 반복 클릭(ad_click_duplicates)을 읽어
+        카운터 상태를 다시 만듭니다.
+        대역 규칙이 있는 광고주는 process_ad_click 과 같이 IP를 감싸는 대역 키에도 클릭을 기록합니다.
+        복원한 클릭 수를 반환합니다.
+        """
+        self.clear()
+        return await self._restore(db)
+
+    async def _restore(self, db: AsyncSession) -> int:
+        """비우지 않고 DB의 최근 클릭을 현재 상태에 더합니다."""
+        prefix_lengths = await self._load_prefix_lengths(db)
+        since = datetime.now() - timedelta(seconds=self.max_window_seconds)
+        # 카운터는 시각 순서로 기록해야 하므로 두 테이블을 합쳐 한 번에 정렬합니다.
+        clicks = union_all(
+            select(AdClick.advertiser_id, AdClick.client_ip, AdClick.created_at, literal(1).label("click_count"))
+            .where(AdClick.created_at >= since),
+            select(
+                AdClickDuplicate.advertiser_id, AdClickDuplicate.client_ip, AdClickDuplicate.created_at,
+                AdClickDuplicate.duplicate_count.label("click_count"),
+            ).where(AdClickDuplicate.created_at >= since),
+        ).subquery()
+        query = select(clicks).order_by(clicks.c.created_at).execution_options(yield_per=5000)
+        restored = 0
+        result = await db.stream(query)
+        async for advertiser_id, client_ip, created_at, click_count in result:
+            if client_ip is None or created_at is None:
+                continue
+            # created_at 은 앱이 datetime.now() 로 기록한 시간대 정보 없는 서버 로컬 시각입니다.
+            # timestamp() 는 이를 이 프로세스의 로컬 시간대로 해석하므로, 클릭을 기록한 서버와 시간대(TZ)가 같아야 합니다.
+            ts = created_at.timestamp()
+            subjects = {client_ip} | {
+                covering_prefix(client_ip, ipv4_prefix_length, ipv6_prefix_length)
+                for ipv4_prefix_length, ipv6_prefix_length in prefix_lengths.get(advertiser_id, ())
+            }
+            for _ in range(click_count):
+                for subject in subjects:
+                    self.record(advertiser_id, subject, ts)
+            restored += click_count
+        return restored
+
+
+class InMemoryClickCounter(ClickCounter):
+    """
+    프로세스 메모리에 (광고주, IP)별 타임스탬프 링 버퍼를 두는 카운터입니다.
+    오래된 타임스탬프는 기록/조회 시점에 잘라내고, 빈 키는 주기적으로 제거합니다.
+    """
+
+    def __init__(self, max_window_seconds: int, max_events_per_key: int):
+        super().__init__(max_window_seconds)
+        self.max_events_per_key = max_events_per_key
+        self._buffers: Dict[Tuple[int, str], Deque[float]] = {}
+        self._last_sweep = time.time()
+
+    def _expire(self, buffer: Deque[float], now: float) -> None:
+        cutoff = now - self.max_window_seconds
+        while buffer and buffer[0] < cutoff:
+            buffer.popleft()
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        cutoff = now - self.max_window_seconds
+        expired_keys = [key for key, buffer in self._buffers.items() if not buffer or buffer[-1] < cutoff]
+        for key in expired_keys:
+            del self._buffers[key]
+
+    def record(self, advertiser_id: int, client_ip: str, ts: Optional[float] = None) -> None:
+        now = time.time()
+        key = (advertiser_id, client_ip)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = deque(maxlen=self.max_events_per_key)
+            self._buffers[key] = buffer
+        buffer.append(ts if ts is not None else now)
+        self._expire(buffer, now)
+        self._maybe_sweep(now)
+
+    def count(self, advertiser_id: int, client_ip: str, window_seconds: int, now: Optional[float] = None) -> int:
+        buffer = self._buffers.get((advertiser_id, client_ip))
+        if not buffer:
+            return 0
+        now = now if now is not None else time.time()
+        cutoff = now - window_seconds
+        total = 0
+        # 최신 클릭부터 거꾸로 세다가 윈도우를 벗어나면 멈춥니다.
+        for ts in reversed(buffer):
+            if ts < cutoff:
+                break
+            total += 1
+        return total
+
+    def count_many(
+        self, advertiser_id: int, client_ip: str, windows_seconds: Sequence[int], now: Optional[float] = None
+    ) -> List[int]:
+        counts = [0] * len(windows_seconds)
+        buffer = self._buffers.get((advertiser_id, client_ip))
+        if not buffer:
+            return counts
+        now = now if now is not None else time.time()
+        # 짧은 윈도우부터 경계를 넘을 때마다 누적 개수를 확정합니다.
+        order = sorted(range(len(windows_seconds)), key=lambda i: windows_seconds[i])
+        total = 0
+        j = 0
+        for ts in reversed(buffer):
+            while j < len(order) and ts < now - windows_seconds[order[j]]:
+                counts[order[j]] = total
+                j += 1
+            if j == len(order):
+                break
+            total += 1
+        while j < len(order):
+            counts[order[j]] = total
+            j += 1
+        return counts
+
+    def clear(self) -> None:
+        self._buffers.clear()
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+
+_click_counter: ClickCounter = InMemoryClickCounter(
+    max_window_seconds=settings.CLICK_COUNTER_MAX_WINDOW_MINUTES * 60,
+    max_events_per_key=settings.CLICK_COUNTER_MAX_EVENTS_PER_KEY,
+)
+
+
+def get_click_counter() -> ClickCounter:
+    """현재 사용 중인 클릭 카운터 엔진을 반환합니다."""
+    return _click_counter
+
+
+def set_click_counter(counter: ClickCounter) -> None:
+    """클릭 카운터 엔진을 교체합니다. (다른 백엔드 사용 또는 테스트용)"""
+    global _click_counter
+    _click_counter = counter
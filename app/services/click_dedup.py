@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from app.core import metrics
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.schemas.ad_click import AdClickData
+from app.services.advertiser_cache import CachedAdvertiser
+from app.services.blocked_ip_index import get_blocked_ip_index
+from app.services.click_ingest_service import click_ingest_writer
+from app.services.click_worker_pool import ClickJob, click_worker_pool
+from app.services.fraud_detection_service import (
+    build_click_row, find_triggered_rule_in_memory, record_click_subjects
+)
+from app.services.rule_registry import blocking_rule_registry
+
+
+class ClickDeduplicator:
+    """
+    같은 IP에서 같은 광고 / 키워드 / 소재로 짧은 간격 안에 반복된 랜딩 요청을 걸러 냅니다.
+    첫 클릭만 저장 / 규칙 평가 대상으로 넘기고, 간격 안의 반복은 process_ad_click 과 같은 단위(IP, 대역 규칙의 대역)로
+    클릭 카운터에 기록하여 재시도 폭주 시 INSERT 와 DB 를 쓰는 규칙 평가를 줄이면서도 규칙의 클릭 수는 유지합니다.
+    반복 클릭은 수집기를 통해 ad_click_duplicates 에 (광고주, IP, 초)별 횟수로 남기므로,
+    재시작 후 카운터 복원, 카운터 범위를 넘는 규칙의 DB 집계, 클릭 집계(/ads/stats)에도 포함됩니다.
+    반복 클릭은 캐시된 규칙을 메모리 카운터로만 확인하고, 임계치를 넘겼으면(또는 규칙을 아직 읽지 않았으면)
+    저장 없이 평가만 하는 작업을 워커 풀에 넘겨 차단합니다.
+    간격은 첫 클릭부터 재며(반복으로 연장되지 않음), 캐시는 프로세스별입니다.
+    """
+
+    def __init__(self, interval_seconds: float, maxsize: int):
+        self._seen = TTLCache(maxsize=maxsize, ttl_seconds=interval_seconds)
+        self.suppressed_total = 0
+        # 반복 클릭이 임계치를 넘겨 평가 작업을 넘긴 횟수
+        self.evaluated_total = 0
+
+    async def suppress(
+        self, advertiser: CachedAdvertiser, client_ip: str, ad_click_data: AdClickData, clicked_at: datetime
+    ) -> bool:
+        """반복 클릭이면 반복 횟수를 남기고 카운터에 기록(필요하면 평가 작업을 넘김)한 뒤 True 를 반환합니다."""
+        key = (advertiser.id, client_ip, ad_click_data.ad_id, ad_click_data.keyword_id, ad_click_data.creative_id)
+        if self._seen.get(key) is MISSING:
+            self._seen.set(key, True)
+            return False
+        self.suppressed_total += 1
+        metrics.CLICK_DUPLICATES_SUPPRESSED.inc()
+        await click_ingest_writer.submit_duplicate(build_click_row(client_ip, advertiser, ad_click_data, clicked_at))
+
+        rules = blocking_rule_registry.cached_rules(advertiser.id)
+        record_click_subjects(advertiser.id, client_ip, rules or ())
+        if get_blocked_ip_index().contains(advertiser.id, client_ip):
+            return True
+        if rules is None or find_triggered_rule_in_memory(advertiser.id, client_ip, rules):
+            self.evaluated_total += 1
+            await click_worker_pool.submit(
+                ClickJob(client_ip, advertiser, ad_click_data, clicked_at, evaluate_only=True)
+            )
+        return True
+
+    def clear(self) -> None:
+        self._seen.clear()
+
+    def stats(self) -> dict:
+        return {"suppressed": self.suppressed_total, "evaluated": self.evaluated_total, **self._seen.stats()}
+
+
+click_deduplicator = ClickDeduplicator(
+    interval_seconds=settings.CLICK_DEDUP_INTERVAL_SECONDS,
+    maxsize=settings.CLICK_DEDUP_CACHE_MAXSIZE,
+)
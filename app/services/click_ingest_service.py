@@ -0,0 +1,316 @@
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import exc, insert
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.db.upsert import increment_upsert
+from app.models.ad_click import AdClick
+from app.models.ad_click_duplicate import AdClickDuplicate
+from app.services import click_rollup_service
+from app.services.spill_files import orphaned_files
+
+# 큐 종료 신호
+_STOP = object()
+# 나눠서 다시 시도해도 소용없는 오류(DB 연결 실패 등). 이 경우 배치를 바로 디스크에 보관합니다.
+_CONNECTION_ERRORS = (exc.OperationalError, exc.InterfaceError, exc.TimeoutError, OSError, asyncio.TimeoutError)
+
+
+# 중복 클릭 제거로 ad_clicks 에 넣지 않고 반복 횟수만 남기는 행의 표시
+DUPLICATE_KEY = "duplicate"
+DUPLICATE_KEY_COLUMNS = ("advertiser_id", "client_ip", "created_at")
+
+
+def _is_connection_error(error: Exception) -> bool:
+    return isinstance(error, _CONNECTION_ERRORS) or getattr(error, "connection_invalidated", False)
+
+
+def aggregate_duplicates(rows: List[dict]) -> List[dict]:
+    """반복 클릭 행들을 (광고주, IP, 초 단위 시각)별 반복 횟수로 묶습니다."""
+    counts: Dict[Tuple, int] = Counter(
+        (row["advertiser_id"], row["client_ip"], row["created_at"].replace(microsecond=0)) for row in rows
+    )
+    return [
+        dict(zip(DUPLICATE_KEY_COLUMNS, key), duplicate_count=count)
+        for key, count in sorted(counts.items(), key=lambda item: item[0])
+    ]
+
+
+class ClickIngestWriter:
+    """
+    AdClick 행을 asyncio 큐에 모았다가 개수 또는 시간 임계치에 도달하면
+    다중 행 INSERT 한 번으로 저장하는 수집기입니다.
+    중복 클릭 제거로 걸러진 반복 클릭(submit_duplicate)은 ad_clicks 대신 ad_click_duplicates 의 반복 횟수로 누적하고,
+    집계(rollup)에는 일반 클릭과 같이 더합니다.
+    앱 lifespan 에서 start / stop 되며, stop 시 큐에 남은 행을 모두 저장합니다.
+    저장에 실패한 배치는 버리지 않습니다.
+      1. 백오프를 두고 max_retries 번 다시 시도합니다.
+      2. 그래도 실패하면 집계(rollup) 없이 원본 클릭만 저장해 보고, 안 되면 배치를 반으로 나눠 문제 행을 골라냅니다.
+      3. DB 연결 실패이거나 한 행만 남아도 실패하면 dead_letter_path 에 JSON 줄로 기록하고, 다음 시작 시 다시 저장합니다.
+         다시 저장하다 종료되면 같은 행이 한 번 더 저장될 수 있습니다. (잃어버리는 것보다 낫다고 봅니다)
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval_seconds: float,
+        max_queue_size: int,
+        max_retries: int,
+        retry_backoff_seconds: float,
+        dead_letter_path: str,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.dead_letter_path = dead_letter_path
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # 모니터링용 카운터
+        self.flush_count = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.retried_flushes = 0
+        # 집계 갱신 없이 원본 클릭만 저장된 행 수
+        self.rollup_skipped_rows = 0
+        self.dead_lettered_rows = 0
+        # 보관 파일에서 읽을 수 없어 건너뛴 줄 수
+        self.rejected_rows = 0
+        self.last_flush_latency_ms = 0.0
+        self.max_flush_latency_ms = 0.0
+        self.total_flush_latency_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """큐에 남은 클릭을 모두 저장한 뒤 종료합니다."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, row: dict) -> None:
+        """
+        저장할 클릭 한 건을 큐에 넣습니다.
+        큐가 가득 차면 자리가 날 때까지 기다리며, 수집기가 동작 중이 아니면 즉시 저장합니다.
+        """
+        if not self.running:
+            await self._flush([row])
+            return
+        await self._queue.put(row)
+
+    async def submit_duplicate(self, row: dict) -> None:
+        """중복 클릭 제거로 걸러진 반복 클릭 한 건을 큐에 넣습니다. (행 형식은 submit 과 같음)"""
+        await self.submit({**row, DUPLICATE_KEY: True})
+
+    def try_submit(self, row: dict) -> bool:
+        """기다리지 않고 큐에 넣어 봅니다. 수집기가 멈춰 있거나 큐가 가득 차면 False 를 반환합니다."""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _run(self) -> None:
+        try:
+            await self._replay_dead_letters()
+        except Exception as e:
+            # 보관 파일을 다시 저장하지 못해도 새 클릭 수집은 계속합니다. 남은 파일은 다음 시작 시 다시 처리합니다.
+            print(f"실패: 보관된 클릭 로그 재저장 중 오류 발생: {e}")
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            batch: List[dict] = [first]
+            deadline = loop.time() + self.flush_interval_seconds
+
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _write(self, rows: List[dict], with_rollups: bool = True) -> None:
+        clicks = [row for row in rows if not row.get(DUPLICATE_KEY)]
+        duplicates = [row for row in rows if row.get(DUPLICATE_KEY)]
+        async with AsyncSessionLocal() as db:
+            if clicks:
+                await db.execute(insert(AdClick).values(clicks))
+            if duplicates:
+                await db.execute(increment_upsert(
+                    db.bind.dialect.name, AdClickDuplicate, aggregate_duplicates(duplicates),
+                    DUPLICATE_KEY_COLUMNS, ("duplicate_count",)
+                ))
+            if with_rollups:
+                await click_rollup_service.apply_rollups(db, rows)
+            await db.commit()
+
+    async def _flush(self, rows: List[dict]) -> None:
+        started = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await self._write(rows)
+                    self.flushed_rows += len(rows)
+                    return
+                except Exception as e:
+                    error = e
+                if attempt < self.max_retries:
+                    self.retried_flushes += 1
+                    await asyncio.sleep(self.retry_backoff_seconds * 2 ** attempt)
+            print(f"실패: 클릭 로그 {len(rows)}건 일괄 저장이 {self.max_retries + 1}회 실패했습니다. 오류: {error}")
+            if _is_connection_error(error):
+                self._dead_letter(rows)
+            else:
+                await self._salvage(rows)
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            self.last_flush_latency_ms = latency_ms
+            self.total_flush_latency_ms += latency_ms
+            self.max_flush_latency_ms = max(self.max_flush_latency_ms, latency_ms)
+
+    async def _salvage(self, rows: List[dict]) -> None:
+        """집계 없이 원본 클릭만 저장해 보고, 실패하면 반으로 나눠 저장할 수 있는 행을 모두 저장합니다."""
+        try:
+            await self._write(rows, with_rollups=False)
+        except Exception as e:
+            if _is_connection_error(e) or len(rows) == 1:
+                if len(rows) == 1:
+                    print(f"실패: 클릭 로그 1건을 저장할 수 없어 보관합니다. 오류: {e}")
+                self._dead_letter(rows)
+                return
+            middle = len(rows) // 2
+            await self._salvage(rows[:middle])
+            await self._salvage(rows[middle:])
+            return
+        self.flushed_rows += len(rows)
+        self.rollup_skipped_rows += len(rows)
+        print(f"경고: 클릭 로그 {len(rows)}건을 집계 갱신 없이 저장했습니다.")
+
+    def _dead_letter(self, rows: List[dict]) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=datetime.isoformat, ensure_ascii=False) + "\n")
+            self.dead_lettered_rows += len(rows)
+            print(f"클릭 로그 {len(rows)}건을 {self.dead_letter_path} 에 보관했습니다. (다음 시작 시 다시 저장)")
+        except OSError as e:
+            self.failed_rows += len(rows)
+            print(f"실패: 클릭 로그 {len(rows)}건을 보관하지 못했습니다. 오류: {e}")
+
+    async def _replay_dead_letters(self) -> None:
+        """
+        이전 실행에서 보관한 행을 다시 저장합니다. 다시 실패한 행은 새 보관 파일에 남습니다.
+        다시 저장하던 워커가 종료되어 남은 파일(dead_letter_path.{pid}.replay)도 가져와 처리합니다.
+        """
+        replay_path = f"{self.dead_letter_path}.{os.getpid()}.replay"
+        if os.path.exists(replay_path):
+            await self._replay_file(replay_path)
+        for path in [self.dead_letter_path] + orphaned_files(self.dead_letter_path, ".replay"):
+            try:
+                # 같은 파일을 여러 워커가 다시 저장하지 않도록 먼저 옮긴 워커만 처리합니다.
+                os.replace(path, replay_path)
+            except FileNotFoundError:
+                continue
+            await self._replay_file(replay_path)
+
+    async def _replay_file(self, path: str) -> None:
+        """
+        보관 파일을 batch_size 행씩 다시 저장합니다. 읽을 수 없는 줄은 dead_letter_path.rejected 로 옮기고 건너뛰며,
+        파일은 모든 행의 저장(또는 재보관)이 끝난 뒤에 지웁니다.
+        """
+        replayed = 0
+        rows: List[dict] = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    row["created_at"] = datetime.fromisoformat(row["created_at"])
+                except (ValueError, KeyError, TypeError) as e:
+                    self._reject(line, e)
+                    continue
+                rows.append(row)
+                if len(rows) >= self.batch_size:
+                    await self._flush(rows)
+                    replayed += len(rows)
+                    rows = []
+        if rows:
+            await self._flush(rows)
+            replayed += len(rows)
+        os.remove(path)
+        print(f"보관된 클릭 로그 {replayed}건을 다시 저장했습니다.")
+
+    def _reject(self, line: str, error: Exception) -> None:
+        self.rejected_rows += 1
+        print(f"실패: 보관된 클릭 로그 한 줄을 읽을 수 없어 건너뜁니다. 오류: {error}")
+        try:
+            with open(self.dead_letter_path + ".rejected", "a", encoding="utf-8") as f:
+                f.write(line if line.endswith("\n") else line + "\n")
+        except OSError as e:
+            print(f"실패: 읽을 수 없는 클릭 로그를 보관하지 못했습니다. 오류: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "flush_count": self.flush_count,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "retried_flushes": self.retried_flushes,
+            "rollup_skipped_rows": self.rollup_skipped_rows,
+            "dead_lettered_rows": self.dead_lettered_rows,
+            "rejected_rows": self.rejected_rows,
+            "last_flush_latency_ms": self.last_flush_latency_ms,
+            "avg_flush_latency_ms": self.total_flush_latency_ms / self.flush_count if self.flush_count else 0.0,
+            "max_flush_latency_ms": self.max_flush_latency_ms,
+        }
+
+
+click_ingest_writer = ClickIngestWriter(
+    batch_size=settings.CLICK_INGEST_BATCH_SIZE,
+    flush_interval_seconds=settings.CLICK_INGEST_FLUSH_INTERVAL_SECONDS,
+    max_queue_size=settings.CLICK_INGEST_QUEUE_MAXSIZE,
+    max_retries=settings.CLICK_INGEST_MAX_RETRIES,
+    retry_backoff_seconds=settings.CLICK_INGEST_RETRY_BACKOFF_SECONDS,
+    dead_letter_path=settings.CLICK_INGEST_DEAD_LETTER_PATH,
+)
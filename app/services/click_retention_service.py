@@ -0,0 +1,377 @@
+import asyncio
+import gzip
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import BigInteger, DateTime, Integer, delete, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.db.locks import named_lock
+from app.db.session import AsyncSessionLocal, async_engine
+from app.models.ad_click import AdClick
+from app.models.ad_click_duplicate import AdClickDuplicate
+
+AD_CLICKS_TABLE = AdClick.__tablename__
+ARCHIVE_COLUMNS = tuple(column.key for column in AdClick.__table__.columns)
+# 여러 워커 중 하나만 보존 작업 / 파티션 DDL 을 수행하도록 하는 MySQL 네임드 락
+RETENTION_LOCK_NAME = "ad_clicks_retention"
+# 앱 시작 시 다른 워커가 파티션 변환(테이블 재작성) 중이면 끝날 때까지 기다리는 최대 시간
+PARTITION_LOCK_WAIT_SECONDS = 3600
+
+
+# --- 파티션 경계 계산 ---
+def period_start(day: date, granularity: str) -> date:
+    return day.replace(day=1) if granularity == "month" else day
+
+
+def next_period(start: date, granularity: str) -> date:
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(start: date) -> str:
+    return f"p{start:%Y%m%d}"
+
+
+def parse_partition_start(name: str) -> Optional[date]:
+    try:
+        return datetime.strptime(name[1:], "%Y%m%d").date() if name.startswith("p") else None
+    except ValueError:
+        return None
+
+
+def _partition_clause(start: date) -> str:
+    upper = next_period(start, settings.AD_CLICKS_PARTITION_GRANULARITY)
+    return f"PARTITION {partition_name(start)} VALUES LESS THAN (TO_DAYS('{upper.isoformat()}'))"
+
+
+# --- 컬럼형 아카이브 ---
+class ColumnarArchiveWriter:
+    """
+    삭제 전 클릭 데이터를 압축된 컬럼형 파일로 저장합니다.
+    pyarrow 가 설치되어 있으면 zstd 압축 Parquet, 없으면 청크마다 컬럼별 배열을 담은 gzip JSON 줄로 씁니다.
+    임시 파일에 쓴 뒤 close 시 최종 경로로 옮기므로 중간에 실패해도 불완전한 아카이브가 남지 않습니다.
+    최종 경로에 이미 파일이 있으면 덮어쓰지 않고 이름 뒤에 번호를 붙입니다.
+    """
+
+    def __init__(self, base_path: str):
+        try:
+            import pyarrow  # noqa: F401
+            self._use_parquet = True
+            self._suffix = ".parquet"
+        except ImportError:
+            self._use_parquet = False
+            self._suffix = ".columns.json.gz"
+        self._base_path = base_path
+        self.path = base_path + self._suffix
+        self._tmp_path = self.path + ".tmp"
+        self._writer = None
+        self.rows_written = 0
+
+    def _arrow_schema(self):
+        import pyarrow as pa
+
+        fields = []
+        for column in AdClick.__table__.columns:
+            if isinstance(column.type, (Integer, BigInteger)):
+                arrow_type = pa.int64()
+            elif isinstance(column.type, DateTime):
+                arrow_type = pa.timestamp("us")
+            else:
+                arrow_type = pa.string()
+            fields.append(pa.field(column.key, arrow_type))
+        return pa.schema(fields)
+
+    def write(self, rows: Sequence[Tuple]) -> None:
+        columns = {name: [row[i] for row in rows] for i, name in enumerate(ARCHIVE_COLUMNS)}
+        if self._use_parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            schema = self._arrow_schema()
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self._tmp_path, schema, compression="zstd")
+            self._writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        else:
+            if self._writer is None:
+                self._writer = gzip.open(self._tmp_path, "wt", encoding="utf-8")
+            self._writer.write(json.dumps({"columns": columns}, default=str, ensure_ascii=False) + "\n")
+        self.rows_written += len(rows)
+
+    def close(self) -> Optional[str]:
+        if self._writer is None:
+            return None
+        self._writer.close()
+        sequence = 1
+        while os.path.exists(self.path):
+            self.path = f"{self._base_path}_{sequence}{self._suffix}"
+            sequence += 1
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+async def archive_range(start: datetime, end: datetime) -> Tuple[int, Optional[str]]:
+    """
+    [start, end) 범위의 클릭을 컬럼형 파일로 보관하고 (건수, 파일 경로)를 반환합니다.
+    이미 보관한 기간에 늦게 들어온 클릭(재저장된 보관 행 등)이 다시 보관될 수 있으므로,
+    파일 이름에 실행 시각을 붙여 이전 아카이브를 덮어쓰지 않습니다.
+    """
+    os.makedirs(settings.AD_CLICKS_ARCHIVE_DIR, exist_ok=True)
+    writer = ColumnarArchiveWriter(os.path.join(
+        settings.AD_CLICKS_ARCHIVE_DIR,
+        f"{AD_CLICKS_TABLE}_{start:%Y%m%d}_{end:%Y%m%d}_{datetime.now():%Y%m%dT%H%M%S}",
+    ))
+    query = (
+        select(*[getattr(AdClick, name) for name in ARCHIVE_COLUMNS])
+        .where(AdClick.created_at >= start, AdClick.created_at < end)
+        .order_by(AdClick.created_at, AdClick.id)
+        .execution_options(yield_per=settings.AD_CLICKS_ARCHIVE_CHUNK_SIZE)
+    )
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query)
+            async for rows in result.partitions():
+                await asyncio.to_thread(writer.write, rows)
+        path = await asyncio.to_thread(writer.close)
+    except BaseException:
+        # 취소(CancelledError)된 경우에도 임시 파일을 남기지 않습니다.
+        writer.abort()
+        raise
+    return writer.rows_written, path
+
+
+# --- MySQL 파티션 관리 ---
+async def get_partitions(conn: AsyncConnection) -> List[str]:
+    result = await conn.execute(
+        text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"
+        ),
+        {"table": AD_CLICKS_TABLE},
+    )
+    return [row[0] for row in result.all()]
+
+
+async def convert_to_partitioned(conn: AsyncConnection) -> None:
+    """
+    ad_clicks 를 created_at 기준 RANGE 파티션 테이블로 바꿉니다.
+    MySQL 파티션 테이블은 외래 키를 가질 수 없고 모든 유니크 키에 파티션 컬럼이 포함되어야 하므로
+    advertiser_id 외래 키를 제거하고 기본 키를 (id, created_at) 으로 바꿉니다.
+    테이블 전체를 다시 쓰는 작업이므로 점검 시간에 실행해야 합니다.
+    """
+    granularity = settings.AD_CLICKS_PARTITION_GRANULARITY
+    foreign_keys = await conn.execute(
+        text(
+            "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+            "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ),
+        {"table": AD_CLICKS_TABLE},
+    )
+    for (constraint_name,) in foreign_keys.all():
+        await conn.execute(text(f"ALTER TABLE {AD_CLICKS_TABLE} DROP FOREIGN KEY `{constraint_name}`"))
+
+    await conn.execute(text(
+        f"ALTER TABLE {AD_CLICKS_TABLE} "
+        "MODIFY created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+        "DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)"
+    ))
+
+    oldest = (await conn.execute(text(f"SELECT MIN(created_at) FROM {AD_CLICKS_TABLE}"))).scalar()
+    today = date.today()
+    start = period_start(oldest.date() if oldest else today, granularity)
+    clauses = []
+    while start <= today:
+        clauses.append(_partition_clause(start))
+        start = next_period(start, granularity)
+    clauses.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    await conn.execute(text(
+        f"ALTER TABLE {AD_CLICKS_TABLE} PARTITION BY RANGE (TO_DAYS(created_at)) ({', '.join(clauses)})"
+    ))
+
+
+async def ensure_future_partitions(conn: AsyncConnection, partitions: List[str]) -> int:
+    """pmax 를 쪼개 앞으로 AD_CLICKS_PARTITIONS_AHEAD 개 기간의 파티션을 미리 만들어 둡니다."""
+    granularity = settings.AD_CLICKS_PARTITION_GRANULARITY
+    existing = {parse_partition_start(name) for name in partitions} - {None}
+    start = period_start(date.today(), granularity)
+    if existing:
+        start = max(start, next_period(max(existing), granularity))
+    horizon = period_start(date.today(), granularity)
+    for _ in range(settings.AD_CLICKS_PARTITIONS_AHEAD):
+        horizon = next_period(horizon, granularity)
+
+    clauses = []
+    while start <= horizon:
+        clauses.append(_partition_clause(start))
+        start = next_period(start, granularity)
+    if clauses:
+        await conn.execute(text(
+            f"ALTER TABLE {AD_CLICKS_TABLE} REORGANIZE PARTITION pmax INTO "
+            f"({', '.join(clauses)}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+        ))
+    return len(clauses)
+
+
+async def maintain_partitions() -> None:
+    """
+    앱 시작 시 호출: 필요하면 파티션 테이블로 변환하고 미래 파티션을 준비합니다. (MySQL 전용)
+    모든 워커가 시작 시 호출하므로 네임드 락을 잡은 워커 하나만 DDL 을 실행하고,
+    나머지는 그 작업이 끝나기를 기다린 뒤 이미 준비된 상태를 확인만 합니다.
+    """
+    if not settings.AD_CLICKS_PARTITIONING_ENABLED or async_engine.dialect.name != "mysql":
+        return
+    async with named_lock(RETENTION_LOCK_NAME, PARTITION_LOCK_WAIT_SECONDS) as acquired:
+        if not acquired:
+            print(f"경고: 다른 워커가 {AD_CLICKS_TABLE} 파티션 작업을 진행 중이어서 건너뜁니다.")
+            return
+        await _prepare_partitions()
+
+
+async def _prepare_partitions() -> None:
+    """RETENTION_LOCK_NAME 락을 잡은 상태에서만 호출합니다."""
+    async with async_engine.begin() as conn:
+        partitions = await get_partitions(conn)
+        if not partitions:
+            print(f"{AD_CLICKS_TABLE} 테이블을 파티션 테이블로 변환합니다.")
+            await convert_to_partitioned(conn)
+            partitions = await get_partitions(conn)
+        created = await ensure_future_partitions(conn, partitions)
+    if created:
+        print(f"{AD_CLICKS_TABLE} 미래 파티션 {created}개 생성")
+
+
+# --- 보존 기간 정리 ---
+async def _drop_expired_partitions(cutoff: date) -> int:
+    granularity = settings.AD_CLICKS_PARTITION_GRANULARITY
+    async with async_engine.connect() as conn:
+        partitions = await get_partitions(conn)
+    dropped = 0
+    for name in partitions:
+        start = parse_partition_start(name)
+        if start is None:
+            continue
+        end = next_period(start, granularity)
+        if end > cutoff:
+            break
+        rows, path = await archive_range(datetime.combine(start, datetime.min.time()),
+                                         datetime.combine(end, datetime.min.time()))
+        async with async_engine.begin() as conn:
+            await conn.execute(text(f"ALTER TABLE {AD_CLICKS_TABLE} DROP PARTITION {name}"))
+        print(f"보존 기간 만료 파티션 {name} 삭제 (보관 {rows}건: {path})")
+        dropped += 1
+    return dropped
+
+
+async def _delete_range(range_start: datetime, range_end: datetime) -> int:
+    """
+    범위의 클릭을 AD_CLICKS_DELETE_CHUNK_SIZE 건씩 나누어 지우고 매번 커밋합니다.
+    한 트랜잭션으로 한 기간 전체를 지우면 락과 언두 로그가 커지고 복제 지연이 생기기 때문입니다.
+    """
+    deleted = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            ids = (await db.execute(
+                select(AdClick.id)
+                .where(AdClick.created_at >= range_start, AdClick.created_at < range_end)
+                .limit(settings.AD_CLICKS_DELETE_CHUNK_SIZE)
+            )).scalars().all()
+            if not ids:
+                return deleted
+            result = await db.execute(delete(AdClick).where(AdClick.id.in_(ids)))
+            await db.commit()
+        deleted += result.rowcount
+
+
+async def _delete_expired_rows(cutoff: date) -> int:
+    """파티션이 없는 테이블(또는 MySQL 외 DB)은 기간별로 보관한 뒤 나누어 삭제합니다."""
+    granularity = settings.AD_CLICKS_PARTITION_GRANULARITY
+    async with AsyncSessionLocal() as db:
+        oldest = (await db.execute(select(AdClick.created_at).order_by(AdClick.created_at).limit(1))).scalar()
+    if oldest is None:
+        return 0
+
+    deleted = 0
+    start = period_start(oldest.date(), granularity)
+    while start < cutoff:
+        end = min(next_period(start, granularity), cutoff)
+        range_start = datetime.combine(start, datetime.min.time())
+        range_end = datetime.combine(end, datetime.min.time())
+        rows, path = await archive_range(range_start, range_end)
+        range_deleted = await _delete_range(range_start, range_end)
+        if rows:
+            print(f"보존 기간 만료 클릭 {range_deleted}건 삭제 (보관 {rows}건: {path})")
+        deleted += range_deleted
+        start = end
+    return deleted
+
+
+async def _delete_expired_duplicates(cutoff: date) -> int:
+    """중복 클릭 제거로 남긴 반복 클릭 수도 같은 보존 기간을 적용합니다. (집계된 작은 테이블이라 보관하지 않음)"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            delete(AdClickDuplicate).where(AdClickDuplicate.created_at < datetime.combine(cutoff, datetime.min.time()))
+        )
+        await db.commit()
+    return result.rowcount
+
+
+async def run_retention() -> None:
+    """보존 기간이 지난 클릭을 아카이브한 뒤 삭제하고, 파티션 테이블이면 미래 파티션도 준비합니다."""
+    cutoff = date.today() - timedelta(days=settings.AD_CLICKS_RETENTION_DAYS)
+    async with named_lock(RETENTION_LOCK_NAME) as acquired:
+        if not acquired:
+            return
+        await _delete_expired_duplicates(cutoff)
+        if async_engine.dialect.name == "mysql":
+            async with async_engine.connect() as conn:
+                partitions = await get_partitions(conn)
+            if partitions:
+                await _drop_expired_partitions(cutoff)
+                await _prepare_partitions()
+                return
+        await _delete_expired_rows(cutoff)
+
+
+class ClickRetentionJob:
+    """앱 lifespan 동안 주기적으로 run_retention 을 실행하는 백그라운드 작업"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if settings.AD_CLICKS_RETENTION_DAYS <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await run_retention()
+            except Exception as e:
+                print(f"실패: 클릭 보존 기간 정리 중 오류 발생: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+
+click_retention_job = ClickRetentionJob(interval_seconds=settings.AD_CLICKS_RETENTION_INTERVAL_SECONDS)
@@ -0,0 +1,53 @@
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.upsert import increment_upsert
+from app.models.ad_click_rollup import AdClickDailyRollup, AdClickHourlyRollup, ROLLUP_DIMENSIONS
+
+ROLLUP_KEY_COLUMNS = ("advertiser_id", "bucket_start") + ROLLUP_DIMENSIONS
+
+
+def truncate_to_hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def truncate_to_day(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+ROLLUP_TABLES: Tuple[Tuple[type, Callable[[datetime], datetime]], ...] = (
+    (AdClickHourlyRollup, truncate_to_hour),
+    (AdClickDailyRollup, truncate_to_day),
+)
+
+
+def aggregate_clicks(rows: Iterable[dict], truncate: Callable[[datetime], datetime]) -> List[dict]:
+    """클릭 행들을 (광고주, 시간 버킷, 차원) 키별 클릭 수로 묶습니다."""
+    counts: Dict[tuple, int] = Counter()
+    for row in rows:
+        key = (row["advertiser_id"], truncate(row["created_at"])) + tuple(
+            row.get(dimension) or "" for dimension in ROLLUP_DIMENSIONS
+        )
+        counts[key] += 1
+    # 동시에 upsert 하는 워커 간 교착을 줄이기 위해 항상 같은 순서로 씁니다.
+    return [
+        dict(zip(ROLLUP_KEY_COLUMNS, key), click_count=count)
+        for key, count in sorted(counts.items(), key=lambda item: item[0])
+    ]
+
+
+async def apply_rollups(db: AsyncSession, rows: List[dict]) -> None:
+    """
+    저장하는 클릭 배치를 시간/일 단위 집계 테이블에 누적합니다.
+    호출한 쪽의 트랜잭션 안에서 실행되므로 원본 클릭과 집계가 함께 커밋됩니다.
+    """
+    dialect_name = db.bind.dialect.name
+    for model, truncate in ROLLUP_TABLES:
+        aggregated = aggregate_clicks(rows, truncate)
+        if aggregated:
+            await db.execute(
+                increment_upsert(dialect_name, model, aggregated, ROLLUP_KEY_COLUMNS, ("click_count",))
+            )
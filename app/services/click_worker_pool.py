@@ -0,0 +1,315 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.schemas.ad_click import AdClickData
+from app.services.advertiser_cache import CachedAdvertiser
+from app.services.click_ingest_service import click_ingest_writer
+from app.services.fraud_detection_service import build_click_row, process_ad_click, record_click_subjects
+from app.services.rule_registry import blocking_rule_registry
+from app.services.spill_files import orphaned_files
+
+OVERFLOW_DROP = "drop"
+OVERFLOW_SPILL = "spill"
+OVERFLOW_DEGRADE = "degrade"
+OVERFLOW_POLICIES = (OVERFLOW_DROP, OVERFLOW_SPILL, OVERFLOW_DEGRADE)
+
+# 워커 종료 신호
+_STOP = object()
+# 디스크에 쌓인 클릭을 다시 큐에 넣을지 확인하는 주기(초)
+SPILL_REPLAY_INTERVAL_SECONDS = 1.0
+
+
+class ClickJob(NamedTuple):
+    """랜딩 요청에서 넘겨받은 클릭 처리 작업. 요청 스코프 객체(DB 세션 등)는 담지 않습니다."""
+    client_ip: str
+    advertiser: CachedAdvertiser
+    ad_click_data: AdClickData
+    clicked_at: datetime
+    # 이미 카운터에 기록된 클릭의 규칙 평가만 하는 작업 (중복 클릭 제거 참고)
+    evaluate_only: bool = False
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "client_ip": self.client_ip,
+            "advertiser": list(self.advertiser),
+            "ad_click_data": self.ad_click_data.model_dump(mode="json"),
+            "clicked_at": self.clicked_at.isoformat(),
+            "evaluate_only": self.evaluate_only,
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line: str) -> "ClickJob":
+        data = json.loads(line)
+        return cls(
+            client_ip=data["client_ip"],
+            advertiser=CachedAdvertiser(*data["advertiser"]),
+            ad_click_data=AdClickData(**data["ad_click_data"]),
+            clicked_at=datetime.fromisoformat(data["clicked_at"]),
+            evaluate_only=data.get("evaluate_only", False),
+        )
+
+
+class ClickWorkerPool:
+    """
+    부정클릭 판정을 위한 고정 크기 워커 풀입니다.
+    랜딩 요청은 작업을 크기가 제한된 큐에 넣고 바로 리다이렉트하며,
+    워커 N개가 각자 AsyncSessionLocal 세션을 열어 process_ad_click 을 실행합니다.
+    동시에 쓰는 DB 커넥션은 워커 수를 넘지 않고, 큐가 가득 차면 overflow_policy 에 따라 처리합니다.
+      - drop: 클릭을 버립니다.
+      - spill: JSON 줄로 디스크(프로세스별 spill_path.{pid})에 기록했다가 큐에 여유가 생기면 다시 처리합니다.
+      - degrade: 클릭 로그와 카운터만 기록하고 규칙 평가는 생략합니다. (DB 커넥션을 쓰지 않음)
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        max_queue_size: int,
+        overflow_policy: str,
+        spill_path: str,
+        spill_max_bytes: int,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown click worker overflow policy: {overflow_policy}")
+        self.concurrency = concurrency
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.spill_path = spill_path
+        self.spill_max_bytes = spill_max_bytes
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._replay_task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self._spill_file = None
+        self.active = 0
+
+        # 모니터링용 카운터
+        self.queued_total = 0
+        self.processed_total = 0
+        self.failed_total = 0
+        self.dropped_total = 0
+        self.spilled_total = 0
+        self.degraded_total = 0
+        self.replayed_total = 0
+        self.rejected_total = 0
+
+    @property
+    def running(self) -> bool:
+        return any(not worker.done() for worker in self._workers)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def pending(self) -> int:
+        """큐에 있거나 처리 중인 작업 수"""
+        return self.queue_depth + self.active
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = asyncio.Event()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        # 이전 실행에서 디스크에 남긴 클릭이 있으면 정책과 관계없이 다시 처리합니다.
+        self._replay_task = asyncio.create_task(self._replay_loop())
+
+    async def stop(self) -> None:
+        """디스크 재처리를 멈추고 큐에 남은 작업을 모두 처리한 뒤 종료합니다."""
+        if not self.running:
+            return
+        self._stopping.set()
+        await self._replay_task
+        for _ in self._workers:
+            await self._queue.put(_STOP)
+        await asyncio.gather(*self._workers)
+        self._workers = []
+        self._replay_task = None
+        self._close_spill_file()
+
+    async def submit(self, job: ClickJob) -> None:
+        """
+        클릭 처리 작업을 큐에 넣습니다. 기다리지 않으며, 큐가 가득 차면 overflow_policy 를 적용합니다.
+        워커 풀이 동작 중이 아니면(lifespan 밖에서 호출 등) 직접 처리합니다.
+        """
+        if not self.running:
+            await self._process(job)
+            return
+        try:
+            self._queue.put_nowait(job)
+            self.queued_total += 1
+        except asyncio.QueueFull:
+            self._overflow(job)
+
+    def _overflow(self, job: ClickJob) -> None:
+        metrics.CLICK_QUEUE_OVERFLOW.inc(self.overflow_policy)
+        if self.overflow_policy == OVERFLOW_SPILL and self._spill(job):
+            self.spilled_total += 1
+        elif self.overflow_policy == OVERFLOW_DEGRADE and not job.evaluate_only and self._degrade(job):
+            self.degraded_total += 1
+        else:
+            self.dropped_total += 1
+
+    def _degrade(self, job: ClickJob) -> bool:
+        row = build_click_row(job.client_ip, job.advertiser, job.ad_click_data, job.clicked_at)
+        if not click_ingest_writer.try_submit(row):
+            return False
+        # process_ad_click 과 같이 대역 규칙의 대역 키에도 기록합니다. (DB를 읽지 않도록 메모리의 규칙만 사용)
+        rules = blocking_rule_registry.cached_rules(job.advertiser.id)
+        record_click_subjects(job.advertiser.id, job.client_ip, rules or ())
+        return True
+
+    @property
+    def _own_spill_path(self) -> str:
+        # 여러 uvicorn 워커가 한 파일을 나눠 쓰지 않도록 프로세스마다 따로 기록합니다.
+        return f"{self.spill_path}.{os.getpid()}"
+
+    @property
+    def _replay_path(self) -> str:
+        return f"{self.spill_path}.{os.getpid()}.replay"
+
+    def _spill(self, job: ClickJob) -> bool:
+        try:
+            if self._spill_file is None:
+                os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+                self._spill_file = open(self._own_spill_path, "a", encoding="utf-8")
+            if self._spill_file.tell() >= self.spill_max_bytes:
+                return False
+            self._spill_file.write(job.to_json() + "\n")
+            self._spill_file.flush()
+            return True
+        except OSError as e:
+            print(f"실패: 클릭 작업을 디스크에 기록하지 못했습니다. 오류: {e}")
+            return False
+
+    def _close_spill_file(self) -> None:
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    async def _process(self, job: ClickJob) -> None:
+        self.active += 1
+        try:
+            async with AsyncSessionLocal() as db:
+                await process_ad_click(
+                    db, job.client_ip, job.advertiser, job.ad_click_data, job.clicked_at, job.evaluate_only
+                )
+            self.processed_total += 1
+        except Exception as e:
+            self.failed_total += 1
+            print(f"실패: 클릭 처리 중 오류 발생. IP: {job.client_ip}, 광고주 ID: {job.advertiser.id}, 오류: {e}")
+        finally:
+            self.active -= 1
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            if job is _STOP:
+                return
+            await self._process(job)
+
+    async def _replay_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                if self.queue_depth < self.max_queue_size // 2:
+                    await self._replay_spilled()
+            except Exception as e:
+                print(f"실패: 디스크에 기록된 클릭 재처리 중 오류 발생: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), SPILL_REPLAY_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _replay_spilled(self) -> None:
+        """
+        기록된 클릭을 큐에 다시 넣습니다. 파일을 이 프로세스의 재처리 경로로 옮긴 뒤 읽으므로
+        그 사이 새로 넘치는 클릭은 새 파일에 쌓입니다.
+        읽을 수 없는 줄(기록 중 종료되어 잘린 줄 등)은 spill_path.rejected 로 옮기고 건너뛰며,
+        재처리 파일은 끝까지 읽은 뒤에만 지웁니다.
+        종료 중이면 남은 줄을 다시 기록해 두어 다음 기동 시 이어서 처리합니다.
+        """
+        if not os.path.exists(self._replay_path) and not self._claim_spilled():
+            return
+
+        with open(self._replay_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                if self._stopping.is_set():
+                    self._respill([line] + list(f))
+                    break
+                try:
+                    job = ClickJob.from_json(line)
+                except (ValueError, KeyError, TypeError) as e:
+                    self._reject(line, e)
+                    continue
+                # 큐가 가득 차면 자리가 날 때까지 기다리므로 재처리가 새 클릭을 밀어내지 않습니다.
+                await self._queue.put(job)
+                self.replayed_total += 1
+        os.remove(self._replay_path)
+
+    def _claim_spilled(self) -> bool:
+        """
+        이 프로세스가 기록한 파일을, 없으면 종료된 프로세스가 남긴 파일 하나를 재처리 경로로 옮깁니다.
+        여러 워커가 같은 파일을 가져가려 해도 os.replace 에 성공한 워커 하나만 처리합니다.
+        """
+        own_path = self._own_spill_path
+        if os.path.exists(own_path) and os.path.getsize(own_path) > 0:
+            # 옮긴 파일에 계속 쓰지 않도록 열어 둔 핸들을 닫습니다. 다음 기록 때 새 파일을 엽니다.
+            self._close_spill_file()
+            os.replace(own_path, self._replay_path)
+            return True
+        candidates = orphaned_files(self.spill_path, ".replay") + orphaned_files(self.spill_path)
+        # 프로세스별 파일을 쓰기 전 버전이 남긴 파일
+        candidates += [self.spill_path + ".replay", self.spill_path]
+        for path in candidates:
+            try:
+                os.replace(path, self._replay_path)
+            except FileNotFoundError:
+                continue
+            print(f"종료된 워커가 남긴 클릭 작업 파일 {path} 를 재처리합니다.")
+            return True
+        return False
+
+    def _reject(self, line: str, error: Exception) -> None:
+        self.rejected_total += 1
+        print(f"실패: 디스크에 기록된 클릭 작업을 읽을 수 없어 건너뜁니다. 오류: {error}")
+        try:
+            with open(self.spill_path + ".rejected", "a", encoding="utf-8") as f:
+                f.write(line if line.endswith("\n") else line + "\n")
+        except OSError as e:
+            print(f"실패: 읽을 수 없는 클릭 작업을 보관하지 못했습니다. 오류: {e}")
+
+    def _respill(self, lines: List[str]) -> None:
+        self._close_spill_file()
+        with open(self._own_spill_path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "active": self.active,
+            "queued_total": self.queued_total,
+            "processed_total": self.processed_total,
+            "failed_total": self.failed_total,
+            "dropped_total": self.dropped_total,
+            "spilled_total": self.spilled_total,
+            "degraded_total": self.degraded_total,
+            "replayed_total": self.replayed_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+click_worker_pool = ClickWorkerPool(
+    concurrency=settings.CLICK_WORKER_CONCURRENCY,
+    max_queue_size=settings.CLICK_WORKER_QUEUE_MAXSIZE,
+    overflow_policy=settings.CLICK_WORKER_OVERFLOW_POLICY,
+    spill_path=settings.CLICK_WORKER_SPILL_PATH,
+    spill_max_bytes=settings.CLICK_WORKER_SPILL_MAX_BYTES,
+)
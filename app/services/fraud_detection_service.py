@@ -1,63 +1,292 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, case
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import ipaddress
 
-from app.models.advertiser import Advertiser
+from app.core import metrics
+from app.core.config import settings
 from app.models.ad_click import AdClick
-from app.models.blocking_rule import BlockingRule
+from app.models.ad_click_duplicate import AdClickDuplicate
 from app.models.blocked_ip_log import BlockedIpLog
+from app.models.ip_block_outbox import IpBlockOutbox
 from app.schemas.ad_click import AdClickData
-from app.services import naver_ad_service
-
-async def process_ad_click(db: AsyncSession, client_ip: str, advertiser: Advertiser, ad_click_data: AdClickData):
-    # ... 기존 클릭 로그 저장 로직 (변경 없음) ...
-    new_click = AdClick(
-        client_ip=client_ip,
-        advertiser_id=advertiser.id,
-        # ... 이하 생략 ...
-        query=ad_click_data.query
+from app.services.advertiser_cache import CachedAdvertiser
+from app.services.blocked_ip_index import get_blocked_ip_index
+from app.services.click_counter import get_click_counter
+from app.services.click_ingest_service import click_ingest_writer
+from app.services.ip_prefix import covering_prefix, is_prefix, like_pattern
+from app.services.ip_block_outbox_worker import ip_block_outbox_worker
+from app.services.naver_ad_service import is_naver_filterable
+from app.services.rule_registry import CompiledRule, blocking_rule_registry
+
+def rule_subject(rule: CompiledRule, client_ip: str) -> str:
+    """규칙이 클릭을 세는 단위. 대역 규칙이면 IP를 감싸는 대역, 아니면 IP 자체입니다."""
+    return covering_prefix(client_ip, rule.ipv4_prefix_length, rule.ipv6_prefix_length)
+
+def record_click_subjects(advertiser_id: int, client_ip: str, rules: Sequence[CompiledRule]) -> None:
+    """클릭을 IP와, 대역 규칙이 있으면 IP를 감싸는 대역에도 카운터에 기록합니다."""
+    click_counter = get_click_counter()
+    for subject in {client_ip} | {rule_subject(rule, client_ip) for rule in rules}:
+        click_counter.record(advertiser_id, subject)
+
+async def count_clicks_from_db(
+    db: AsyncSession, advertiser_id: int, subject: str, windows_minutes: Sequence[int]
+) -> List[int]:
+    """
+    카운터가 다루지 않는 긴 시간 범위의 규칙을 위해 DB에서 직접 클릭 수를 집계합니다.
+    여러 시간 범위를 조건부 합계로 한 번의 쿼리에서 계산합니다.
+    subject 가 CIDR 대역이면 LIKE 로 후보 IP를 좁혀 IP별로 집계한 뒤 대역에 속한 IP만 더합니다.
+    중복 클릭 제거를 쓰면 ad_click_duplicates 에 남긴 반복 클릭 수도 더합니다.
+    (아직 수집기 큐에서 저장되지 않은 최근 클릭은 포함되지 않습니다.)
+    """
+    now = datetime.now()
+    since_list = [now - timedelta(minutes=minutes) for minutes in windows_minutes]
+    counts = await _sum_clicks(db, AdClick, 1, advertiser_id, subject, since_list)
+    if settings.CLICK_DEDUP_ENABLED:
+        duplicates = await _sum_clicks(
+            db, AdClickDuplicate, AdClickDuplicate.duplicate_count, advertiser_id, subject, since_list
+        )
+        counts = [count + duplicate for count, duplicate in zip(counts, duplicates)]
+    return counts
+
+async def _sum_clicks(
+    db: AsyncSession, model, weight, advertiser_id: int, subject: str, since_list: Sequence[datetime]
+) -> List[int]:
+    """model(ad_clicks 또는 ad_click_duplicates)에서 시간 범위별로 weight 의 합계를 구합니다."""
+    sums = [func.sum(case((model.created_at >= since, weight), else_=0)) for since in since_list]
+    conditions = [model.advertiser_id == advertiser_id, model.created_at >= min(since_list)]
+
+    if not is_prefix(subject):
+        click_count_query = select(*sums).where(and_(model.client_ip == subject, *conditions))
+        click_count_result = await db.execute(click_count_query)
+        return [int(count or 0) for count in click_count_result.one()]
+
+    network = ipaddress.ip_network(subject)
+    click_count_query = (
+        select(model.client_ip, *sums)
+        .where(and_(model.client_ip.like(like_pattern(network)), *conditions))
+        .group_by(model.client_ip)
+    )
+    totals = [0] * len(since_list)
+    for client_ip, *counts in (await db.execute(click_count_query)).all():
+        try:
+            if ipaddress.ip_address(client_ip) not in network:
+                continue
+        except ValueError:
+            continue
+        totals = [total + int(count or 0) for total, count in zip(totals, counts)]
+    return totals
+
+async def find_triggered_rule(
+    db: AsyncSession, advertiser_id: int, client_ip: str, rules: Sequence[CompiledRule]
+) -> Optional[Tuple[CompiledRule, int]]:
+    """
+    활성 규칙 전체를 한 번에 평가하여 임계치를 넘은 규칙과 그 클릭 수를 반환합니다.
+    규칙은 세는 단위(IP 또는 대역)별로 묶어 단위마다 카운터 조회 / DB 집계를 한 번씩만 합니다.
+    여러 규칙이 동시에 걸리면 가장 짧은 시간 범위의 규칙을 보고합니다.
+    """
+    click_counter = get_click_counter()
+    rules_by_subject: Dict[str, List[CompiledRule]] = {}
+    for rule in rules:
+        rules_by_subject.setdefault(rule_subject(rule, client_ip), []).append(rule)
+
+    counts = {}
+    for subject, subject_rules in rules_by_subject.items():
+        covered = [rule for rule in subject_rules if click_counter.covers(rule.window_seconds)]
+        uncovered = [rule for rule in subject_rules if not click_counter.covers(rule.window_seconds)]
+        if covered:
+            covered_counts = click_counter.count_many(advertiser_id, subject, [rule.window_seconds for rule in covered])
+            counts.update(zip([rule.id for rule in covered], covered_counts))
+        if uncovered:
+            uncovered_counts = await count_clicks_from_db(
+                db, advertiser_id, subject, [rule.time_window_minutes for rule in uncovered]
+            )
+            counts.update(zip([rule.id for rule in uncovered], uncovered_counts))
+
+    triggered = [rule for rule in rules if counts[rule.id] > rule.max_clicks]
+    if not triggered:
+        return None
+    rule = min(triggered, key=lambda r: r.window_seconds)
+    return rule, counts[rule.id]
+
+def find_triggered_rule_in_memory(
+    advertiser_id: int, client_ip: str, rules: Sequence[CompiledRule]
+) -> Optional[CompiledRule]:
+    """
+    카운터가 다루는 시간 범위의 규칙만 메모리 카운터로 평가합니다. (DB 조회 없음)
+    저장 / 평가를 생략하는 클릭(중복 클릭 등)이 임계치를 넘겼는지 빠르게 확인하는 데 씁니다.
+    """
+    click_counter = get_click_counter()
+    for rule in rules:
+        if not click_counter.covers(rule.window_seconds):
+            continue
+        subject = rule_subject(rule, client_ip)
+        if click_counter.count(advertiser_id, subject, rule.window_seconds) > rule.max_clicks:
+            return rule
+    return None
+
+async def block_ip(db: AsyncSession, advertiser: CachedAdvertiser, ip_address: str, memo: str) -> bool:
+    """
+    차단 로그와 네이버 전송용 아웃박스 항목을 같은 트랜잭션으로 저장합니다.
+    네이버 API 호출은 아웃박스 워커가 비동기로 처리하므로 여기서는 기다리지 않습니다.
+    이미 차단된 대상이면(유니크 키 충돌) 아무것도 저장하지 않고 False 를 반환합니다.
+    """
+    try:
+        db.add(BlockedIpLog(
+            advertiser_id=advertiser.id,
+            ip_address=ip_address,
+            memo=memo[:255]
+        ))
+        db.add(IpBlockOutbox(
+            advertiser_id=advertiser.id,
+            customer_id=advertiser.naver_customer_id,
+            ip_address=ip_address,
+            # 워커가 앱 시각(datetime.now)으로 비교하므로 DB 서버 시각 대신 앱 시각으로 기록합니다.
+            next_attempt_at=datetime.now()
+        ))
+        await db.commit()
+    except IntegrityError:
+        # 다른 워커가 먼저 같은 대상을 차단했습니다. (광고주, 대상) 유니크 키로 로그 / 아웃박스 중복을 막습니다.
+        await db.rollback()
+        get_blocked_ip_index().add(advertiser.id, ip_address)
+        print(f"건너뜀: IP {ip_address} 는 이미 차단되었습니다. 광고주 ID: {advertiser.id}")
+        return False
+    except Exception as e:
+        await db.rollback()
+        print(f"실패: 차단 로그 저장 중 오류로 DB 롤백. IP: {ip_address}, 오류: {e}")
+        return False
+
+    get_blocked_ip_index().add(advertiser.id, ip_address)
+    ip_block_outbox_worker.wake()
+    print(f"성공: IP {ip_address} 차단 결정 저장 완료 (네이버 전송 대기). 광고주 ID: {advertiser.id}, 사유: {memo}")
+    return True
+
+async def aggregate_blocked_prefix(db: AsyncSession, advertiser: CachedAdvertiser, ip_address: str) -> Optional[str]:
+    """
+    방금 차단한 IP가 속한 대역(IPv4 /24, IPv6 /64 등)에 차단된 IP가 임계치 이상 모이면 대역 전체를 차단합니다.
+    대역을 차단하면 그 안의 새 IP는 인덱스 조회만으로 걸러지므로 네이버 API 호출과 제외 IP 슬롯을 아낍니다.
+    차단한 대역 문자열을 반환하고, 통합하지 않았으면 None 을 반환합니다.
+    """
+    if not settings.BLOCK_AGGREGATION_ENABLED:
+        return None
+    prefix = covering_prefix(
+        ip_address, settings.BLOCK_AGGREGATION_IPV4_PREFIX_LENGTH, settings.BLOCK_AGGREGATION_IPV6_PREFIX_LENGTH
     )
-    db.add(new_click)
-    await db.commit()
+    # 네이버에 등록할 수 없는 대역(옥텟 단위가 아닌 IPv4, IPv6)은 통합하지 않습니다.
+    if prefix == ip_address or not is_naver_filterable(prefix):
+        return None
 
-    # ... 기존 규칙 조회 및 클릭 수 계산 로직 (변경 없음) ...
-    rule_query = select(BlockingRule).where(
-        BlockingRule.advertiser_id == advertiser.id,
-        BlockingRule.is_active
+    network = ipaddress.ip_network(prefix)
+    blocked_query = select(BlockedIpLog.ip_address).where(
+        BlockedIpLog.advertiser_id == advertiser.id,
+        BlockedIpLog.ip_address.like(like_pattern(network))
     )
-    # ... 이하 생략 ...
-    click_count = click_count_result.scalar_one()
+    blocked_targets = set((await db.execute(blocked_query)).scalars().all())
+    if prefix in blocked_targets:
+        return None
+    blocked_ips = set()
+    for target in blocked_targets:
+        if is_prefix(target):
+            continue
+        try:
+            if ipaddress.ip_address(target) in network:
+                blocked_ips.add(target)
+        except ValueError:
+            continue
+    if len(blocked_ips) < settings.BLOCK_AGGREGATION_THRESHOLD:
+        return None
 
-    if click_count > blocking_rule.max_clicks:
-        check_query = select(BlockedIpLog).where(
-            BlockedIpLog.advertiser_id == advertiser.id,
-            BlockedIpLog.ip_address == client_ip
-        )
-        check_result = await db.execute(check_query)
-        already_blocked = check_result.scalar_one_or_none()
-        
-        if not already_blocked:
-            # --- 여기부터 로직 변경 ---
-            try:
-                # 1. 우리 DB에 차단 로그를 '준비'만 합니다 (아직 저장 안 함).
-                new_blocked_ip = BlockedIpLog(
-                    advertiser_id=advertiser.id,
-                    ip_address=client_ip,
-                    memo="자동화 솔루션에 의해 차단됨"
-                )
-                db.add(new_blocked_ip)
-                
-                # 2. 네이버 광고 API를 호출합니다.
-                await naver_ad_service.block_ip_address(
-                    customer_id=advertiser.naver_customer_id,
-                    ip_address=client_ip
-                )
-                
-                # 3. API 호출이 성공했을 때만 DB에 최종 저장(commit)합니다.
-                await db.commit()
-                print(f"성공: IP {client_ip} 차단 및 DB 저장 완료. 광고주 ID: {advertiser.id}")
-
-            except Exception as e:
-                # 4. API 호출이 실패하면 DB 변경사항을 모두 취소(rollback)합니다.
-                await db.rollback()
-                print(f"실패: 네이버 API 연동 오류로 DB 롤백. IP: {client_ip}, 오류: {e}")
\ No newline at end of file
+    memo = f"자동화 솔루션에 의해 대역 차단됨 ({prefix} 내 차단 IP {len(blocked_ips)}개)"
+    if await block_ip(db, advertiser, prefix, memo):
+        return prefix
+    return None
+
+def build_click_row(
+    client_ip: str, advertiser: CachedAdvertiser, ad_click_data: AdClickData, clicked_at: datetime
+) -> dict:
+    """수집기에 넘길 ad_clicks 행을 만듭니다."""
+    return {
+        "client_ip": client_ip,
+        "advertiser_id": advertiser.id,
+        "destination_url": str(ad_click_data.destination_url),
+        "keyword": ad_click_data.keyword,
+        "match_type": ad_click_data.match_type,
+        "network_type": ad_click_data.network_type,
+        "device_type": ad_click_data.device_type,
+        "ad_group_id": ad_click_data.ad_group_id,
+        "ad_id": ad_click_data.ad_id,
+        "keyword_id": ad_click_data.keyword_id,
+        "creative_id": ad_click_data.creative_id,
+        "query": ad_click_data.query,
+        "created_at": clicked_at,
+    }
+
+async def process_ad_click(
+    db: AsyncSession,
+    client_ip: str,
+    advertiser: CachedAdvertiser,
+    ad_click_data: AdClickData,
+    clicked_at: Optional[datetime] = None,
+    evaluate_only: bool = False,
+):
+    """
+    클릭을 저장하고 카운터에 기록한 뒤 차단 규칙을 평가합니다.
+    evaluate_only 이면 이미 카운터에 기록된 클릭(중복 클릭 등)이므로 저장 / 기록 없이 규칙 평가와 차단만 합니다.
+    """
+    stage_timer = metrics.CLICK_STAGE_DURATION.time
+
+    if not evaluate_only:
+        # 1. 클릭 로그 저장 (수집기가 모아서 다중 행 INSERT 로 저장)
+        #    created_at 은 저장 시점이 아닌 클릭(요청 수신) 시점으로 기록합니다.
+        with stage_timer("insert"):
+            await click_ingest_writer.submit(
+                build_click_row(client_ip, advertiser, ad_click_data, clicked_at or datetime.now())
+            )
+
+        # 2. 메모리 카운터에 클릭 기록 (임계치 판단에 DB 집계를 쓰지 않기 위함)
+        get_click_counter().record(advertiser.id, client_ip)
+
+    # 이미 차단된 IP는 규칙 평가와 중복 확인 쿼리를 모두 건너뜁니다.
+    blocked_ip_index = get_blocked_ip_index()
+    if blocked_ip_index.contains(advertiser.id, client_ip):
+        return
+
+    # 3. 규칙 조회 (레지스트리에 캐시된 컴파일된 규칙) 및 전체 규칙 일괄 평가
+    with stage_timer("rule_lookup"):
+        rules = await blocking_rule_registry.get_rules(db, advertiser.id)
+    if not rules:
+        return
+    # 대역 단위 규칙이 있으면 IP를 감싸는 대역에도 클릭을 기록합니다.
+    if not evaluate_only:
+        click_counter = get_click_counter()
+        for subject in {rule_subject(rule, client_ip) for rule in rules} - {client_ip}:
+            click_counter.record(advertiser.id, subject)
+    with stage_timer("count"):
+        triggered = await find_triggered_rule(db, advertiser.id, client_ip, rules)
+
+    if triggered:
+        blocking_rule, click_count = triggered
+        # 대역 규칙이면 IP 대신 대역을 차단합니다. 네이버에 등록할 수 없는 대역(IPv6)은 IP만 차단합니다.
+        block_target = rule_subject(blocking_rule, client_ip)
+        if not is_naver_filterable(block_target):
+            block_target = client_ip
+        with stage_timer("block_check"):
+            check_query = select(BlockedIpLog).where(
+                BlockedIpLog.advertiser_id == advertiser.id,
+                BlockedIpLog.ip_address == block_target
+            )
+            check_result = await db.execute(check_query)
+            already_blocked = check_result.scalars().first()
+
+        if already_blocked:
+            # 다른 워커가 차단한 경우 등 인덱스에 없던 IP를 반영합니다.
+            blocked_ip_index.add(advertiser.id, block_target)
+        else:
+            memo = f"자동화 솔루션에 의해 차단됨 (규칙: {blocking_rule.name}, {click_count}회/{blocking_rule.time_window_minutes}분)"
+            with stage_timer("block_commit"):
+                blocked = await block_ip(db, advertiser, block_target, memo)
+            if blocked and not is_prefix(block_target):
+                with stage_timer("aggregate"):
+                    await aggregate_blocked_prefix(db, advertiser, block_target)
@@ -0,0 +1,183 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import func, select, update
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.ip_block_outbox import (
+    IpBlockOutbox,
+    OUTBOX_STATUS_DONE,
+    OUTBOX_STATUS_FAILED,
+    OUTBOX_STATUS_PENDING,
+    OUTBOX_STATUS_SENDING,
+)
+from app.services.naver_block_dispatcher import naver_block_dispatcher
+
+
+class IpBlockOutboxWorker:
+    """
+    ip_block_outbox 에 쌓인 IP 차단 요청을 네이버 광고 API로 전송하는 비동기 워커입니다.
+    항목 선점(claim), 전송, 결과 기록을 각각 짧은 트랜잭션으로 나누어
+    네이버 응답을 기다리는 동안 DB 커넥션을 잡고 있지 않습니다.
+    """
+
+    def __init__(
+        self,
+        poll_interval_seconds: float,
+        batch_size: int,
+        max_attempts: int,
+        retry_delay_seconds: float,
+        claim_timeout_seconds: float,
+    ):
+        self.poll_interval_seconds = poll_interval_seconds
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+        self.claim_timeout_seconds = claim_timeout_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+        # 모니터링용 카운터
+        self.sent_total = 0
+        self.failed_attempts_total = 0
+        self.gave_up_total = 0
+        self.last_batch_size = 0
+        # 마지막 폴링 시점에 전송 대기 / 전송 중이던 항목 수 (적체량)
+        self.pending_rows = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """진행 중인 배치를 마친 뒤 워커를 종료합니다. 남은 항목은 다음 기동 시 처리됩니다."""
+        if not self.running:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    def wake(self) -> None:
+        """새 항목이 기록되었음을 알려 다음 폴링을 기다리지 않고 바로 처리하게 합니다."""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                processed = await self.process_batch()
+            except Exception as e:
+                processed = 0
+                print(f"실패: IP 차단 아웃박스 처리 중 오류 발생: {e}")
+            if processed == 0 and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def _claim(self) -> List[IpBlockOutbox]:
+        now = datetime.now()
+        claim_token = uuid.uuid4().hex
+        async with AsyncSessionLocal() as db:
+            # 선점 후 오래 방치된 항목(워커 비정상 종료 등)은 다시 대기 상태로 돌립니다.
+            await db.execute(
+                update(IpBlockOutbox)
+                .where(
+                    IpBlockOutbox.status == OUTBOX_STATUS_SENDING,
+                    IpBlockOutbox.claimed_at < now - timedelta(seconds=self.claim_timeout_seconds),
+                )
+                .values(status=OUTBOX_STATUS_PENDING, claim_token=None)
+            )
+            self.pending_rows = (await db.execute(
+                select(func.count()).select_from(IpBlockOutbox).where(
+                    IpBlockOutbox.status.in_((OUTBOX_STATUS_PENDING, OUTBOX_STATUS_SENDING))
+                )
+            )).scalar() or 0
+            candidate_ids = (await db.execute(
+                select(IpBlockOutbox.id)
+                .where(IpBlockOutbox.status == OUTBOX_STATUS_PENDING, IpBlockOutbox.next_attempt_at <= now)
+                .order_by(IpBlockOutbox.id)
+                .limit(self.batch_size)
+            )).scalars().all()
+            if not candidate_ids:
+                await db.commit()
+                return []
+
+            await db.execute(
+                update(IpBlockOutbox)
+                .where(IpBlockOutbox.id.in_(candidate_ids), IpBlockOutbox.status == OUTBOX_STATUS_PENDING)
+                .values(status=OUTBOX_STATUS_SENDING, claim_token=claim_token, claimed_at=now)
+            )
+            await db.commit()
+
+            claimed = (await db.execute(
+                select(IpBlockOutbox).where(IpBlockOutbox.claim_token == claim_token)
+            )).scalars().all()
+            return list(claimed)
+
+    async def process_batch(self) -> int:
+        """대기 중인 항목을 한 번 처리하고 처리한 건수를 반환합니다."""
+        entries = await self._claim()
+        self.last_batch_size = len(entries)
+        if not entries:
+            return 0
+
+        results = await asyncio.gather(
+            *[naver_block_dispatcher.dispatch(customer_id=e.customer_id, ip_address=e.ip_address) for e in entries],
+            return_exceptions=True,
+        )
+
+        now = datetime.now()
+        async with AsyncSessionLocal() as db:
+            for entry, result in zip(entries, results):
+                if isinstance(result, BaseException):
+                    attempts = entry.attempts + 1
+                    self.failed_attempts_total += 1
+                    # 네이버에 등록할 수 없는 대상(ValueError)은 다시 보내도 실패하므로 바로 포기합니다.
+                    gave_up = attempts >= self.max_attempts or isinstance(result, ValueError)
+                    if gave_up:
+                        self.gave_up_total += 1
+                    values = {
+                        "status": OUTBOX_STATUS_FAILED if gave_up else OUTBOX_STATUS_PENDING,
+                        "attempts": attempts,
+                        "last_error": str(result)[:1024],
+                        "claim_token": None,
+                        "next_attempt_at": now + timedelta(seconds=self.retry_delay_seconds * attempts),
+                    }
+                    print(f"실패: IP {entry.ip_address} 네이버 차단 전송 실패 ({attempts}회차). 오류: {result}")
+                else:
+                    self.sent_total += 1
+                    values = {"status": OUTBOX_STATUS_DONE, "claim_token": None, "processed_at": now}
+                await db.execute(update(IpBlockOutbox).where(IpBlockOutbox.id == entry.id).values(**values))
+            await db.commit()
+        return len(entries)
+
+    def stats(self) -> dict:
+        return {
+            "sent_total": self.sent_total,
+            "failed_attempts_total": self.failed_attempts_total,
+            "gave_up_total": self.gave_up_total,
+            "last_batch_size": self.last_batch_size,
+            "pending_rows": self.pending_rows,
+        }
+
+
+ip_block_outbox_worker = IpBlockOutboxWorker(
+    poll_interval_seconds=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    retry_delay_seconds=settings.OUTBOX_RETRY_DELAY_SECONDS,
+    claim_timeout_seconds=settings.OUTBOX_CLAIM_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,162 @@
+import ipaddress
+from typing import Dict, Iterator, Optional, Union
+
+IpNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def is_prefix(value: str) -> bool:
+    """차단 대상 문자열이 단일 IP가 아닌 CIDR 대역인지 여부"""
+    return "/" in value
+
+
+def normalize_block_target(value: str) -> str:
+    """
+    IP 또는 CIDR 문자열을 저장 / 비교용 표준 형태로 바꿉니다.
+    호스트 비트가 남은 CIDR 은 네트워크 주소로 내리고, /32(/128) 대역은 단일 IP로 취급합니다.
+    """
+    if not is_prefix(value):
+        return ipaddress.ip_address(value).compressed
+    network = ipaddress.ip_network(value, strict=False)
+    if network.prefixlen == network.max_prefixlen:
+        return network.network_address.compressed
+    return network.compressed
+
+
+def covering_prefix(ip_address: str, ipv4_prefix_length: Optional[int], ipv6_prefix_length: Optional[int]) -> str:
+    """
+    IP를 주소 체계에 맞는 접두사 길이의 대역 문자열로 바꿉니다.
+    해당 주소 체계의 길이가 지정되지 않았거나 IP를 해석할 수 없으면 IP를 그대로 돌려줍니다.
+    """
+    try:
+        address = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return ip_address
+    prefix_length = ipv4_prefix_length if address.version == 4 else ipv6_prefix_length
+    if not prefix_length or prefix_length >= address.max_prefixlen:
+        return ip_address
+    return ipaddress.ip_network(f"{address}/{prefix_length}", strict=False).compressed
+
+
+class _Node:
+    __slots__ = ("value", "length", "terminal", "children")
+
+    def __init__(self, value: int, length: int, terminal: bool = False):
+        self.value = value
+        self.length = length
+        self.terminal = terminal
+        self.children = [None, None]
+
+
+class PrefixTrie:
+    """
+    IPv4 / IPv6 대역을 담는 경로 압축 이진 라디스 트리입니다.
+    분기가 없는 구간은 노드 하나로 합치므로 노드 수는 저장한 대역 수의 두 배를 넘지 않고,
+    IP 하나의 포함 여부는 접두사 길이만큼의 비교로 끝납니다.
+    """
+
+    def __init__(self):
+        self._roots: Dict[int, _Node] = {4: _Node(0, 0), 6: _Node(0, 0)}
+        self._size = 0
+
+    @staticmethod
+    def _width(version: int) -> int:
+        return 32 if version == 4 else 128
+
+    @staticmethod
+    def _mask(value: int, length: int, width: int) -> int:
+        return value >> (width - length) << (width - length) if length else 0
+
+    @staticmethod
+    def _bit(value: int, index: int, width: int) -> int:
+        return (value >> (width - 1 - index)) & 1
+
+    def _common_length(self, a: int, b: int, length: int, width: int) -> int:
+        diff = self._mask(a ^ b, length, width)
+        return length if diff == 0 else width - diff.bit_length()
+
+    def add(self, network: IpNetwork) -> None:
+        width = self._width(network.version)
+        value, length = int(network.network_address), network.prefixlen
+        node = self._roots[network.version]
+        while True:
+            if length == node.length:
+                if not node.terminal:
+                    node.terminal = True
+                    self._size += 1
+                return
+            bit = self._bit(value, node.length, width)
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _Node(value, length, True)
+                self._size += 1
+                return
+            common = self._common_length(value, child.value, min(length, child.length), width)
+            if common == child.length:
+                node = child
+                continue
+            # 새 대역과 기존 자식이 갈라지는 지점에 중간 노드를 끼워 넣습니다.
+            middle = _Node(self._mask(value, common, width), common, common == length)
+            middle.children[self._bit(child.value, common, width)] = child
+            if common != length:
+                middle.children[self._bit(value, common, width)] = _Node(value, length, True)
+            node.children[bit] = middle
+            self._size += 1
+            return
+
+    def discard(self, network: IpNetwork) -> None:
+        width = self._width(network.version)
+        value, length = int(network.network_address), network.prefixlen
+        node = self._roots[network.version]
+        while node is not None and node.length < length:
+            node = node.children[self._bit(value, node.length, width)]
+        if node is not None and node.length == length and node.value == value and node.terminal:
+            node.terminal = False
+            self._size -= 1
+
+    def match(self, address: Union[str, ipaddress.IPv4Address, ipaddress.IPv6Address]) -> Optional[IpNetwork]:
+        """주소를 포함하는 가장 짧은 대역을 반환합니다. 없으면 None."""
+        if isinstance(address, str):
+            address = ipaddress.ip_address(address)
+        width = self._width(address.version)
+        value = int(address)
+        node = self._roots[address.version]
+        while node is not None:
+            if node.length and self._mask(value, node.length, width) != node.value:
+                return None
+            if node.terminal:
+                return ipaddress.ip_network((node.value, node.length))
+            if node.length == width:
+                return None
+            node = node.children[self._bit(value, node.length, width)]
+        return None
+
+    def __contains__(self, address) -> bool:
+        return self.match(address) is not None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[IpNetwork]:
+        for root in self._roots.values():
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                if node.terminal:
+                    yield ipaddress.ip_network((node.value, node.length))
+                stack.extend(child for child in node.children if child is not None)
+
+    def clear(self) -> None:
+        self.__init__()
+
+
+
+def like_pattern(network: IpNetwork) -> str:
+    """
+    대역에 속한 IP 문자열을 미리 걸러 내는 SQL LIKE 패턴입니다.
+    IPv4 는 대역이 고정하는 옥텟까지, IPv6 는 첫 헥스텟까지만 비교하므로 결과는 ip in network 로 다시 확인해야 합니다.
+    """
+    if network.version == 4:
+        octets = str(network.network_address).split(".")[: network.prefixlen // 8]
+        return ".".join(octets) + ".%" if octets else "%.%"
+    first_hextet = network.network_address.exploded.split(":")[0].lstrip("0")
+    return f"{first_hextet}:%" if network.prefixlen >= 16 and first_hextet else "%:%"
@@ -2,12 +2,12 @@ import time
 import hmac
 import hashlib
 import base64
+import ipaddress
 import httpx
 
+from app.core import http_client, metrics
 from app.core.config import settings
 
-BASE_URL = "https://api.searchad.naver.com"
-
 def get_auth_headers(method, uri, customer_id):
     timestamp = str(int(time.time() * 1000))
     secret_key = settings.NAVER_AD_SECRET_KEY.encode('UTF-8')
@@ -23,6 +23,30 @@ def get_auth_headers(method, uri, customer_id):
         'X-Signature': signature
     }
 
+def is_naver_filterable(ip_address: str) -> bool:
+    """
+    네이버 제외 IP 로 등록할 수 있는 차단 대상인지 여부.
+    단일 IP와 옥텟 단위 IPv4 대역(/8, /16, /24)만 가능하며, 그 밖의 대역(IPv6 대역 포함)은 표현할 수 없습니다.
+    """
+    if "/" not in ip_address:
+        return True
+    network = ipaddress.ip_network(ip_address, strict=False)
+    return network.version == 4 and network.prefixlen % 8 == 0 and network.prefixlen >= 8
+
+def to_naver_filter_ip(ip_address: str) -> str:
+    """
+    차단 대상을 네이버 제외 IP 형식으로 바꿉니다. 옥텟 단위 IPv4 대역은 와일드카드(예: 203.0.113.*)로 바꿉니다.
+    표현할 수 없는 대역은 ValueError 를 냅니다. (차단 경로에서 is_naver_filterable 로 걸러짐)
+    """
+    if "/" not in ip_address:
+        return ip_address
+    if not is_naver_filterable(ip_address):
+        raise ValueError(f"Naver IP exclusions cannot express {ip_address}")
+    network = ipaddress.ip_network(ip_address, strict=False)
+    fixed = network.prefixlen // 8
+    octets = str(network.network_address).split(".")
+    return ".".join(octets[:fixed] + ["*"] * (4 - fixed))
+
 async def block_ip_address(customer_id: int, ip_address: str):
     uri = "/tool/ip-exclusions"
     method = "POST"
@@ -30,20 +54,23 @@ async def block_ip_address(customer_id: int, ip_address: str):
     headers = get_auth_headers(method, uri, customer_id)
     
     payload = {
-        "filterIp": ip_address,
+        "filterIp": to_naver_filter_ip(ip_address),
         "memo": "자동화 솔루션에 의해 차단됨"
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(f"{BASE_URL}{uri}", headers=headers, json=payload)
-            response.raise_for_status()
-            
-            print(f"성공: IP {ip_address}가 고객 ID {customer_id}의 차단 목록에 추가되었습니다.")
-
-        except httpx.HTTPStatusError as e:
-            print(f"네이버 광고 API 오류 발생: {e.response.status_code}, 응답: {e.response.text}")
-            raise e
-        except httpx.RequestError as e:
-            print(f"네이버 광고 API 요청 중 예외 발생: {e}")
-            raise e
\ No newline at end of file
+    client = http_client.get_client("naver_ad")
+    try:
+        with metrics.NAVER_API_DURATION.time("block_ip"):
+            response = await client.post(uri, headers=headers, json=payload)
+        response.raise_for_status()
+        
+        print(f"성공: IP {ip_address}가 고객 ID {customer_id}의 차단 목록에 추가되었습니다.")
+
+    except httpx.HTTPStatusError as e:
+        metrics.NAVER_API_ERRORS.inc("block_ip", str(e.response.status_code))
+        print(f"네이버 광고 API 오류 발생: {e.response.status_code}, 응답: {e.response.text}")
+        raise e
+    except httpx.RequestError as e:
+        metrics.NAVER_API_ERRORS.inc("block_ip", type(e).__name__)
+        print(f"네이버 광고 API 요청 중 예외 발생: {e}")
+        raise e
\ No newline at end of file
@@ -0,0 +1,164 @@
+import asyncio
+import random
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.services import naver_ad_service
+
+# 재시도 대상이 되는 HTTP 상태 코드 (요청 한도 초과 및 서버 오류)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """초당 rate 개의 토큰이 채워지고 최대 burst 개까지 쌓이는 토큰 버킷입니다."""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """토큰 하나를 얻을 때까지 기다립니다. 대기자는 도착 순서대로 처리됩니다."""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate_per_second)
+
+
+class NaverBlockDispatcher:
+    """
+    네이버 IP 차단 요청을 보내는 디스패처입니다.
+    - 같은 (고객 ID, IP)에 대해 진행 중인 요청이 있으면 새로 보내지 않고 그 결과를 함께 기다립니다.
+    - 고객 ID별 토큰 버킷으로 네이버 API 호출 한도를 지킵니다.
+    - 429 / 5xx / 네트워크 오류는 지터가 있는 지수 백오프로 재시도합니다.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: int,
+        max_retries: int,
+        backoff_base_seconds: float,
+        backoff_max_seconds: float,
+    ):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._in_flight: Dict[Tuple[int, str], asyncio.Task] = {}
+        self._buckets: Dict[int, TokenBucket] = {}
+
+        # 모니터링용 카운터
+        self.requests_total = 0
+        self.coalesced_total = 0
+        self.retries_total = 0
+        self.failures_total = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def _bucket_for(self, customer_id: int) -> TokenBucket:
+        bucket = self._buckets.get(customer_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate_per_second, self.burst)
+            self._buckets[customer_id] = bucket
+        return bucket
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter: 0 ~ min(최대값, 기본값 * 2^attempt) 사이에서 무작위로 기다립니다.
+        delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    async def _send_with_retry(self, customer_id: int, ip_address: str) -> None:
+        bucket = self._bucket_for(customer_id)
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            self.requests_total += 1
+            try:
+                await naver_ad_service.block_ip_address(customer_id=customer_id, ip_address=ip_address)
+                return
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    self.failures_total += 1
+                    raise
+                retry_after = self._retry_after(e.response)
+            except httpx.RequestError:
+                if attempt >= self.max_retries:
+                    self.failures_total += 1
+                    raise
+                retry_after = None
+
+            self.retries_total += 1
+            await asyncio.sleep(self._backoff_delay(attempt, retry_after))
+            attempt += 1
+
+    def _on_done(self, key: Tuple[int, str], task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        # 기다리는 쪽이 모두 취소된 경우에도 예외가 '회수되지 않음' 경고로 남지 않게 합니다.
+        if not task.cancelled():
+            task.exception()
+
+    async def dispatch(self, customer_id: int, ip_address: str) -> None:
+        """
+        IP 차단 요청을 보내고 완료될 때까지 기다립니다.
+        동일한 요청이 이미 진행 중이면 그 요청의 결과(성공 또는 예외)를 공유합니다.
+        """
+        key = (customer_id, ip_address)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._send_with_retry(customer_id, ip_address))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._on_done(key, done))
+        else:
+            self.coalesced_total += 1
+        # 기다리던 쪽이 취소되어도 공유 중인 요청은 계속 진행되도록 보호합니다.
+        await asyncio.shield(task)
+
+    async def drain(self) -> None:
+        """진행 중인 모든 요청이 끝날 때까지 기다립니다."""
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight.values(), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "requests_total": self.requests_total,
+            "coalesced_total": self.coalesced_total,
+            "retries_total": self.retries_total,
+            "failures_total": self.failures_total,
+        }
+
+
+naver_block_dispatcher = NaverBlockDispatcher(
+    rate_per_second=settings.NAVER_API_RATE_PER_SECOND,
+    burst=settings.NAVER_API_BURST,
+    max_retries=settings.NAVER_API_MAX_RETRIES,
+    backoff_base_seconds=settings.NAVER_API_BACKOFF_BASE_SECONDS,
+    backoff_max_seconds=settings.NAVER_API_BACKOFF_MAX_SECONDS,
+)
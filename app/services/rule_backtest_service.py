@@ -0,0 +1,175 @@
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.ad_click import AdClick
+from app.schemas.blocking_rule import BacktestCandidate
+from app.services.ip_prefix import covering_prefix
+
+
+class ClickHistory(NamedTuple):
+    """광고주의 과거 클릭을 IP 코드 / 타임스탬프 배열로 담은 것"""
+    ips: np.ndarray        # 고유 IP 문자열 (정렬됨)
+    ip_codes: np.ndarray   # 클릭별 ips 인덱스
+    times: np.ndarray      # 클릭별 epoch 초
+
+    @property
+    def clicks(self) -> int:
+        return len(self.times)
+
+
+class _GroupedClicks(NamedTuple):
+    """(대상, 시각) 순으로 정렬한 클릭. 대상은 IP 또는 규칙의 대역입니다."""
+    subjects: np.ndarray
+    codes: np.ndarray
+    times: np.ndarray
+    keys: np.ndarray       # 대상끼리 겹치지 않도록 대상 코드만큼 띄운 정렬 키
+    starts: np.ndarray     # 대상별 시작 위치
+    ends: np.ndarray       # 대상별 끝 위치(미포함)
+
+
+async def load_click_history(db: AsyncSession, advertiser_id: int, start: datetime, end: datetime) -> ClickHistory:
+    """
+    기간 내 클릭의 (IP, 시각)만 서버 측 커서로 청크 단위로 읽어 NumPy 배열로 모읍니다.
+    BACKTEST_MAX_CLICKS 를 넘으면 400 오류를 냅니다.
+    """
+    query = (
+        select(AdClick.client_ip, AdClick.created_at)
+        .where(
+            AdClick.advertiser_id == advertiser_id,
+            AdClick.client_ip.isnot(None),
+            AdClick.created_at >= start,
+            AdClick.created_at < end,
+        )
+        .execution_options(yield_per=settings.BACKTEST_CHUNK_SIZE)
+    )
+    ip_chunks: List[np.ndarray] = []
+    time_chunks: List[np.ndarray] = []
+    loaded = 0
+    result = await db.stream(query)
+    async for rows in result.partitions():
+        loaded += len(rows)
+        if loaded > settings.BACKTEST_MAX_CLICKS:
+            await result.close()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many clicks to backtest (> {settings.BACKTEST_MAX_CLICKS}). Reduce 'days'."
+            )
+        ip_chunks.append(np.array([row[0] for row in rows], dtype=object))
+        time_chunks.append(np.array([row[1] for row in rows], dtype="datetime64[s]").astype(np.int64))
+
+    if not ip_chunks:
+        return ClickHistory(np.array([], dtype=object), np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+    ips, ip_codes = np.unique(np.concatenate(ip_chunks), return_inverse=True)
+    return ClickHistory(ips, ip_codes.astype(np.int64), np.concatenate(time_chunks))
+
+
+def _group(history: ClickHistory, ipv4_prefix_length: Optional[int], ipv6_prefix_length: Optional[int], stride: int) -> _GroupedClicks:
+    subjects, codes = history.ips, history.ip_codes
+    if ipv4_prefix_length or ipv6_prefix_length:
+        # IP 단위가 아닌 대역 단위 규칙은 고유 IP마다 한 번씩만 대역을 계산해 코드를 바꿉니다.
+        prefixes = np.array(
+            [covering_prefix(ip, ipv4_prefix_length, ipv6_prefix_length) for ip in history.ips], dtype=object
+        )
+        subjects, subject_of_ip = np.unique(prefixes, return_inverse=True)
+        codes = subject_of_ip[codes]
+
+    order = np.lexsort((history.times, codes))
+    codes = codes[order]
+    times = history.times[order]
+    keys = codes * stride + (times - history.times.min())
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)]
+    return _GroupedClicks(subjects, codes, times, keys, starts, ends)
+
+
+def _window_counts(grouped: _GroupedClicks, window_seconds: int) -> np.ndarray:
+    """각 클릭 시점에 직전 window_seconds 동안(경계 포함) 같은 대상에서 발생한 클릭 수"""
+    positions = np.arange(len(grouped.keys))
+    return positions - np.searchsorted(grouped.keys, grouped.keys - window_seconds, side="left") + 1
+
+
+def _to_datetime(epoch_seconds) -> datetime:
+    return np.datetime64(int(epoch_seconds), "s").astype(datetime)
+
+
+def _evaluate(
+    grouped: _GroupedClicks, counts: np.ndarray, peaks: np.ndarray, candidate: BacktestCandidate,
+    sample_limit: int, borderline_ratio: float,
+) -> dict:
+    triggered = np.flatnonzero(counts > candidate.max_clicks)
+    # 정렬되어 있으므로 대상별로 처음 임계치를 넘은 위치가 첫 차단 시점입니다.
+    triggered_codes = grouped.codes[triggered]
+    first_index = triggered[np.r_[True, triggered_codes[1:] != triggered_codes[:-1]][: len(triggered)]]
+    blocked_codes = grouped.codes[first_index]
+    clicks_after = grouped.ends[blocked_codes] - first_index - 1
+    blocked_peaks = peaks[blocked_codes]
+    borderline = int(np.count_nonzero(blocked_peaks <= candidate.max_clicks * (1 + borderline_ratio)))
+
+    samples = []
+    for i in np.argsort(-blocked_peaks, kind="stable")[:sample_limit]:
+        samples.append({
+            "subject": str(grouped.subjects[blocked_codes[i]]),
+            "first_trigger_at": _to_datetime(grouped.times[first_index[i]]),
+            "peak_clicks": int(blocked_peaks[i]),
+            "clicks_after_trigger": int(clicks_after[i]),
+        })
+
+    return {
+        **candidate.model_dump(),
+        "blocked_subjects": len(first_index),
+        "blocked_clicks": int(clicks_after.sum()),
+        "first_trigger_at": _to_datetime(grouped.times[first_index].min()) if len(first_index) else None,
+        "borderline_subjects": borderline,
+        "false_positive_estimate": borderline / len(first_index) if len(first_index) else 0.0,
+        "blocks": samples,
+    }
+
+
+def backtest(history: ClickHistory, candidates: Sequence[BacktestCandidate], sample_limit: int) -> List[dict]:
+    """
+    후보 규칙들을 과거 클릭에 적용해 차단됐을 대상과 첫 차단 시각을 계산합니다.
+    - 대상(IP / 대역)과 시각으로 한 번 정렬한 뒤, 시간 범위마다 searchsorted 한 번으로 모든 클릭 시점의 윈도우 클릭 수를 구합니다.
+      같은 대상 구분과 시간 범위를 쓰는 후보들은 이 계산을 공유하고 max_clicks 비교만 따로 합니다.
+    - 대상별 최대 윈도우 클릭 수가 max_clicks 를 BACKTEST_BORDERLINE_RATIO 이하로만 넘은 경우를 오탐 후보로 셉니다.
+    CPU 작업이므로 호출하는 쪽에서 스레드로 실행합니다.
+    """
+    if history.clicks == 0:
+        return [_evaluate_empty(candidate) for candidate in candidates]
+
+    max_window = max(candidate.time_window_minutes for candidate in candidates) * 60
+    stride = int(history.times.max() - history.times.min()) + max_window + 1
+    grouped_cache: Dict[Tuple[Optional[int], Optional[int]], _GroupedClicks] = {}
+    counts_cache: Dict[Tuple[Optional[int], Optional[int], int], Tuple[np.ndarray, np.ndarray]] = {}
+
+    results = []
+    for candidate in candidates:
+        grouping = (candidate.ipv4_prefix_length, candidate.ipv6_prefix_length)
+        grouped = grouped_cache.get(grouping)
+        if grouped is None:
+            grouped = grouped_cache[grouping] = _group(history, *grouping, stride)
+        window_seconds = candidate.time_window_minutes * 60
+        cached = counts_cache.get((*grouping, window_seconds))
+        if cached is None:
+            counts = _window_counts(grouped, window_seconds)
+            cached = counts_cache[(*grouping, window_seconds)] = (counts, np.maximum.reduceat(counts, grouped.starts))
+        counts, peaks = cached
+        results.append(_evaluate(grouped, counts, peaks, candidate, sample_limit, settings.BACKTEST_BORDERLINE_RATIO))
+    return results
+
+
+def _evaluate_empty(candidate: BacktestCandidate) -> dict:
+    return {
+        **candidate.model_dump(),
+        "blocked_subjects": 0,
+        "blocked_clicks": 0,
+        "first_trigger_at": None,
+        "borderline_subjects": 0,
+        "false_positive_estimate": 0.0,
+        "blocks": [],
+    }
@@ -0,0 +1,114 @@
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.advertiser import Advertiser
+from app.models.blocking_rule import BlockingRule
+
+
+class CompiledRule(NamedTuple):
+    """클릭 처리 경로에서 바로 비교할 수 있도록 미리 변환해 둔 차단 규칙"""
+    id: int
+    name: str
+    time_window_minutes: int
+    window_seconds: int
+    max_clicks: int
+    ipv4_prefix_length: Optional[int] = None
+    ipv6_prefix_length: Optional[int] = None
+
+
+class _RegistryEntry(NamedTuple):
+    version: int
+    loaded_at: float
+    checked_at: float
+    rules: Tuple[CompiledRule, ...]
+
+
+def compile_rule(rule: BlockingRule) -> CompiledRule:
+    return CompiledRule(
+        id=rule.id,
+        name=rule.name,
+        time_window_minutes=rule.time_window_minutes,
+        window_seconds=rule.time_window_minutes * 60,
+        max_clicks=rule.max_clicks,
+        ipv4_prefix_length=rule.ipv4_prefix_length,
+        ipv6_prefix_length=rule.ipv6_prefix_length,
+    )
+
+
+class BlockingRuleRegistry:
+    """
+    광고주별 활성 차단 규칙을 미리 컴파일하여 메모리에 보관하는 레지스트리입니다.
+    규칙 CRUD 는 광고주의 blocking_rules_version 을 같은 트랜잭션에서 올리고, 레지스트리는
+    version_check_seconds 마다 이 값(기본 키 조회 한 번)을 확인하여 다른 워커에서 일어난 변경도 감지합니다.
+    ttl_seconds 는 버전과 관계없이 규칙 전체를 다시 읽는 상한입니다.
+    """
+
+    def __init__(self, ttl_seconds: float, version_check_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self._entries: Dict[int, _RegistryEntry] = {}
+
+    async def get_rules(self, db: AsyncSession, advertiser_id: int) -> Tuple[CompiledRule, ...]:
+        """광고주의 활성 규칙을 반환합니다. 캐시가 유효하면 규칙을 다시 읽지 않습니다."""
+        entry = self._entries.get(advertiser_id)
+        if entry is None:
+            return await self.refresh(db, advertiser_id)
+        now = time.monotonic()
+        if now - entry.loaded_at >= self.ttl_seconds:
+            return await self.refresh(db, advertiser_id)
+        if now - entry.checked_at < self.version_check_seconds:
+            return entry.rules
+        if await self._load_version(db, advertiser_id) != entry.version:
+            return await self.refresh(db, advertiser_id)
+        self._entries[advertiser_id] = entry._replace(checked_at=now)
+        return entry.rules
+
+    def cached_rules(self, advertiser_id: int) -> Optional[Tuple[CompiledRule, ...]]:
+        """DB를 조회하지 않고 메모리에 있는 규칙을 반환합니다. TTL 이 지났어도 돌려주며, 읽은 적이 없으면 None."""
+        entry = self._entries.get(advertiser_id)
+        return entry.rules if entry is not None else None
+
+    @staticmethod
+    async def _load_version(db: AsyncSession, advertiser_id: int) -> int:
+        query = select(Advertiser.blocking_rules_version).where(Advertiser.id == advertiser_id)
+        return (await db.execute(query)).scalar() or 0
+
+    async def refresh(self, db: AsyncSession, advertiser_id: int) -> Tuple[CompiledRule, ...]:
+        """DB에서 광고주의 규칙 버전과 활성 규칙을 다시 읽어 레지스트리를 갱신합니다."""
+        # 버전을 먼저 읽으므로, 그 사이 규칙이 바뀌면 다음 확인 때 다시 읽게 됩니다.
+        version = await self._load_version(db, advertiser_id)
+        query = select(BlockingRule).where(
+            BlockingRule.advertiser_id == advertiser_id,
+            BlockingRule.is_active
+        ).order_by(BlockingRule.id)
+        result = await db.execute(query)
+        rules = tuple(compile_rule(rule) for rule in result.scalars().all())
+        now = time.monotonic()
+        self._entries[advertiser_id] = _RegistryEntry(version=version, loaded_at=now, checked_at=now, rules=rules)
+        return rules
+
+    @staticmethod
+    async def bump_version(db: AsyncSession, advertiser_id: int) -> None:
+        """규칙을 변경하는 트랜잭션 안에서(커밋 전에) 호출하여 모든 워커에 변경을 알립니다."""
+        await db.execute(
+            update(Advertiser)
+            .where(Advertiser.id == advertiser_id)
+            .values(blocking_rules_version=Advertiser.blocking_rules_version + 1)
+        )
+
+    def invalidate(self, advertiser_id: int) -> None:
+        """이 프로세스에 캐시된 광고주의 규칙을 버립니다."""
+        self._entries.pop(advertiser_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+blocking_rule_registry = BlockingRuleRegistry(
+    ttl_seconds=settings.RULE_REGISTRY_TTL_SECONDS,
+    version_check_seconds=settings.RULE_REGISTRY_VERSION_CHECK_SECONDS,
+)
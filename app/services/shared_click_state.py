@@ -0,0 +1,415 @@
+import asyncio
+import fcntl
+import hashlib
+import ipaddress
+import mmap
+import os
+import struct
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.services.blocked_ip_index import BlockedIpIndex, set_blocked_ip_index
+from app.services.click_counter import ClickCounter, set_click_counter
+from app.services.ip_prefix import is_prefix
+from app.services.spill_files import pid_alive
+
+# 파일 맨 앞 헤더: 매직(8) + 파라미터 4개(uint32) + 초기화 상태(uint32)
+HEADER = struct.Struct("<8sIIIII")
+HEADER_SIZE = 64
+STATE_OFFSET = 8 + 4 * 4
+# 초기화 상태 값. 그 밖의 값은 DB에서 복원 중인 워커의 PID 입니다.
+STATE_EMPTY = 0
+STATE_READY = 1
+# fcntl 바이트 범위 락 위치. 실제 데이터와 무관한 가상 오프셋이며 0 은 파일 전체 작업용입니다.
+GLOBAL_LOCK_OFFSET = 0
+# 파일을 쓰는 프로세스가 살아 있는 동안 공유 락을 잡아 두는 오프셋 (스트라이프 오프셋과 겹치지 않는 큰 값)
+ATTACH_LOCK_OFFSET = 1 << 30
+# 차단 IP 인덱스 헤더에 둔, 저장된 대역의 접두사 길이 비트맵 (IPv4 0~32 + IPv6 0~128)
+PREFIX_BITMAP_OFFSET = 32
+PREFIX_BITMAP_SIZE = (33 + 129 + 7) // 8
+IPV6_BIT_BASE = 33
+# 선형 탐사 최대 길이
+MAX_PROBE = 16
+
+COUNTER_MAGIC = b"CLKCNT01"
+BLOCKED_MAGIC = b"BLKIDX01"
+# 차단 IP 테이블의 빈 칸 / 삭제 표시
+EMPTY = 0
+TOMBSTONE = 1
+
+SLOT_HEAD = struct.Struct("<Qq")
+FINGERPRINT = struct.Struct("<Q")
+
+
+def default_state_dir() -> str:
+    """호스트의 모든 워커가 공유하는 tmpfs(/dev/shm)를 우선 사용합니다."""
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def fingerprint(advertiser_id: int, ip_address: str) -> int:
+    """(광고주, IP) 키의 64비트 지문. 0 과 1 은 빈 칸 / 삭제 표시로 쓰므로 피합니다."""
+    digest = hashlib.blake2b(f"{advertiser_id}|{ip_address}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") | 2
+
+
+class _SharedFile:
+    """
+    같은 호스트의 여러 프로세스가 mmap 으로 공유하는 고정 크기 파일입니다.
+    파일을 연 프로세스는 종료될 때까지 ATTACH_LOCK_OFFSET 에 공유 락을 잡아 둡니다.
+    열 때 이 락을 배타적으로 잡을 수 있으면 살아 있는 사용자가 없는 것이므로(전체 재시작 등)
+    이전 실행이 남긴 내용을 비우고 다시 만듭니다. 헤더의 파라미터가 현재 설정과 달라도 마찬가지입니다.
+    잠금은 fcntl 바이트 범위 락으로, 스트라이프마다 서로 다른 오프셋을 잠급니다.
+    파일을 열며 다른 프로세스의 락을 기다릴 수 있으므로 이벤트 루프 밖(스레드)에서 생성합니다.
+    """
+
+    def __init__(self, path: str, magic: bytes, params: Sequence[int], size: int, stripes: int):
+        self.path = path
+        self.size = size
+        self.stripes = stripes
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self.lock(GLOBAL_LOCK_OFFSET):
+            header = os.pread(self._fd, HEADER.size, 0)
+            expected = HEADER.pack(magic, *params, 0)[:STATE_OFFSET]
+            stale = os.fstat(self._fd).st_size != size or header[:STATE_OFFSET] != expected
+            try:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, ATTACH_LOCK_OFFSET)
+                stale = True
+            except OSError:
+                pass
+            if stale:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, HEADER.pack(magic, *params, STATE_EMPTY), 0)
+            fcntl.lockf(self._fd, fcntl.LOCK_SH, 1, ATTACH_LOCK_OFFSET)
+        self.mm = mmap.mmap(self._fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+
+    @contextmanager
+    def lock(self, offset: int, exclusive: bool = True):
+        fcntl.lockf(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH, 1, offset)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, offset)
+
+    def stripe_lock(self, stripe: int, exclusive: bool = True):
+        return self.lock(1 + stripe, exclusive)
+
+    @contextmanager
+    def lock_all(self):
+        """clear 처럼 파일 전체를 바꿀 때 모든 스트라이프를 잠급니다. (전역 락 오프셋은 건드리지 않음)"""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, self.stripes, 1)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, self.stripes, 1)
+
+    def try_lock_global(self) -> bool:
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, GLOBAL_LOCK_OFFSET)
+            return True
+        except OSError:
+            return False
+
+    def unlock_global(self) -> None:
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, GLOBAL_LOCK_OFFSET)
+
+    def claim_initialization(self) -> bool:
+        """
+        DB 복원을 맡을 워커 하나를 정합니다. 전역 락은 상태를 바꾸는 동안만 잡고,
+        복원 중에는 상태에 이 워커의 PID 를 적어 둡니다. 복원하던 워커가 죽었으면 다른 워커가 이어받습니다.
+        """
+        if not self.try_lock_global():
+            return False
+        try:
+            state = struct.unpack_from("<I", self.mm, STATE_OFFSET)[0]
+            if state == STATE_READY or (state != STATE_EMPTY and pid_alive(state)):
+                return False
+            struct.pack_into("<I", self.mm, STATE_OFFSET, os.getpid())
+            return True
+        finally:
+            self.unlock_global()
+
+    def finish_initialization(self, succeeded: bool) -> None:
+        with self.lock(GLOBAL_LOCK_OFFSET):
+            struct.pack_into("<I", self.mm, STATE_OFFSET, STATE_READY if succeeded else STATE_EMPTY)
+
+    def zero_data(self) -> None:
+        self.mm[HEADER_SIZE:] = bytes(self.size - HEADER_SIZE)
+
+
+class SharedMemoryClickCounter(ClickCounter):
+    """
+    한 호스트의 uvicorn 워커들이 같은 클릭 수를 보도록 mmap 파일에 둔 슬라이딩 윈도우 카운터입니다.
+    (광고주, IP)마다 bucket_seconds 단위 버킷 링을 두고, 스트라이프 단위 fcntl 락으로 갱신합니다.
+    버킷 단위로 세므로 윈도우 시작 경계가 최대 bucket_seconds 만큼 앞당겨집니다.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_window_seconds: int,
+        bucket_seconds: int,
+        slots: int,
+        stripes: int,
+    ):
+        self.bucket_seconds = bucket_seconds
+        # 현재 버킷(진행 중)과 윈도우 시작 버킷까지 담을 수 있도록 하나를 더 둡니다.
+        self.buckets = -(-max_window_seconds // bucket_seconds) + 1
+        super().__init__((self.buckets - 1) * bucket_seconds)
+        self.stripes = stripes
+        self.slots_per_stripe = max(1, slots // stripes)
+        self.slot_size = (SLOT_HEAD.size + 2 * self.buckets + 7) // 8 * 8
+        size = HEADER_SIZE + self.stripes * self.slots_per_stripe * self.slot_size
+        self._file = _SharedFile(
+            path, COUNTER_MAGIC, (self.slots_per_stripe, self.stripes, self.buckets, bucket_seconds), size, stripes
+        )
+        self.evictions = 0
+
+    def _slot_offset(self, stripe: int, index: int) -> int:
+        return HEADER_SIZE + (stripe * self.slots_per_stripe + index) * self.slot_size
+
+    def _probe(self, fp: int):
+        stripe = fp % self.stripes
+        start = (fp // self.stripes) % self.slots_per_stripe
+        for i in range(min(MAX_PROBE, self.slots_per_stripe)):
+            yield self._slot_offset(stripe, (start + i) % self.slots_per_stripe)
+
+    def _find(self, fp: int) -> Optional[int]:
+        mm = self._file.mm
+        for offset in self._probe(fp):
+            slot_fp = FINGERPRINT.unpack_from(mm, offset)[0]
+            if slot_fp == fp:
+                return offset
+            if slot_fp == EMPTY:
+                return None
+        return None
+
+    def _find_or_claim(self, fp: int, now_epoch: int) -> int:
+        """키의 슬롯을 찾고, 없으면 만료된 슬롯 → 빈 슬롯 → 가장 오래된 슬롯 순으로 차지합니다."""
+        mm = self._file.mm
+        empty = expired = oldest = None
+        oldest_epoch = 0
+        for offset in self._probe(fp):
+            slot_fp, last_epoch = SLOT_HEAD.unpack_from(mm, offset)
+            if slot_fp == fp:
+                return offset
+            if slot_fp == EMPTY:
+                empty = offset
+                break
+            if expired is None and last_epoch <= now_epoch - self.buckets:
+                expired = offset
+            if oldest is None or last_epoch < oldest_epoch:
+                oldest, oldest_epoch = offset, last_epoch
+        claim = expired or empty
+        if claim is None:
+            # 탐사 범위가 모두 살아 있는 키로 차 있으면 가장 오래 갱신되지 않은 키를 밀어냅니다.
+            claim = oldest
+            self.evictions += 1
+        mm[claim:claim + self.slot_size] = bytes(self.slot_size)
+        SLOT_HEAD.pack_into(mm, claim, fp, now_epoch)
+        return claim
+
+    def _advance(self, offset: int, epoch: int) -> None:
+        """슬롯의 마지막 버킷을 epoch 까지 옮기며 그 사이 지나간 버킷을 0 으로 비웁니다."""
+        mm = self._file.mm
+        slot_fp, last_epoch = SLOT_HEAD.unpack_from(mm, offset)
+        if epoch <= last_epoch:
+            return
+        buckets_offset = offset + SLOT_HEAD.size
+        for e in range(max(last_epoch + 1, epoch - self.buckets + 1), epoch + 1):
+            struct.pack_into("H", mm, buckets_offset + 2 * (e % self.buckets), 0)
+        SLOT_HEAD.pack_into(mm, offset, slot_fp, epoch)
+
+    def record(self, advertiser_id: int, client_ip: str, ts: Optional[float] = None) -> None:
+        now_epoch = int(time.time() // self.bucket_seconds)
+        epoch = int(ts // self.bucket_seconds) if ts is not None else now_epoch
+        if epoch <= now_epoch - self.buckets:
+            return
+        fp = fingerprint(advertiser_id, client_ip)
+        mm = self._file.mm
+        with self._file.stripe_lock(fp % self.stripes):
+            offset = self._find_or_claim(fp, now_epoch)
+            self._advance(offset, max(epoch, now_epoch))
+            bucket = offset + SLOT_HEAD.size + 2 * (epoch % self.buckets)
+            value = struct.unpack_from("H", mm, bucket)[0]
+            if value < 0xFFFF:
+                struct.pack_into("H", mm, bucket, value + 1)
+
+    def count(self, advertiser_id: int, client_ip: str, window_seconds: int, now: Optional[float] = None) -> int:
+        return self.count_many(advertiser_id, client_ip, [window_seconds], now)[0]
+
+    def count_many(
+        self, advertiser_id: int, client_ip: str, windows_seconds: Sequence[int], now: Optional[float] = None
+    ) -> List[int]:
+        now = now if now is not None else time.time()
+        now_epoch = int(now // self.bucket_seconds)
+        fp = fingerprint(advertiser_id, client_ip)
+        with self._file.stripe_lock(fp % self.stripes, exclusive=False):
+            offset = self._find(fp)
+            if offset is None:
+                return [0] * len(windows_seconds)
+            last_epoch = SLOT_HEAD.unpack_from(self._file.mm, offset)[1]
+            start = offset + SLOT_HEAD.size
+            buckets = memoryview(self._file.mm)[start:start + 2 * self.buckets].cast("H").tolist()
+
+        counts = []
+        newest = min(last_epoch, now_epoch)
+        for window in windows_seconds:
+            first = max(int((now - window) // self.bucket_seconds), last_epoch - self.buckets + 1)
+            counts.append(sum(buckets[e % self.buckets] for e in range(first, newest + 1)))
+        return counts
+
+    def clear(self) -> None:
+        with self._file.lock_all():
+            self._file.zero_data()
+
+    async def rebuild(self, db: AsyncSession) -> int:
+        """
+        파일을 새로 만든 뒤 워커 하나만 DB에서 상태를 복원합니다.
+        다른 워커가 복원 중이거나 이미 복원된 파일이면 그대로 공유하고 0 을 반환합니다.
+        파일이 새로 만들어질 때 이미 비워졌으므로 clear 하지 않고, 그 사이 다른 워커가 기록한 클릭도 지우지 않습니다.
+        """
+        if not self._file.claim_initialization():
+            return 0
+        restored = None
+        try:
+            restored = await self._restore(db)
+            return restored
+        finally:
+            self._file.finish_initialization(restored is not None)
+
+
+class SharedMemoryBlockedIpIndex(BlockedIpIndex):
+    """
+    (광고주, IP) 지문을 mmap 파일의 개방 주소법 해시 집합에 담아 워커들이 공유하는 차단 IP 인덱스입니다.
+    조회는 8바이트 정렬 읽기 한 번이라 락 없이 수행하고(놓쳐도 DB 중복 확인으로 보완됨),
+    추가 / 삭제만 스트라이프 락을 잡습니다.
+    CIDR 대역은 대역 문자열의 지문으로 저장하고 헤더에 접두사 길이를 표시해 두어,
+    조회 시 표시된 길이들에 대해서만 IP를 감싸는 대역을 확인합니다.
+    """
+
+    def __init__(self, path: str, slots: int, stripes: int):
+        self.stripes = stripes
+        self.slots_per_stripe = max(MAX_PROBE, slots // stripes)
+        size = HEADER_SIZE + self.stripes * self.slots_per_stripe * FINGERPRINT.size
+        self._file = _SharedFile(path, BLOCKED_MAGIC, (self.slots_per_stripe, self.stripes, 0, 0), size, stripes)
+
+    def _probe(self, fp: int):
+        stripe = fp % self.stripes
+        start = (fp // self.stripes) % self.slots_per_stripe
+        base = HEADER_SIZE + stripe * self.slots_per_stripe * FINGERPRINT.size
+        for i in range(self.slots_per_stripe):
+            yield base + ((start + i) % self.slots_per_stripe) * FINGERPRINT.size
+
+    def _find(self, fp: int) -> Optional[int]:
+        mm = self._file.mm
+        for offset in self._probe(fp):
+            slot_fp = FINGERPRINT.unpack_from(mm, offset)[0]
+            if slot_fp == fp:
+                return offset
+            if slot_fp == EMPTY:
+                return None
+        return None
+
+    def _prefix_lengths(self, version: int) -> List[int]:
+        bitmap = int.from_bytes(self._file.mm[PREFIX_BITMAP_OFFSET:PREFIX_BITMAP_OFFSET + PREFIX_BITMAP_SIZE], "little")
+        base, count = (0, 33) if version == 4 else (IPV6_BIT_BASE, 129)
+        return [length for length in range(count) if bitmap >> (base + length) & 1]
+
+    def _mark_prefix_length(self, version: int, length: int) -> None:
+        bit = length if version == 4 else IPV6_BIT_BASE + length
+        offset = PREFIX_BITMAP_OFFSET + bit // 8
+        # 비트맵 바이트는 여러 스트라이프가 함께 쓰므로 스트라이프와 겹치지 않는 별도 오프셋을 잠급니다.
+        with self._file.lock(1 + self.stripes):
+            self._file.mm[offset] |= 1 << (bit % 8)
+
+    def contains(self, advertiser_id: int, ip_address: str) -> bool:
+        if self._find(fingerprint(advertiser_id, ip_address)) is not None:
+            return True
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return False
+        for length in self._prefix_lengths(address.version):
+            network = ipaddress.ip_network((address, length), strict=False)
+            if self._find(fingerprint(advertiser_id, network.compressed)) is not None:
+                return True
+        return False
+
+    def add(self, advertiser_id: int, ip_address: str) -> None:
+        if is_prefix(ip_address):
+            network = ipaddress.ip_network(ip_address, strict=False)
+            ip_address = network.compressed
+            self._mark_prefix_length(network.version, network.prefixlen)
+        fp = fingerprint(advertiser_id, ip_address)
+        mm = self._file.mm
+        with self._file.stripe_lock(fp % self.stripes):
+            free = None
+            for offset in self._probe(fp):
+                slot_fp = FINGERPRINT.unpack_from(mm, offset)[0]
+                if slot_fp == fp:
+                    return
+                if slot_fp == TOMBSTONE and free is None:
+                    free = offset
+                if slot_fp == EMPTY:
+                    free = offset if free is None else free
+                    break
+            if free is None:
+                print(f"경고: 공유 차단 IP 인덱스가 가득 찼습니다. IP {ip_address} 는 DB 확인으로 처리됩니다.")
+                return
+            FINGERPRINT.pack_into(mm, free, fp)
+
+    def discard(self, advertiser_id: int, ip_address: str) -> None:
+        if is_prefix(ip_address):
+            ip_address = ipaddress.ip_network(ip_address, strict=False).compressed
+        fp = fingerprint(advertiser_id, ip_address)
+        with self._file.stripe_lock(fp % self.stripes):
+            offset = self._find(fp)
+            if offset is not None:
+                FINGERPRINT.pack_into(self._file.mm, offset, TOMBSTONE)
+
+    def clear(self) -> None:
+        with self._file.lock_all():
+            self._file.zero_data()
+            self._file.mm[PREFIX_BITMAP_OFFSET:PREFIX_BITMAP_OFFSET + PREFIX_BITMAP_SIZE] = bytes(PREFIX_BITMAP_SIZE)
+
+    async def load(self, db: AsyncSession) -> int:
+        """카운터와 마찬가지로 파일을 새로 만든 뒤 워커 하나만 DB에서 적재합니다."""
+        if not self._file.claim_initialization():
+            return 0
+        loaded = None
+        try:
+            loaded = await self._load_from(db)
+            return loaded
+        finally:
+            self._file.finish_initialization(loaded is not None)
+
+
+def _create_shared_click_state():
+    prefix = os.path.join(settings.SHARED_STATE_DIR or default_state_dir(), settings.SHARED_STATE_NAME)
+    counter = SharedMemoryClickCounter(
+        path=prefix + ".click_counter",
+        max_window_seconds=settings.SHARED_CLICK_COUNTER_MAX_WINDOW_MINUTES * 60,
+        bucket_seconds=settings.SHARED_CLICK_COUNTER_BUCKET_SECONDS,
+        slots=settings.SHARED_CLICK_COUNTER_SLOTS,
+        stripes=settings.SHARED_STATE_LOCK_STRIPES,
+    )
+    index = SharedMemoryBlockedIpIndex(
+        path=prefix + ".blocked_ips",
+        slots=settings.SHARED_BLOCKED_IP_SLOTS,
+        stripes=settings.SHARED_STATE_LOCK_STRIPES,
+    )
+    return counter, index
+
+
+async def install_shared_click_state() -> None:
+    """클릭 카운터와 차단 IP 인덱스를 공유 메모리 구현으로 교체합니다. (lifespan 시작 시 상태 복원 전에 호출)"""
+    # 파일을 열며 다른 워커의 fcntl 락을 기다릴 수 있으므로 스레드에서 만듭니다.
+    counter, index = await asyncio.to_thread(_create_shared_click_state)
+    set_click_counter(counter)
+    set_blocked_ip_index(index)
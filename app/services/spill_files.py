@@ -0,0 +1,26 @@
+import glob
+import os
+from typing import List
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def orphaned_files(prefix: str, suffix: str = "") -> List[str]:
+    """
+    워커 프로세스별 파일(prefix.{pid}{suffix}) 중 만든 프로세스가 이미 종료된 것들입니다.
+    재시작 / 비정상 종료로 남은 파일을 살아 있는 워커가 가져가 처리할 때 씁니다.
+    """
+    orphans = []
+    for path in glob.glob(f"{glob.escape(prefix)}.*{glob.escape(suffix)}"):
+        pid = path[len(prefix) + 1:len(path) - len(suffix)]
+        if pid.isdigit() and not pid_alive(int(pid)):
+            orphans.append(path)
+    return sorted(orphans)
@@ -0,0 +1 @@
+# 클릭 추적 파이프라인 부하 테스트 / 벤치마크 패키지
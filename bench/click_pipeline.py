@@ -0,0 +1,283 @@
+"""
+클릭 추적 파이프라인(/ads/landing/{advertiser_id} -> process_ad_click) 벤치마크
+
+로컬 DB(기본값: SQLite/aiosqlite 파일)와 네이버 API 목(mock) 트랜스포트로 앱을 띄운 뒤
+합성 클릭 트래픽을 재생하고 처리량, 지연 시간 분위수, 클릭당 DB 문장 수, 차단 건수를 보고합니다.
+
+    python -m bench.click_pipeline --clicks 20000 --concurrency 100 --attack-ratio 0.2
+    python -m bench.click_pipeline --save-baseline bench_baseline.json
+    python -m bench.click_pipeline --baseline bench_baseline.json --tolerance 0.15
+
+--baseline 을 주면 기준치보다 나빠진 항목이 있을 때 종료 코드 1 을 반환합니다.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_DB_URL = "sqlite+aiosqlite:///./bench_clicks.db"
+BENCH_CUSTOMER_ID = 1234567
+CLIENT_IP_HEADER = b"x-bench-client-ip"
+
+# 기준치 비교 시 값이 클수록 좋은 항목 / 작을수록 좋은 항목
+HIGHER_IS_BETTER = ("redirects_per_second",)
+LOWER_IS_BETTER = ("latency_p50_ms", "latency_p95_ms", "latency_p99_ms", "db_statements_per_click")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Click-tracking pipeline benchmark")
+    parser.add_argument("--db-url", default=DEFAULT_DB_URL, help="SQLAlchemy async URL of the stand-in database")
+    parser.add_argument("--keep-db", action="store_true", help="Do not delete the SQLite file before running")
+    parser.add_argument("--clicks", type=int, default=10000, help="Number of landing requests to replay")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent in-flight requests")
+    parser.add_argument("--ip-cardinality", type=int, default=5000, help="Distinct benign client IPs")
+    parser.add_argument("--attacker-ips", type=int, default=20, help="Distinct attacker IPs")
+    parser.add_argument("--attack-ratio", type=float, default=0.2, help="Share of clicks coming from attacker IPs")
+    parser.add_argument(
+        "--rules", default="3:5,20:1440",
+        help="Comma separated blocking rules as max_clicks:time_window_minutes"
+    )
+    parser.add_argument("--naver-latency-ms", type=float, default=50.0, help="Simulated Naver API latency")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="Seconds to wait for background work")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--save-baseline", help="Write the report as a new baseline to this path")
+    parser.add_argument("--baseline", help="Compare against this baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression (0.10 = 10%%)")
+    return parser.parse_args(argv)
+
+
+def parse_rules(spec: str) -> List[Tuple[int, int]]:
+    rules = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        max_clicks, window = item.split(":")
+        rules.append((int(max_clicks), int(window)))
+    return rules
+
+
+def configure_environment(db_url: str) -> None:
+    """앱 설정을 import 하기 전에 벤치마크용 환경 변수를 채웁니다. 이미 설정된 값은 유지합니다."""
+    os.environ["DATABASE_URL_OVERRIDE"] = db_url
+    for key in ("DB_USER", "DB_PASSWORD", "DB_HOST", "DB_PORT", "DB_NAME"):
+        os.environ.setdefault(key, "bench")
+    for key in ("NAVER_AD_API_KEY", "NAVER_AD_SECRET_KEY", "NAVER_CLIENT_ID", "NAVER_CLIENT_SECRET",
+                "KAKAO_CLIENT_SECRET", "SECRET_KEY"):
+        os.environ.setdefault(key, "bench-secret")
+
+
+def with_client_ip(app):
+    """요청 헤더로 넘긴 IP를 ASGI scope 의 client 로 바꿔 여러 클라이언트를 흉내 냅니다."""
+    async def wrapped(scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope.get("headers", []):
+                if name == CLIENT_IP_HEADER:
+                    scope = dict(scope, client=(value.decode("ascii"), 0))
+                    break
+        await app(scope, receive, send)
+    return wrapped
+
+
+def build_traffic(args: argparse.Namespace) -> List[str]:
+    rng = random.Random(args.seed)
+    benign = [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(1, args.ip_cardinality + 1)]
+    attackers = [f"203.0.{(i >> 8) & 255}.{i & 255}" for i in range(1, args.attacker_ips + 1)]
+    return [
+        rng.choice(attackers) if attackers and rng.random() < args.attack_ratio else rng.choice(benign)
+        for _ in range(args.clicks)
+    ]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class NaverMock:
+    """네이버 광고 API 를 흉내 내는 httpx 목 트랜스포트 핸들러"""
+
+    def __init__(self, latency_ms: float):
+        self.latency_seconds = latency_ms / 1000
+        self.block_calls = 0
+        self.blocked: set = set()
+
+    async def __call__(self, request):
+        import httpx
+
+        await asyncio.sleep(self.latency_seconds)
+        if request.url.path == "/tool/ip-exclusions":
+            self.block_calls += 1
+            self.blocked.add(json.loads(request.content)["filterIp"])
+        return httpx.Response(200, json={})
+
+
+async def seed_database(rules: List[Tuple[int, int]]) -> int:
+    from app.db.session import AsyncSessionLocal
+    from app.models.advertiser import Advertiser
+    from app.models.blocking_rule import BlockingRule
+
+    async with AsyncSessionLocal() as db:
+        advertiser = Advertiser(company_name="bench", naver_customer_id=BENCH_CUSTOMER_ID)
+        db.add(advertiser)
+        await db.commit()
+        await db.refresh(advertiser)
+        for max_clicks, window in rules:
+            db.add(BlockingRule(
+                advertiser_id=advertiser.id,
+                name=f"bench {max_clicks}/{window}m",
+                time_window_minutes=window,
+                max_clicks=max_clicks,
+            ))
+        await db.commit()
+        return advertiser.id
+
+
+async def wait_for_background_work(timeout: float) -> None:
+    """클릭 처리 큐, 수집 큐, 아웃박스가 모두 비거나 시간이 다 될 때까지 기다립니다."""
+    from app.services.click_ingest_service import click_ingest_writer
+    from app.services.click_worker_pool import click_worker_pool
+    from app.services.ip_block_outbox_worker import ip_block_outbox_worker
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if click_worker_pool.pending == 0 and click_ingest_writer.queue_depth == 0 and await ip_block_outbox_worker.process_batch() == 0:
+            return
+        await asyncio.sleep(0.1)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, float]:
+    import httpx
+    from sqlalchemy import event
+
+    from app.core import http_client
+    from app.db.session import async_engine
+    from app.main import app
+
+    naver = NaverMock(args.naver_latency_ms)
+    http_client.set_transport_override(httpx.MockTransport(naver))
+
+    statements = {"count": 0}
+
+    def count_statement(*_):
+        statements["count"] += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+
+    traffic = build_traffic(args)
+    latencies: List[float] = []
+    status_codes: Dict[int, int] = {}
+
+    async with app.router.lifespan_context(app):
+        advertiser_id = await seed_database(parse_rules(args.rules))
+        query = {
+            "final_url": "https://example.com/landing",
+            "customerid": str(BENCH_CUSTOMER_ID),
+            "n_network": "search",
+            "n_match": "exact",
+            "n_keyword": "bench",
+            "n_media": "pc",
+            "n_ad_group": "1",
+            "n_ad": "1",
+            "n_keyword_id": "1",
+            "n_creative": "1",
+        }
+        transport = httpx.ASGITransport(app=with_client_ip(app))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            next_index = 0
+
+            async def worker():
+                nonlocal next_index
+                while next_index < len(traffic):
+                    ip = traffic[next_index]
+                    next_index += 1
+                    started = time.perf_counter()
+                    response = await client.get(
+                        f"/ads/landing/{advertiser_id}", params=query, headers={"x-bench-client-ip": ip}
+                    )
+                    latencies.append(time.perf_counter() - started)
+                    status_codes[response.status_code] = status_codes.get(response.status_code, 0) + 1
+
+            statements["count"] = 0
+            started = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+            elapsed = time.perf_counter() - started
+            request_statements = statements["count"]
+
+            await wait_for_background_work(args.drain_timeout)
+            total_statements = statements["count"]
+
+    event.remove(async_engine.sync_engine, "before_cursor_execute", count_statement)
+    http_client.set_transport_override(None)
+
+    latencies.sort()
+    attacker_ips = {ip for ip in traffic if ip.startswith("203.0.")}
+    return {
+        "clicks": len(traffic),
+        "elapsed_seconds": elapsed,
+        "redirects_per_second": len(traffic) / elapsed if elapsed else 0.0,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p95_ms": percentile(latencies, 95) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "latency_mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "redirect_responses": sum(count for code, count in status_codes.items() if 300 <= code < 400),
+        "error_responses": sum(count for code, count in status_codes.items() if code >= 400),
+        "db_statements_per_click": total_statements / len(traffic) if traffic else 0.0,
+        "db_statements_during_requests": request_statements,
+        "blocks_issued": naver.block_calls,
+        "distinct_ips_blocked": len(naver.blocked),
+        "attacker_ips_blocked": len(naver.blocked & attacker_ips),
+        "attacker_ips_seen": len(attacker_ips),
+    }
+
+
+def compare_with_baseline(report: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    for key in HIGHER_IS_BETTER:
+        if key in baseline and report[key] < baseline[key] * (1 - tolerance):
+            regressions.append(f"{key}: {report[key]:.2f} < baseline {baseline[key]:.2f}")
+    for key in LOWER_IS_BETTER:
+        if key in baseline and report[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key}: {report[key]:.2f} > baseline {baseline[key]:.2f}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.db_url.startswith("sqlite") and not args.keep_db:
+        path = args.db_url.split("///", 1)[-1]
+        if path and path != ":memory:" and os.path.exists(path):
+            os.remove(path)
+    configure_environment(args.db_url)
+
+    report = asyncio.run(run(args))
+    for key, value in report.items():
+        print(f"{key:>32}: {value:.3f}" if isinstance(value, float) else f"{key:>32}: {value}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("\n성능 회귀 발견:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\n기준치 대비 회귀 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())